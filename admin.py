@@ -0,0 +1,95 @@
+"""
+Admin usage dashboard for Helpy.
+
+Shows token, cost, latency and cache-hit totals per user, feature, stage and
+model from the usage log, and which users are close to their daily budget.
+Runs separately from the student app so it is never exposed to them:
+
+    streamlit run admin.py --server.port 8502
+
+Set HELPY_ADMIN_PASSWORD to require a password.
+"""
+import os
+import time
+import datetime
+import pandas as pd
+import streamlit as st
+from dotenv import load_dotenv
+
+from utils.load_config import LoadConfig
+from utils.metering import get_usage_store
+
+load_dotenv()
+CONFIG = LoadConfig()
+
+st.set_page_config(page_title="Helpy Usage", layout="wide")
+st.title("📊 Helpy Usage")
+
+# === Access ===
+admin_password = os.getenv("HELPY_ADMIN_PASSWORD")
+if admin_password and st.text_input("Admin password", type="password") != admin_password:
+    st.stop()
+
+# === Filters ===
+WINDOWS = {"Last hour": 3600, "Last 24 hours": 24 * 3600, "Last 7 days": 7 * 24 * 3600, "All time": None}
+window = st.selectbox("Period", list(WINDOWS), index=1)
+since = time.time() - WINDOWS[window] if WINDOWS[window] else 0
+store = get_usage_store()
+
+
+def usage_frame(group_by: str) -> pd.DataFrame:
+    frame = pd.DataFrame(store.summary(since=since, group_by=group_by))
+    if frame.empty:
+        return frame
+    frame["total_tokens"] = frame["prompt_tokens"] + frame["completion_tokens"] + frame["embedding_tokens"]
+    frame["cache_hit_rate"] = (frame["cache_hits"] / frame["calls"]).round(3)
+    frame["avg_latency_ms"] = frame["avg_latency_ms"].round(0)
+    frame["cost_usd"] = frame["cost_usd"].round(4)
+    return frame.rename(columns={"name": group_by})
+
+
+# === Totals ===
+by_user = usage_frame("user_id")
+if by_user.empty:
+    st.info("No model usage recorded for this period.")
+    st.stop()
+
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("💸 Estimated cost", f"${by_user['cost_usd'].sum():,.2f}")
+col2.metric("🔤 Tokens", f"{int(by_user['total_tokens'].sum()):,}")
+col3.metric("📞 Calls", f"{int(by_user['calls'].sum()):,}")
+col4.metric("⚡ Cache hit rate", f"{by_user['cache_hits'].sum() / by_user['calls'].sum():.0%}")
+
+# === Per user, with budget status ===
+st.subheader("👤 Users")
+if CONFIG.usage_daily_token_budget:
+    day_ago = time.time() - 24 * 3600
+    by_user["tokens_24h"] = by_user["user_id"].map(lambda user: store.tokens_since(user, day_ago))
+    by_user["budget_used"] = (by_user["tokens_24h"] / CONFIG.usage_daily_token_budget).round(3)
+    by_user.loc[by_user["user_id"].isin(CONFIG.usage_exempt_users), "budget_used"] = None
+    over = by_user[by_user["budget_used"] >= 1]
+    if not over.empty:
+        st.warning(f"⚠️ {len(over)} user(s) have reached the daily budget of {CONFIG.usage_daily_token_budget:,} tokens.")
+st.dataframe(by_user, width="stretch", hide_index=True)
+
+# === Per feature / stage / model ===
+col1, col2 = st.columns(2)
+with col1:
+    st.subheader("🧩 Features")
+    by_feature = usage_frame("feature")
+    st.bar_chart(by_feature.set_index("feature")["total_tokens"])
+    st.dataframe(by_feature, width="stretch", hide_index=True)
+with col2:
+    st.subheader("🤖 Models")
+    by_model = usage_frame("model")
+    st.bar_chart(by_model.set_index("model")["cost_usd"])
+    st.dataframe(by_model, width="stretch", hide_index=True)
+
+st.subheader("🪜 Stages")
+st.dataframe(usage_frame("stage"), width="stretch", hide_index=True)
+
+# === Recent calls ===
+with st.expander("🕑 Recent calls", expanded=False):
+    recent = pd.DataFrame(store.recent(200))
+    recent["ts"] = recent["ts"].map(lambda ts: datetime.datetime.fromtimestamp(ts).strftime("%b %d %H:%M:%S"))
+    st.dataframe(recent, width="stretch", hide_index=True)
@@ -0,0 +1,513 @@
+"""
+Headless HTTP API for Helpy.
+
+Exposes upload, summarize, generate-MCQs and ask over HTTP (with batch
+variants and server-sent-event streaming) for LMS integrations, without the
+Streamlit rerun model. Study packs (utils/study_pack.py) can be exported per
+document and imported as a ready-to-use document. Handlers reuse the same Summarizer, MCQGenerator and
+QA chain code as app.py; their st.cache_data/st.cache_resource caches and the
+module-level OpenAI clients are shared by every request in the process.
+
+Model usage is metered per caller: send an `X-User-Id` header to attribute
+calls (and apply the daily token budget) per end user; without it, all calls
+count towards the shared "api" user. Over-budget callers get 429.
+Uploads are referenced per caller too, so a DELETE only drops the caller's
+own reference; the document goes once no caller references it. A caller
+can only use documents it uploaded or imported itself: other callers'
+document ids answer 404.
+
+Summary, MCQ and ask requests run under a deadline: the configured default
+per feature, or `X-Deadline-S` seconds (capped at deadline_config max_s).
+When it is near, the work finished so far is returned with `"partial": true`
+instead of running over.
+
+Run:
+    uvicorn api:app --host 0.0.0.0 --port 8000
+"""
+import io
+import re
+import json
+import hashlib
+import asyncio
+import threading
+import traceback
+from contextlib import asynccontextmanager
+
+import anyio
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from utils.load_config import LoadConfig
+from utils.summarizer import Summarizer
+from utils.section_summaries import unit_label
+from utils.generate_mcqs import MCQGenerator
+from utils.chat_with_file import get_qa_chain, new_chat_memory, answer_within_deadline
+from utils.upload_store import get_upload_store, UploadRejectedError
+from utils.study_pack import import_pack, export_pack, StudyPackError, PACK_EXTENSION
+from utils.metering import metering_context, check_budget, BudgetExceededError
+from utils.deadline import deadline_context, time_left, mark_partial, DeadlineExceeded, PartialResult
+
+CONFIG = LoadConfig()
+
+# API uploads hold one upload-store reference per caller (X-User-Id), "api" for anonymous callers
+API_SESSION_ID = "api"
+DOCUMENT_ID_PATTERN = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]+$")
+# Last path segment -> metered feature; other routes make no model calls
+METERED_FEATURES = {"summary": "summary", "mcqs": "quiz", "ask": "chat", "pack": "index"}
+
+
+class APIError(Exception):
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+# === Helpers ===
+async def run_blocking(request: Request, fn, *args):
+    """Run a blocking call on a worker thread, bounded by the shared capacity limiter."""
+    return await anyio.to_thread.run_sync(lambda: fn(*args), limiter=request.app.state.limiter)
+
+
+async def run_within_deadline(request: Request, fn, *args):
+    """run_blocking returning (result, partial); work cut short by the deadline comes back partial."""
+    try:
+        return await run_blocking(request, fn, *args), False
+    except PartialResult as e:
+        return e.result, True
+
+
+def with_partial(response: dict, partial: bool) -> dict:
+    return {**response, "partial": True} if partial else response
+
+
+async def iterate_in_thread(request: Request, generator_fn, *args):
+    """Drain a blocking generator on a worker thread, yielding its items as they arrive."""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    done = object()
+    stopped = threading.Event()
+
+    def produce():
+        try:
+            for item in generator_fn(*args):
+                if stopped.is_set():
+                    break  # client went away; stop spending API calls
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+
+    task = asyncio.ensure_future(run_blocking(request, produce))
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+        await task
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(events, media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+def wants_stream(request: Request) -> bool:
+    return request.query_params.get("stream", "").lower() in ("1", "true", "yes")
+
+
+async def read_json(request: Request) -> dict:
+    if not await request.body():
+        return {}
+    try:
+        body = await request.json()
+    except ValueError:
+        raise APIError("Request body must be valid JSON.")
+    if not isinstance(body, dict):
+        raise APIError("Request body must be a JSON object.")
+    return body
+
+
+def caller_ref(request: Request) -> str:
+    """Upload-store reference for the caller, so one client's delete leaves other clients' copies alone."""
+    user_id = request.headers.get("x-user-id")
+    if not user_id:
+        return API_SESSION_ID
+    return f"{API_SESSION_ID}-{hashlib.sha256(user_id.encode()).hexdigest()[:16]}"
+
+
+def document_path(request: Request, document_id: str) -> str:
+    """Path of a document the caller uploaded; other callers' documents are unknown to them."""
+    if not DOCUMENT_ID_PATTERN.match(document_id or ""):
+        raise APIError(f"Invalid document id: {document_id!r}")
+    digest, _, ext = document_id.partition(".")
+    store = get_upload_store()
+    path = store.object_path(digest, ext)
+    if not path.exists() or not store.holds(path.name, caller_ref(request)):
+        raise APIError(f"Unknown document: {document_id}", status_code=404)
+    return str(path)
+
+
+def batch_items(body: dict, key: str) -> list:
+    items = body.get(key)
+    if not isinstance(items, list) or not items:
+        raise APIError(f"'{key}' must be a non-empty list.")
+    if len(items) > CONFIG.api_max_batch_size:
+        raise APIError(f"At most {CONFIG.api_max_batch_size} items per batch request.", status_code=413)
+    return items
+
+
+def max_questions_from(body: dict) -> int:
+    try:
+        max_questions = int(body.get("max_questions", 10))
+    except (TypeError, ValueError):
+        raise APIError("'max_questions' must be an integer.")
+    if not 1 <= max_questions <= 50:
+        raise APIError("'max_questions' must be between 1 and 50.")
+    return max_questions
+
+
+async def gather_results(coroutines: list) -> list:
+    """Run batch items concurrently; one failing item doesn't fail the batch."""
+    results = await asyncio.gather(*coroutines, return_exceptions=True)
+    return [
+        {"error": result.message if isinstance(result, APIError) else str(result)}
+        if isinstance(result, Exception) else result
+        for result in results
+    ]
+
+
+# === Core operations ===
+async def summarize_document(request: Request, document_id: str) -> dict:
+    summary, partial = await run_within_deadline(request, Summarizer.summarize_file, document_path(request, document_id))
+    if not summary or summary.startswith("❌"):
+        raise APIError(summary or "Summarization failed.", status_code=502)
+    return with_partial({"document_id": document_id, "summary": summary}, partial)
+
+
+def page_range_from(body: dict):
+    if "start" not in body and "end" not in body:
+        return None
+    try:
+        start = int(body.get("start", 1))
+        end = int(body.get("end", start))
+    except (TypeError, ValueError):
+        raise APIError("'start' and 'end' must be integers.")
+    if start < 1 or end < start:
+        raise APIError("'start' must be at least 1 and not after 'end'.")
+    return start, end
+
+
+async def summarize_document_range(request: Request, document_id: str, start: int, end: int) -> dict:
+    file_path = document_path(request, document_id)
+    try:
+        summary, partial = await run_within_deadline(request, Summarizer.summarize_range, file_path, start, end)
+    except ValueError as e:
+        raise APIError(str(e))
+    if not summary or summary.startswith("❌"):
+        raise APIError(summary or "Summarization failed.", status_code=502)
+    return with_partial(
+        {"document_id": document_id, "unit": unit_label(file_path), "start": start, "end": end, "summary": summary},
+        partial
+    )
+
+
+async def generate_document_mcqs(request: Request, document_id: str, max_questions: int) -> dict:
+    questions, partial = await run_within_deadline(
+        request, MCQGenerator.generate_mcqs_from_file, document_path(request, document_id), max_questions
+    )
+    if not questions:
+        raise APIError("MCQ generation returned no questions.", status_code=502)
+    return with_partial({"document_id": document_id, "questions": questions}, partial)
+
+
+def _prepare_question(file_path: str, question: str, history: list):
+    qa_chain = get_qa_chain(file_path)
+    if qa_chain is None:
+        raise APIError("Failed to initialize the QA system for this document.", status_code=502)
+
+    # Stateless API: the client sends prior turns, only the recent window is used
+    memory = new_chat_memory()
+    memory.pairs = [(str(q), str(a)) for q, a in history][-memory.max_pairs:]
+    return qa_chain, memory.condense_question(question)
+
+
+def _parse_question(body: dict):
+    question = str(body.get("question", "")).strip()
+    if not question:
+        raise APIError("'question' is required.")
+    history = body.get("history", [])
+    if not isinstance(history, list) or not all(isinstance(turn, list) and len(turn) == 2 for turn in history):
+        raise APIError("'history' must be a list of [question, answer] pairs.")
+    return question, history
+
+
+async def ask_document(request: Request, document_id: str, question: str, history: list) -> dict:
+    file_path = document_path(request, document_id)
+    qa_chain, standalone = await run_blocking(request, _prepare_question, file_path, question, history)
+    answer, partial = await run_blocking(request, answer_within_deadline, qa_chain, standalone)
+    return with_partial({"document_id": document_id, "question": question, "answer": answer}, partial)
+
+
+# === Endpoints ===
+async def health(request: Request):
+    return JSONResponse({"status": "ok"})
+
+
+async def upload_document(request: Request):
+    form = await request.form()
+    upload = form.get("file")
+    if upload is None or not hasattr(upload, "file"):
+        raise APIError("Send the document as multipart form field 'file'.")
+
+    try:
+        stored = await run_blocking(
+            request, get_upload_store().save, upload.file, upload.filename, caller_ref(request), upload.size
+        )
+    except UploadRejectedError as e:
+        raise APIError(str(e), status_code=413 if "limit" in str(e) else 415)
+    finally:
+        await upload.close()
+
+    return JSONResponse(
+        {"document_id": stored.key, "file_name": stored.file_name, "size": stored.size},
+        status_code=201
+    )
+
+
+async def import_study_pack(request: Request):
+    form = await request.form()
+    upload = form.get("file")
+    if upload is None or not hasattr(upload, "file"):
+        raise APIError("Send the study pack as multipart form field 'file'.")
+
+    try:
+        stored = await run_blocking(request, import_pack, upload.file, caller_ref(request))
+    except StudyPackError as e:
+        raise APIError(str(e), status_code=422)
+    except UploadRejectedError as e:
+        raise APIError(str(e), status_code=413 if "limit" in str(e) else 415)
+    finally:
+        await upload.close()
+
+    return JSONResponse(
+        {"document_id": stored.key, "file_name": stored.file_name, "size": stored.size},
+        status_code=201
+    )
+
+
+async def export_study_pack(request: Request):
+    # Builds the index if needed; the summary, MCQs and FAQ are packed as far as they exist
+    file_path = document_path(request, request.path_params["document_id"])
+
+    def export() -> bytes:
+        buffer = io.BytesIO()
+        export_pack(file_path, buffer)
+        return buffer.getvalue()
+
+    try:
+        data = await run_blocking(request, export)
+    except StudyPackError as e:
+        raise APIError(str(e), status_code=422)
+    return Response(
+        data,
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{request.path_params["document_id"].partition(".")[0]}.{PACK_EXTENSION}"'}
+    )
+
+
+async def delete_document(request: Request):
+    document_id = request.path_params["document_id"]
+    deleted = get_upload_store().release(document_path(request, document_id), caller_ref(request))
+    return JSONResponse({"document_id": document_id, "deleted": deleted})
+
+
+async def summarize(request: Request):
+    # Optional {"start", "end"}: summarize just those pages/slides
+    document_id = request.path_params["document_id"]
+    page_range = page_range_from(await read_json(request))
+    if page_range:
+        return JSONResponse(await summarize_document_range(request, document_id, *page_range))
+    return JSONResponse(await summarize_document(request, document_id))
+
+
+async def generate_mcqs(request: Request):
+    document_id = request.path_params["document_id"]
+    max_questions = max_questions_from(await read_json(request))
+
+    if not wants_stream(request):
+        return JSONResponse(await generate_document_mcqs(request, document_id, max_questions))
+
+    file_path = document_path(request, document_id)
+
+    async def events():
+        count = 0
+        try:
+            async for batch in iterate_in_thread(request, MCQGenerator.iter_mcq_batches, file_path, max_questions, 2):
+                count += len(batch)
+                yield sse_event("questions", batch)
+            yield sse_event("done", {"document_id": document_id, "count": count})
+        except DeadlineExceeded:
+            yield sse_event("done", {"document_id": document_id, "count": count, "partial": True})
+        except Exception as e:
+            traceback.print_exc()
+            yield sse_event("error", {"error": str(e)})
+
+    return sse_response(events())
+
+
+async def ask(request: Request):
+    document_id = request.path_params["document_id"]
+    question, history = _parse_question(await read_json(request))
+
+    if not wants_stream(request):
+        return JSONResponse(await ask_document(request, document_id, question, history))
+
+    file_path = document_path(request, document_id)
+    qa_chain, standalone = await run_blocking(request, _prepare_question, file_path, question, history)
+
+    async def events():
+        # Streamed answers hold a slot of the same limiter as every blocking call
+        async with request.app.state.limiter:
+            tokens = []
+            stream = qa_chain.astream_events({"query": standalone}, version="v2")
+            try:
+                while True:
+                    try:
+                        # Without a deadline time_left() is None and this waits as long as the stream runs
+                        event = await asyncio.wait_for(anext(stream), time_left())
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        answer = mark_partial("".join(tokens))
+                        yield sse_event("done", {"document_id": document_id, "answer": answer, "partial": True})
+                        return
+                    if event["event"] == "on_chat_model_stream":
+                        token = event["data"]["chunk"].content
+                        if token:
+                            tokens.append(token)
+                            yield sse_event("token", token)
+                yield sse_event("done", {"document_id": document_id, "answer": "".join(tokens)})
+            except Exception as e:
+                traceback.print_exc()
+                yield sse_event("error", {"error": str(e)})
+            finally:
+                await stream.aclose()
+
+    return sse_response(events())
+
+
+async def batch_summarize(request: Request):
+    document_ids = batch_items(await read_json(request), "document_ids")
+    results = await gather_results([summarize_document(request, str(doc_id)) for doc_id in document_ids])
+    return JSONResponse({"results": _with_ids(results, document_ids)})
+
+
+async def batch_mcqs(request: Request):
+    body = await read_json(request)
+    document_ids = batch_items(body, "document_ids")
+    max_questions = max_questions_from(body)
+    results = await gather_results([
+        generate_document_mcqs(request, str(doc_id), max_questions) for doc_id in document_ids
+    ])
+    return JSONResponse({"results": _with_ids(results, document_ids)})
+
+
+async def batch_ask(request: Request):
+    items = batch_items(await read_json(request), "items")
+    coroutines = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise APIError("Each item must be an object with 'document_id' and 'question'.")
+        question, history = _parse_question(item)
+        coroutines.append(ask_document(request, str(item.get("document_id")), question, history))
+    results = await gather_results(coroutines)
+    return JSONResponse({"results": _with_ids(results, [item.get("document_id") for item in items])})
+
+
+def _with_ids(results: list, document_ids: list) -> list:
+    return [{"document_id": doc_id, **result} for doc_id, result in zip(document_ids, results)]
+
+
+async def handle_api_error(request: Request, exc: APIError):
+    return JSONResponse({"error": exc.message}, status_code=exc.status_code)
+
+
+async def handle_budget_exceeded(request: Request, exc: BudgetExceededError):
+    return JSONResponse({"error": str(exc)}, status_code=429)
+
+
+def deadline_from(request: Request, feature: str):
+    """Seconds the request may take: X-Deadline-S (capped at max_s) or the feature's configured default."""
+    default = CONFIG.deadlines.get(feature)
+    try:
+        seconds = float(request.headers.get("x-deadline-s", ""))
+    except ValueError:
+        return default
+    return min(seconds, CONFIG.deadline_max_s) if seconds > 0 else default
+
+
+class MeteringMiddleware:
+    """Attributes model usage to the caller, rejects callers over their budget up front and sets the request deadline."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        user_id = request.headers.get("x-user-id") or API_SESSION_ID
+        feature = METERED_FEATURES.get(scope["path"].rstrip("/").rsplit("/", 1)[-1])
+        # Worker threads and streaming tasks started below inherit this context
+        with metering_context(user_id=user_id, feature=feature or "other"), deadline_context(deadline_from(request, feature)):
+            if feature:
+                try:
+                    check_budget()
+                except BudgetExceededError as e:
+                    response = await handle_budget_exceeded(request, e)
+                    await response(scope, receive, send)
+                    return
+            await self.app(scope, receive, send)
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    app.state.limiter = anyio.CapacityLimiter(CONFIG.api_max_concurrency)
+    get_upload_store()
+    print(f"🚀 Helpy API ready (max {CONFIG.api_max_concurrency} concurrent model calls)")
+    yield
+
+
+app = Starlette(
+    routes=[
+        Route("/health", health, methods=["GET"]),
+        Route("/v1/documents", upload_document, methods=["POST"]),
+        Route("/v1/documents/{document_id}", delete_document, methods=["DELETE"]),
+        Route("/v1/documents/{document_id}/pack", export_study_pack, methods=["GET"]),
+        Route("/v1/packs", import_study_pack, methods=["POST"]),
+        Route("/v1/documents/{document_id}/summary", summarize, methods=["POST"]),
+        Route("/v1/documents/{document_id}/mcqs", generate_mcqs, methods=["POST"]),
+        Route("/v1/documents/{document_id}/ask", ask, methods=["POST"]),
+        Route("/v1/batch/summary", batch_summarize, methods=["POST"]),
+        Route("/v1/batch/mcqs", batch_mcqs, methods=["POST"]),
+        Route("/v1/batch/ask", batch_ask, methods=["POST"]),
+    ],
+    middleware=[Middleware(MeteringMiddleware)],
+    exception_handlers={APIError: handle_api_error, BudgetExceededError: handle_budget_exceeded},
+    lifespan=lifespan,
+)
@@ -1,15 +1,22 @@
+import io
 import os
-import glob
+import uuid
 import streamlit as st
 from dotenv import load_dotenv
 from langchain_openai import OpenAIEmbeddings
 
 from utils.load_config import LoadConfig
 from utils.summarizer import Summarizer
-from utils.generate_mcqs import MCQGenerator
+from utils.section_summaries import unit_label, format_range
+from utils.generate_mcqs import MCQGenerationJob
 from utils.chat_with_file import chat_with_file
 from utils.quiz_engine import QuizEngine
 from utils.session import reset_app_session
+from utils.session_store import get_session_store, report_session_memory
+from utils.metering import set_metering_user, metering_context, BudgetExceededError
+from utils.deadline import deadline_context, PartialResult
+from utils.upload_store import get_upload_store, UploadRejectedError
+from utils.study_pack import import_pack, export_pack, StudyPackError, PACK_EXTENSION
 
 # === Load environment variables ===
 load_dotenv()
@@ -26,29 +33,39 @@ st.markdown("""
     <link href="https://fonts.googleapis.com/css2?family=Dancing+Script&display=swap" rel="stylesheet">
 """, unsafe_allow_html=True)
 
-# === Load Custom CSS ===
-with open("styles.css") as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+# === Load Custom CSS (read once per process) ===
+@st.cache_resource(show_spinner=False)
+def load_css(path: str) -> str:
+    with open(path) as f:
+        return f"<style>{f.read()}</style>"
+
+st.markdown(load_css("styles.css"), unsafe_allow_html=True)
 
 # === Main Title ===
 st.markdown("<h1 class='main-title'>Helpy: Your Personal Assistant 📚 </h1>", unsafe_allow_html=True)
 st.markdown("---")
 
 # === Initialize Session State ===
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+# Model usage in this run is metered and budgeted per browser session
+set_metering_user(st.session_state.session_id)
+
 if "file_path" not in st.session_state:
     st.session_state.file_path = None
-    st.session_state.file_text = ""
-    st.session_state.questions = []
+    st.session_state.file_hash = None
+    st.session_state.file_name = None
+    # Only small handles live here; questions and chat history are in the shared session store
     st.session_state.current_question = 0
     st.session_state.score = 0
     st.session_state.answered = False
-    st.session_state.score_history = []
     st.session_state.active_tab = None
-    st.session_state.chat_history = []
+    st.session_state.mcq_job = None
 
-# === Define Upload Directory ===
-upload_dir = os.path.join("data", "uploads")
-os.makedirs(upload_dir, exist_ok=True)
+# === Content-addressed upload storage (shared across sessions) ===
+upload_store = get_upload_store()
+session_store = get_session_store()
 
 # === Upload UI (Before Upload) ===
 if not st.session_state.file_path:
@@ -66,38 +83,59 @@ if not st.session_state.file_path:
 
             uploaded_file = st.file_uploader(
                 label="Upload your file",
-                type=["pdf", "docx", "pptx", "xlsx", "txt"],
+                type=CONFIG.allowed_extensions,
                 label_visibility="collapsed"
             )
 
             st.markdown("</div></div>", unsafe_allow_html=True)
 
-    if uploaded_file:
+            # Packs carry the index, summary and questions; they're reused only where imports are trusted
+            with st.expander("📦 Open a study pack", expanded=False):
+                uploaded_pack = st.file_uploader(
+                    label="Study pack",
+                    type=[PACK_EXTENSION],
+                    label_visibility="collapsed",
+                    key="pack_uploader"
+                )
+
+    if uploaded_pack:
         try:
-            # Clean existing files in upload_dir
-            for old_file in glob.glob(os.path.join(upload_dir, "*")):
-                os.remove(old_file)
+            with st.spinner("Opening study pack..."):
+                stored = import_pack(uploaded_pack, st.session_state.session_id)
+            st.session_state.file_path = stored.path
+            st.session_state.file_hash = stored.digest
+            st.session_state.file_name = stored.file_name
+            st.toast("✅ Study pack loaded!", icon="📦")
+            if not CONFIG.study_pack_trust_imports:
+                st.info(
+                    "ℹ️ Study packs aren't trusted on this deployment, so the pack opened as a plain upload: "
+                    "its summary, questions and chat index will be computed from the document."
+                )
 
-            file_name = uploaded_file.name
-            file_path = os.path.join(upload_dir, file_name)
+        except (StudyPackError, UploadRejectedError) as e:
+            st.error(f"❌ {e}")
+        except Exception as e:
+            st.error(f"❌ Could not open the study pack: {e}")
 
-            # Save new file
-            with open(file_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
+    elif uploaded_file:
+        try:
+            # Streamed to disk and stored by content hash; other sessions' files are untouched
+            stored = upload_store.save(
+                uploaded_file,
+                uploaded_file.name,
+                st.session_state.session_id,
+                size=uploaded_file.size
+            )
+            file_name = stored.file_name
+            file_path = stored.path
 
             st.session_state.file_path = file_path
+            st.session_state.file_hash = stored.digest
+            st.session_state.file_name = file_name
             st.toast("✅ File uploaded successfully!", icon="📄")
 
-            # Optional PDF text extraction (basic preview only)
-            try:
-                if file_name.endswith(".pdf"):
-                    from PyPDF2 import PdfReader
-                    reader = PdfReader(file_path)
-                    text = "".join([page.extract_text() for page in reader.pages if page.extract_text()])
-                    st.session_state.file_text = text
-            except Exception as e:
-                st.warning(f"PDF preview extraction failed: {e}")
-
+        except UploadRejectedError as e:
+            st.error(f"❌ {e}")
         except Exception as e:
             st.error(f"❌ File upload failed: {e}")
 
@@ -114,39 +152,163 @@ if st.session_state.file_path:
             st.session_state.active_tab = "chat"
 
         st.markdown("---")
+        if st.button("📦 Export study pack"):
+            try:
+                with st.spinner("Packing..."), metering_context(feature="index"):
+                    buffer = io.BytesIO()
+                    manifest = export_pack(st.session_state.file_path, buffer)
+                st.download_button(
+                    "⬇️ Download study pack",
+                    buffer.getvalue(),
+                    file_name=f"{os.path.splitext(st.session_state.file_name)[0]}.{PACK_EXTENSION}",
+                    mime="application/zip"
+                )
+                st.caption(
+                    f"Includes {manifest['counts']['chunks']} chunks, "
+                    f"{'a summary' if 'summary.md' in manifest['entries'] else 'no summary yet'}, "
+                    f"{manifest['counts']['mcqs']} questions and {manifest['counts']['faq']} FAQ answers."
+                )
+            except (StudyPackError, BudgetExceededError) as e:
+                st.warning(f"⚠️ {e}")
+
         if st.button("📥 Upload new document"):
             reset_app_session()
 
+        # Always measured, so the per-session limit warning fires; the sidebar figure is optional
+        session_bytes, total_bytes, sessions = report_session_memory(
+            st.session_state, st.session_state.session_id, CONFIG.session_state_limit_kb
+        )
+        if CONFIG.show_session_memory:
+            st.caption(
+                f"🧠 Session state: {session_bytes / 1024:.0f} KB · "
+                f"all {sessions} sessions: {total_bytes / 1024:.0f} KB"
+            )
+
+# === Fragments: chat and quiz interactions rerun only their own section ===
+@st.fragment
+def chat_fragment(file_path: str):
+    chat_with_file(file_path)
+
+
+@st.fragment
+def range_summary_fragment(file_path: str):
+    # Built from stored per-chunk summaries, so a range costs one merge call once they exist
+    unit = unit_label(file_path)
+    total = len(Summarizer.extract_units(file_path))
+    if not unit or not total:
+        return
+
+    with st.expander(f"📑 Summarize specific {unit}s", expanded=False):
+        col1, col2 = st.columns(2)
+        start = col1.number_input(f"From {unit}", min_value=1, max_value=total, value=1, key="range_start")
+        end = col2.number_input(f"To {unit}", min_value=1, max_value=total, value=total, key="range_end")
+        if st.button(f"Summarize {format_range(unit, int(start), int(end))}", key="range_summarize"):
+            try:
+                with st.spinner("Summarizing..."), metering_context(feature="summary"), deadline_context(CONFIG.deadlines["summary"]):
+                    try:
+                        summary = Summarizer.summarize_range(file_path, int(start), int(end))
+                    except PartialResult as e:
+                        summary = e.result  # not cached, so asking again continues from the stored chunk summaries
+                st.markdown(f"<div class='summary-box'>{summary}</div>", unsafe_allow_html=True)
+            except ValueError as e:
+                st.warning(f"⚠️ {e}")
+            except BudgetExceededError as e:
+                st.warning(f"⏳ {e}")
+
+
+def current_questions(file_hash: str) -> list:
+    # A running job owns the list while it grows; afterwards every session reads the stored copy
+    job = st.session_state.mcq_job
+    if job is not None:
+        return job.questions
+    return session_store.load_questions(file_hash)
+
+
+def self_test_section(file_path: str, file_hash: str):
+    job = st.session_state.mcq_job
+    if job is not None and job.shareable:
+        # Persist once and drop the job, so the question list isn't held per session. A list
+        # stored by another session is never replaced (its quiz indexes into it); if that list
+        # differs, this session keeps its job and finishes the quiz on its own questions.
+        # Failed, partial or locally filled runs aren't stored, so the next session tries again.
+        stored = session_store.save_questions(file_hash, job.questions, replace=False)
+        if stored or session_store.load_questions(file_hash) == job.questions:
+            st.session_state.mcq_job = job = None
+
+    # Generation runs in the background; the quiz starts as soon as Q1 exists
+    if job is None and not session_store.load_questions(file_hash):
+        # Local fill-in-the-blank questions come first; LLM questions are appended as they arrive
+        with metering_context(feature="quiz"):
+            job = MCQGenerationJob.shared(
+                file_path,
+                max_questions=CONFIG.quiz_max_questions,
+                seed_questions=CONFIG.local_seed_questions
+            )
+        st.session_state.mcq_job = job
+        st.session_state.current_question = 0
+        st.session_state.score = 0
+        st.session_state.answered = False
+
+    generating = job is not None and not job.done
+
+    # Poll for new batches only while generation is still running
+    st.fragment(run_every=1 if generating else None)(quiz_fragment)(generating, file_hash)
+
+
+def quiz_fragment(was_generating: bool, file_hash: str):
+    job = st.session_state.mcq_job
+    generating = job is not None and not job.done
+
+    if was_generating and not generating:
+        # Generation finished: rerun the page once to stop polling and store the questions
+        st.rerun()
+
+    questions = current_questions(file_hash)
+    if questions or generating:
+        QuizEngine.start_quiz_session(questions, generating=generating)
+    else:
+        st.warning("⚠️ No questions could be generated from the uploaded document.")
+
+
 # === Main Feature Logic ===
 if st.session_state.file_path and st.session_state.active_tab:
 
     if st.session_state.active_tab == "summarize":
         st.subheader("📋 Summary")
-        with st.spinner("Generating summary..."):
-            summary = Summarizer.summarize_file(st.session_state.file_path)
-        with st.expander("🔍 View Summary", expanded=True):
-            st.markdown(f"<div class='summary-box'>{summary}</div>", unsafe_allow_html=True)
+        file_path = st.session_state.file_path
+
+        # The local key-sentence preview shows instantly; the LLM summary replaces it
+        summary_slot = st.empty()
+        preview = Summarizer.extractive_preview(file_path)
+        if preview:
+            with summary_slot.container():
+                st.caption("⚡ Quick preview from key sentences. The full summary is on its way...")
+                st.markdown(preview)
+
+        try:
+            with st.spinner("Generating summary..."), metering_context(feature="summary"), deadline_context(CONFIG.deadlines["summary"]):
+                try:
+                    summary = Summarizer.summarize_file(file_path)
+                except PartialResult as e:
+                    summary = e.result  # not cached, so reopening the tab tries for the full summary again
+            with summary_slot.container():
+                with st.expander("🔍 View Summary", expanded=True):
+                    st.markdown(f"<div class='summary-box'>{summary}</div>", unsafe_allow_html=True)
+        except BudgetExceededError as e:
+            st.warning(f"⏳ {e}")
+
+        if preview:
+            with st.expander("⚡ Key sentences", expanded=False):
+                st.markdown(preview)
+
+        range_summary_fragment(file_path)
 
     elif st.session_state.active_tab == "chat":
         st.markdown("<div class='chat-wrapper'>", unsafe_allow_html=True)
-        chat_with_file(st.session_state.file_path)
+        chat_fragment(st.session_state.file_path)
         st.markdown("</div>", unsafe_allow_html=True)
 
     elif st.session_state.active_tab == "self_test":
         st.subheader("❓ Self-Test Mode")
 
-        if not st.session_state.questions:
-            with st.spinner("Generating questions..."):
-                questions = MCQGenerator.generate_mcqs_from_file(
-                    st.session_state.file_path, max_questions=10
-                )
-                if questions:
-                    st.session_state.questions = questions
-                    st.session_state.current_question = 0
-                    st.session_state.score = 0
-                    st.session_state.answered = False
-                else:
-                    st.warning("⚠️ No questions could be generated from the uploaded document.")
-
-        if st.session_state.questions:
-            QuizEngine.start_quiz_session(st.session_state.questions)
+        self_test_section(st.session_state.file_path, st.session_state.file_hash)
@@ -0,0 +1,216 @@
+"""
+Shared vector index service for multi-replica deployments.
+
+App replicas configured with `vector_store_config.backend: "remote"` send
+precomputed chunk embeddings here once per document and search by query
+vector afterwards, so an index is built once and served to every replica
+instead of each replica keeping its own local copy. Indexes are stored with
+a local backend (numpy or chroma) under `index_server_config.directory` and
+published as atomic versions like the embedded mode.
+
+Endpoints:
+    GET  /health                     constant-time liveness, for probes and clients
+    GET  /stats                      backend and published index count
+    GET  /v1/indexes/{name}          published version info, 404 if none
+    PUT  /v1/indexes/{name}          {"texts", "metadatas", "embeddings", "info"}: publish a new version
+    POST /v1/indexes/{name}/search   {"embedding", "k"}: top k passages with scores
+
+Run one instance that every replica can reach (a sidecar or a small service):
+    uvicorn index_server:app --host 0.0.0.0 --port 8100
+"""
+import re
+import json
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import anyio
+from langchain_core.documents import Document
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from utils.load_config import LoadConfig
+from utils.vector_store import get_vector_store_backend, PrecomputedEmbeddings
+from utils import index_versions
+
+CONFIG = LoadConfig()
+INDEX_NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,127}$")
+# Bodies above this size (embedding uploads) are parsed on a worker thread, not the event loop
+INLINE_JSON_BYTES = 64 * 1024
+
+
+class IndexServerError(Exception):
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class IndexRegistry:
+    """Local indexes by name, with recently searched ones kept open."""
+
+    def __init__(self, root: Path, backend_name: str, options: dict, max_open: int = 64):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.backend = get_vector_store_backend(backend_name, options)
+        self.max_open = max_open
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+
+    def directory(self, name: str) -> str:
+        if not INDEX_NAME_PATTERN.match(name or ""):
+            raise IndexServerError(f"Invalid index name: {name!r}")
+        return str(self.root / name)
+
+    def info(self, name: str) -> dict:
+        index_directory = self.directory(name)
+        if not self.backend.is_published(index_directory):
+            raise IndexServerError(f"Unknown index: {name}", status_code=404)
+        manifest = index_versions.read_manifest(index_directory) or {}
+        return {"name": name, "backend": self.backend.name, **manifest}
+
+    def publish(self, name: str, texts: list, metadatas: list, embeddings: list, info: dict) -> dict:
+        documents = [Document(page_content=text, metadata=metadata or {}) for text, metadata in zip(texts, metadatas)]
+        self.backend.publish(documents, PrecomputedEmbeddings(embeddings), self.directory(name), info)
+        return self.info(name)
+
+    def store(self, name: str):
+        # Keyed by the published directory, so a new version is opened fresh and old handles age out
+        published = self.backend.published_directory(self.directory(name))
+        if published is None:
+            raise IndexServerError(f"Unknown index: {name}", status_code=404)
+        with self._lock:
+            store = self._open.get(published)
+            if store is not None:
+                self._open.move_to_end(published)
+                return store
+        store = self.backend.open(published, PrecomputedEmbeddings([]))
+        with self._lock:
+            self._open[published] = store
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+        return store
+
+    def search(self, name: str, embedding: list, k: int) -> list:
+        store = self.store(name)
+        relevance = store._select_relevance_score_fn()
+        return [
+            {"page_content": doc.page_content, "metadata": doc.metadata, "score": float(score), "relevance": float(relevance(score))}
+            for doc, score in store.similarity_search_with_score_by_vector(embedding, k=k)
+        ]
+
+    def count(self) -> int:
+        return sum(1 for path in self.root.iterdir() if path.is_dir() and self.backend.is_published(str(path)))
+
+
+# === Helpers ===
+async def run_blocking(request: Request, fn, *args):
+    return await anyio.to_thread.run_sync(lambda: fn(*args), limiter=request.app.state.limiter)
+
+
+async def read_json(request: Request) -> dict:
+    max_bytes = int(CONFIG.index_server_max_body_mb * 1024 * 1024)
+    too_large = IndexServerError(f"Request body exceeds {CONFIG.index_server_max_body_mb} MB.", status_code=413)
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > max_bytes:
+        raise too_large
+    raw = bytearray()
+    async for chunk in request.stream():
+        raw.extend(chunk)
+        if len(raw) > max_bytes:
+            raise too_large
+    try:
+        if len(raw) > INLINE_JSON_BYTES:
+            body = await run_blocking(request, json.loads, bytes(raw))
+        else:
+            body = json.loads(raw)
+    except ValueError:
+        raise IndexServerError("Request body must be valid JSON.")
+    if not isinstance(body, dict):
+        raise IndexServerError("Request body must be a JSON object.")
+    return body
+
+
+# === Endpoints ===
+async def health(request: Request):
+    # Constant time and off the limiter: a server busy with builds is still healthy
+    return JSONResponse({"status": "ok", "backend": request.app.state.registry.backend.name})
+
+
+async def stats(request: Request):
+    registry = request.app.state.registry
+    # Reads every index's manifest; its own limiter keeps it from queueing behind builds
+    count = await anyio.to_thread.run_sync(registry.count, limiter=request.app.state.stats_limiter)
+    return JSONResponse({"backend": registry.backend.name, "indexes": count})
+
+
+async def get_index(request: Request):
+    registry = request.app.state.registry
+    return JSONResponse(await run_blocking(request, registry.info, request.path_params["name"]))
+
+
+async def put_index(request: Request):
+    body = await read_json(request)
+    texts, metadatas, embeddings = body.get("texts"), body.get("metadatas"), body.get("embeddings")
+    if not isinstance(texts, list) or not texts:
+        raise IndexServerError("'texts' must be a non-empty list.")
+    if not isinstance(embeddings, list) or len(embeddings) != len(texts):
+        raise IndexServerError("'embeddings' must hold one vector per text.")
+    if not isinstance(metadatas, list) or len(metadatas) != len(texts):
+        metadatas = [{}] * len(texts)
+
+    registry = request.app.state.registry
+    info = await run_blocking(
+        request, registry.publish, request.path_params["name"], texts, metadatas, embeddings, body.get("info") or {}
+    )
+    return JSONResponse(info, status_code=201)
+
+
+async def search_index(request: Request):
+    body = await read_json(request)
+    embedding = body.get("embedding")
+    if not isinstance(embedding, list) or not embedding:
+        raise IndexServerError("'embedding' must be a non-empty list of numbers.")
+    try:
+        k = int(body.get("k", CONFIG.k))
+    except (TypeError, ValueError):
+        raise IndexServerError("'k' must be an integer.")
+    if not 1 <= k <= 100:
+        raise IndexServerError("'k' must be between 1 and 100.")
+
+    registry = request.app.state.registry
+    results = await run_blocking(request, registry.search, request.path_params["name"], embedding, k)
+    return JSONResponse({"results": results})
+
+
+async def handle_error(request: Request, exc: IndexServerError):
+    return JSONResponse({"error": exc.message}, status_code=exc.status_code)
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    app.state.limiter = anyio.CapacityLimiter(CONFIG.index_server_max_concurrency)
+    app.state.stats_limiter = anyio.CapacityLimiter(1)
+    app.state.registry = IndexRegistry(
+        CONFIG.index_server_directory,
+        CONFIG.index_server_backend,
+        CONFIG.index_server_options
+    )
+    print(f"🗂️ Index server ready ({CONFIG.index_server_backend} indexes in {CONFIG.index_server_directory})")
+    yield
+
+
+app = Starlette(
+    routes=[
+        Route("/health", health, methods=["GET"]),
+        Route("/stats", stats, methods=["GET"]),
+        Route("/v1/indexes/{name}", get_index, methods=["GET"]),
+        Route("/v1/indexes/{name}", put_index, methods=["PUT"]),
+        Route("/v1/indexes/{name}/search", search_index, methods=["POST"]),
+    ],
+    exception_handlers={IndexServerError: handle_error},
+    lifespan=lifespan,
+)
@@ -0,0 +1,331 @@
+"""
+Pre-generate study packs for a directory (or glob) of lecture files.
+
+For every file: extract text, build the per-document vector index, summarize
+and generate MCQs. Text extraction runs in a process pool; the API-bound
+stages run with bounded async concurrency, so total time tracks API quota
+rather than file count. Progress is recorded in a manifest keyed by content
+hash, so an interrupted run resumes where it stopped and unchanged files are
+never reprocessed.
+
+Outputs (in --out):
+    manifest.json     per-file stage status and errors
+    summaries.jsonl   {"document_id", "file", "summary"}
+    mcqs.jsonl        {"document_id", "file", "questions"}
+
+Indexes, summaries and MCQs are also stored where the app and API look for
+them (keyed by content hash): the index directory, the persisted shared
+results the summary and quiz features read, and the document's stored quiz.
+Uploading the same file later reuses them instead of calling the API again.
+Indexes are built from the text the parse pool extracted (page by page for
+PDFs), so no file is parsed twice. The JSONL files hold one record per document, the
+latest, also after --force or a resumed run.
+
+Usage:
+    python -m scripts.build_study_packs lectures/ --concurrency 16
+    python -m scripts.build_study_packs "lectures/**/*.pdf" --stages summary,mcqs
+"""
+import os
+import sys
+import glob
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from utils.load_config import LoadConfig
+from utils.pdf_pages import resolve_workers
+from utils.vector_store import get_vector_store_backend, index_directory_for
+from utils.metering import metering_context
+from utils.single_flight import get_single_flight
+from utils.session_store import get_session_store
+
+CONFIG = LoadConfig()
+STAGES = ["index", "summary", "mcqs"]
+
+
+def discover_files(inputs: list, allowed_extensions: list) -> list:
+    """Expand directories (recursively) and glob patterns into supported files."""
+    found = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            candidates = path.rglob("*")
+        elif path.is_file():
+            candidates = [path]
+        else:
+            candidates = (Path(match) for match in glob.glob(item, recursive=True))
+        for candidate in candidates:
+            if candidate.is_file() and candidate.suffix.lower().lstrip(".") in allowed_extensions:
+                found.append(candidate.resolve())
+    return sorted(set(found))
+
+
+def file_digest(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    hasher = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _init_parse_worker():
+    # Files are the unit of parallelism here; don't fan out again per PDF
+    from utils import summarizer
+    summarizer.CONFIG.pdf_workers = 1
+
+
+def parse_file(file_path: str) -> dict:
+    """
+    Runs in a worker process: hash and extract one file.
+
+    PDFs are extracted page by page, so the index gets the same page
+    metadata as when the app builds it; other formats as one text.
+    """
+    from utils.summarizer import Summarizer
+    from utils.pdf_pages import extract_pdf_pages
+
+    start = time.perf_counter()
+    digest = file_digest(file_path)
+    pages = None
+    try:
+        if file_path.lower().endswith(".pdf"):
+            pages = extract_pdf_pages(file_path, workers=1)
+            text = "\n".join(page_text for _, page_text in pages)
+        else:
+            text = Summarizer.extract_text_from_file(file_path)
+    except Exception as e:
+        text = f"❌ Error reading file: {e}"
+    if text.startswith("❌"):
+        return {"digest": digest, "text": "", "pages": None, "error": text}
+    return {"digest": digest, "text": text, "pages": pages, "error": None, "parse_s": time.perf_counter() - start}
+
+
+class Manifest:
+    """Per-document stage status, rewritten atomically after every change."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries = json.loads(path.read_text()) if path.exists() else {}
+
+    def is_done(self, document_id: str, stage: str) -> bool:
+        return self.entries.get(document_id, {}).get("stages", {}).get(stage) == "done"
+
+    def record(self, document_id: str, file_path: str, stage: str, error: str = None, seconds: float = None):
+        entry = self.entries.setdefault(document_id, {"file": file_path, "stages": {}, "errors": {}})
+        entry["file"] = file_path
+        entry["stages"][stage] = "failed" if error else "done"
+        if error:
+            entry["errors"][stage] = error
+        else:
+            entry["errors"].pop(stage, None)
+        if seconds is not None:
+            entry.setdefault("seconds", {})[stage] = round(seconds, 2)
+        self.save()
+
+    def save(self):
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.entries, indent=2))
+        os.replace(tmp_path, self.path)
+
+
+class StudyPackBuilder:
+    def __init__(self, out_dir: Path, stages: list, concurrency: int, max_questions: int, force: bool = False):
+        self.out_dir = out_dir
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.stages = stages
+        self.max_questions = max_questions
+        self.force = force
+        self.manifest = Manifest(out_dir / "manifest.json")
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.backend = get_vector_store_backend(CONFIG.vector_store_backend, CONFIG.vector_store_options)
+        self.failures = 0
+        self._write_lock = threading.Lock()
+
+    def _pending(self, document_id: str) -> list:
+        return [stage for stage in self.stages if self.force or not self.manifest.is_done(document_id, stage)]
+
+    def _append_jsonl(self, name: str, record: dict):
+        with self._write_lock, open(self.out_dir / name, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _compact_jsonl(self, name: str):
+        """Keep only the latest record per document_id (reruns and --force append new ones)."""
+        path = self.out_dir / name
+        if not path.exists():
+            return
+        latest = {}
+        for line in path.read_text(encoding="utf-8").splitlines():
+            if line.strip():
+                record = json.loads(line)
+                latest.pop(record["document_id"], None)  # re-insert so the order follows the latest write
+                latest[record["document_id"]] = record
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in latest.values()), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def _shared_result(self, job_type: str, key: str, fn, keep):
+        """Run through the app's shared job store, so its persisted result is what uploads find later."""
+        if not self.force:
+            return get_single_flight().do(job_type, key, fn, persist=True, keep=keep)
+        result = fn()
+        if keep(result):
+            get_single_flight().save_result(job_type, key, result)
+        return result
+
+    # === Stages (blocking; run on worker threads) ===
+    def build_index(self, file_path: str, document_id: str, parsed: dict):
+        from langchain_core.documents import Document
+        from utils.prepare_vectordb import PrepareVectorDB
+
+        # Same location the app derives from the uploaded file's content-hash name
+        index_directory = index_directory_for(CONFIG.custom_persist_directory, document_id, self.backend.name)
+        if self.backend.is_published(index_directory) and not self.force:
+            return
+        # The parse pool's text: same metadata shape as PrepareVectorDB's own loaders
+        if parsed["pages"]:
+            documents = [
+                Document(page_content=text, metadata={"source": file_path, "page": page})
+                for page, text in parsed["pages"]
+            ]
+        else:
+            documents = [Document(page_content=parsed["text"], metadata={"source": file_path})]
+        processor = PrepareVectorDB(
+            data_directory=[file_path],
+            persist_directory=index_directory,
+            openai_api_key=CONFIG.openai_api_key,
+            chunk_size=CONFIG.chunk_size,
+            chunk_overlap=CONFIG.chunk_overlap,
+            pdf_workers=1,
+            vector_store_backend=self.backend.name,
+            vector_store_options=CONFIG.vector_store_options,
+            hierarchical_min_chunks=CONFIG.hierarchical_min_chunks,
+            section_chunks=CONFIG.section_chunks,
+            documents=documents
+        )
+        # A running app (or a second batch run) building the same index is waited for, not repeated
+        get_single_flight().do(
+            "index", f"{self.backend.name}-{Path(document_id).stem}",
+            processor.prepare_and_save_vectordb,
+            done=None if self.force else lambda: self.backend.is_published(index_directory)
+        )
+
+    def build_summary(self, file_path: str, document_id: str, parsed: dict):
+        from utils.summarizer import Summarizer
+
+        # Same job and key as Summarizer._summarize_file_cached
+        summary = self._shared_result(
+            "summary", parsed["digest"], lambda: Summarizer.summarize_text(parsed["text"]),
+            keep=lambda summary: bool(summary) and not summary.startswith("❌")
+        )
+        if not summary or summary.startswith("❌"):
+            raise RuntimeError(summary or "empty summary")
+        self._append_jsonl("summaries.jsonl", {"document_id": document_id, "file": file_path, "summary": summary})
+
+    def build_mcqs(self, file_path: str, document_id: str, parsed: dict):
+        from utils.generate_mcqs import MCQGenerator
+
+        def generate():
+            questions = []
+            for batch in MCQGenerator.iter_mcq_batches_from_text(parsed["text"], max_questions=self.max_questions):
+                questions.extend(batch)
+            return questions
+
+        # Same job and key as MCQGenerator._llm_mcqs_shared
+        questions = self._shared_result("mcqs", f"{parsed['digest']}-{self.max_questions}", generate, keep=bool)
+        if not questions:
+            raise RuntimeError("no questions generated")
+        if self.max_questions == CONFIG.quiz_max_questions:
+            # The app's quiz reads the document's stored list first; one already in use is kept
+            get_session_store().save_questions(parsed["digest"], questions, replace=False)
+        self._append_jsonl("mcqs.jsonl", {"document_id": document_id, "file": file_path, "questions": questions})
+
+    async def _run_stage(self, stage: str, file_path: str, document_id: str, parsed: dict):
+        fn = {"index": self.build_index, "summary": self.build_summary, "mcqs": self.build_mcqs}[stage]
+        async with self.semaphore:
+            start = time.perf_counter()
+            try:
+                # Metered as the exempt "batch" user, per stage
+                with metering_context(user_id="batch", feature=stage):
+                    await asyncio.to_thread(fn, file_path, document_id, parsed)
+                error = None
+            except Exception as e:
+                traceback.print_exc()
+                error = f"{type(e).__name__}: {e}"
+                self.failures += 1
+        self.manifest.record(document_id, file_path, stage, error, time.perf_counter() - start)
+        print(f"{'❌' if error else '✅'} {stage:<8} {Path(file_path).name}" + (f" ({error})" if error else ""))
+
+    async def process(self, file_path: str, parsed: dict):
+        document_id = f"{parsed['digest']}{Path(file_path).suffix.lower()}"
+        if parsed["error"] or not parsed["text"].strip():
+            self.failures += 1
+            self.manifest.record(document_id, file_path, "parse", parsed["error"] or "no text extracted")
+            print(f"❌ parse    {Path(file_path).name}")
+            return
+        await asyncio.gather(*[
+            self._run_stage(stage, file_path, document_id, parsed)
+            for stage in self._pending(document_id)
+        ])
+
+    async def run(self, files: list, parse_workers: int):
+        loop = asyncio.get_running_loop()
+        # Blocking stages run on the default executor; size it so it never caps the semaphore
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=self.concurrency))
+        # Skip parsing entirely for files whose stages are all done (hashing is cheap)
+        todo = []
+        for path in files:
+            document_id = f"{file_digest(str(path))}{path.suffix.lower()}"
+            if self._pending(document_id):
+                todo.append(path)
+        print(f"📚 {len(files)} file(s) found, {len(files) - len(todo)} already complete, {len(todo)} to process")
+        if not todo:
+            return
+
+        with ProcessPoolExecutor(max_workers=resolve_workers(parse_workers), initializer=_init_parse_worker) as pool:
+            async def parse_then_process(path: Path):
+                parsed = await loop.run_in_executor(pool, parse_file, str(path))
+                await self.process(str(path), parsed)
+
+            await asyncio.gather(*[parse_then_process(path) for path in todo])
+
+        for name in ("summaries.jsonl", "mcqs.jsonl"):
+            self._compact_jsonl(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate indexes, summaries and MCQs for many files.")
+    parser.add_argument("inputs", nargs="+", help="directories, files or glob patterns")
+    parser.add_argument("--out", default=str(CONFIG.batch_output_directory), help="output directory for manifest and JSONL")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"comma-separated subset of {STAGES}")
+    parser.add_argument("--concurrency", type=int, default=CONFIG.batch_max_concurrency, help="API-bound stages running at once")
+    parser.add_argument("--parse-workers", type=int, default=CONFIG.batch_parse_workers, help="extraction processes (0 = all cores)")
+    parser.add_argument("--max-questions", type=int, default=CONFIG.quiz_max_questions, help="questions per document (the app's quiz uses quiz_config.max_questions)")
+    parser.add_argument("--force", action="store_true", help="redo stages already marked done in the manifest")
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+
+    files = discover_files(args.inputs, CONFIG.allowed_extensions)
+    if not files:
+        print("⚠️ No supported files found.")
+        return 1
+
+    builder = StudyPackBuilder(Path(args.out), stages, args.concurrency, args.max_questions, args.force)
+    start = time.perf_counter()
+    asyncio.run(builder.run(files, args.parse_workers))
+    print(f"🏁 Done in {time.perf_counter() - start:.1f}s with {builder.failures} failure(s). Output: {args.out}")
+    return 1 if builder.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+Minimal OpenAI-compatible server for load tests and local development.
+
+Serves /v1/chat/completions (including SSE streaming) and /v1/embeddings with
+deterministic canned output and a configurable artificial latency, so the app
+can be driven end to end without API keys or quota.
+
+Usage:
+    python -m scripts.fake_openai_server --port 8765 --latency-ms 300
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 streamlit run app.py
+"""
+import re
+import json
+import time
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+def fake_mcqs(count: int) -> str:
+    blocks = []
+    for i in range(1, count + 1):
+        blocks.append(
+            f"Q: Sample question {i} about the uploaded material?\n"
+            f"A. Correct statement {i}\n"
+            f"B. Distractor one\n"
+            f"C. Distractor two\n"
+            f"D. Distractor three\n"
+            f"Answer: A"
+        )
+    return "\n\n".join(blocks)
+
+
+def fake_completion_text(messages: list) -> str:
+    prompt = messages[-1]["content"] if messages else ""
+    if "multiple-choice" in prompt:
+        match = re.search(r"Generate (\d+)", prompt)
+        return fake_mcqs(int(match.group(1)) if match else 3)
+    if "Standalone question:" in prompt:
+        return prompt.rsplit("Follow-up question:", 1)[-1].split("\n")[0].strip()
+    if "summar" in prompt.lower():
+        return "This document covers the key definition, purpose and features of the topic for exam revision."
+    return "Based on the document, the answer is explained in the retrieved section."
+
+
+def fake_embedding(item, dims: int) -> list:
+    # Token-id lists (sent by langchain) and strings both hash to a stable vector
+    seed = int(hashlib.sha256(json.dumps(item).encode()).hexdigest()[:8], 16)
+    vector = np.random.default_rng(seed).normal(size=dims)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    latency_s = 0.0
+    dims = 1536
+    request_count = 0
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass  # keep load-test output readable
+
+    def _send_json(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/health"):
+            return self._send_json({"status": "ok", "requests": FakeOpenAIHandler.request_count})
+        self._send_json({"error": {"message": "not found"}}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        with FakeOpenAIHandler.lock:
+            FakeOpenAIHandler.request_count += 1
+        time.sleep(self.latency_s)
+
+        if self.path.endswith("/chat/completions"):
+            return self._chat(request)
+        if self.path.endswith("/embeddings"):
+            return self._embeddings(request)
+        self._send_json({"error": {"message": f"unknown path {self.path}"}}, status=404)
+
+    def _chat(self, request: dict):
+        text = fake_completion_text(request.get("messages", []))
+        model = request.get("model", "fake-model")
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in request.get("messages", []))
+        completion_tokens = len(text.split())
+
+        if not request.get("stream"):
+            return self._send_json({
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            chunk = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": word + (" " if i < len(words) - 1 else "")}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        done = {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+        }
+        self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode())
+
+    def _embeddings(self, request: dict):
+        inputs = request.get("input", [])
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        data = [
+            {"object": "embedding", "index": i, "embedding": fake_embedding(item, self.dims)}
+            for i, item in enumerate(inputs)
+        ]
+        tokens = sum(len(item) if isinstance(item, list) else len(str(item).split()) for item in inputs)
+        self._send_json({
+            "object": "list",
+            "data": data,
+            "model": request.get("model", "fake-embedding"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+
+def start_fake_server(host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0, dims: int = 1536) -> ThreadingHTTPServer:
+    """Start the server on a daemon thread; port 0 picks a free port."""
+    handler = type("ConfiguredFakeOpenAIHandler", (FakeOpenAIHandler,), {"latency_s": latency_ms / 1000.0, "dims": dims})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI API for Helpy load tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=200, help="artificial delay per request")
+    parser.add_argument("--dims", type=int, default=1536, help="embedding dimensions")
+    args = parser.parse_args()
+
+    server = start_fake_server(args.host, args.port, args.latency_ms, args.dims)
+    print(f"🧪 Fake OpenAI server on http://{args.host}:{server.server_address[1]}/v1 (latency {args.latency_ms} ms)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
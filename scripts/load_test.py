@@ -0,0 +1,249 @@
+"""
+Concurrent-session load test for the Streamlit app.
+
+Drives headless sessions of app.py through the real flow (upload, summarize,
+self-test, chat) with Streamlit's AppTest, against a local fake OpenAI server,
+and ramps concurrency while recording per-action latency percentiles, error
+rates, process memory and CPU. All sessions share one process, like the
+sessions of one app replica.
+
+Usage:
+    python -m scripts.load_test --levels 1,4,8,16 --sessions-per-level 16
+    python -m scripts.load_test --base-url http://127.0.0.1:8765/v1 --json-out load.json
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import resource
+import argparse
+import traceback
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+APP_PATH = str(ROOT / "app.py")
+ACTIONS = ["page_load", "upload", "summarize", "self_test_first_question", "quiz_answer", "chat_open", "chat_message"]
+
+SAMPLE_TEXT = (
+    "Cell biology studies the structure and function of cells. The cell membrane is a semi-permeable "
+    "barrier that controls what enters and leaves the cell. Osmosis is the diffusion of water across "
+    "the membrane from low to high solute concentration. Active transport uses energy from ATP to move "
+    "substances against their concentration gradient. Mitochondria produce ATP through cellular "
+    "respiration, while chloroplasts capture light energy during photosynthesis. "
+) * 20
+
+
+def percentile_summary(samples: list) -> dict:
+    if not samples:
+        return {"count": 0}
+    values = np.asarray(samples, dtype=float)
+    return {
+        "count": len(samples),
+        "p50": float(np.percentile(values, 50)),
+        "p90": float(np.percentile(values, 90)),
+        "p99": float(np.percentile(values, 99)),
+        "max": float(values.max()),
+    }
+
+
+def process_memory_mb() -> dict:
+    """Current and peak resident set size of this process."""
+    status = Path("/proc/self/status")
+    if status.exists():
+        fields = dict(line.split(":", 1) for line in status.read_text().splitlines() if ":" in line)
+        return {
+            "rss_mb": int(fields["VmRSS"].split()[0]) / 1024,
+            "peak_rss_mb": int(fields["VmHWM"].split()[0]) / 1024,
+        }
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    return {"rss_mb": None, "peak_rss_mb": peak_mb}
+
+
+class SessionDriver:
+    """One simulated student going through the app once."""
+
+    def __init__(self, file_name: str, content: bytes, timeout: float, quiz_wait: float):
+        from streamlit.testing.v1 import AppTest
+
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.file_name = file_name
+        self.content = content
+        self.quiz_wait = quiz_wait
+        self.timings = {}
+        self.errors = {}
+
+    def _failure(self):
+        if self.at.exception:
+            return self.at.exception[0].value
+        if self.at.error:
+            return self.at.error[0].value
+        return None
+
+    def _step(self, action: str, fn):
+        start = time.perf_counter()
+        try:
+            fn()
+            failure = self._failure()
+        except Exception as e:
+            failure = f"{type(e).__name__}: {e}"
+        self.timings[action] = time.perf_counter() - start
+        if failure:
+            self.errors[action] = str(failure)[:300]
+        return failure is None
+
+    def _sidebar_button(self, text: str):
+        return next(b for b in self.at.sidebar.button if text in b.label)
+
+    def _quiz_ready(self) -> bool:
+        return any("quiz-box" in m.value for m in self.at.markdown)
+
+    def _wait_for_quiz(self):
+        self._sidebar_button("Self-Test").click().run()
+        deadline = time.perf_counter() + self.quiz_wait
+        while not self._quiz_ready():
+            if self.at.warning or time.perf_counter() > deadline:
+                raise RuntimeError("quiz did not produce a question")
+            time.sleep(0.1)
+            self.at.run()
+
+    def _answer_question(self):
+        # The app reruns once when background generation finishes; wait for the settled quiz
+        deadline = time.perf_counter() + self.quiz_wait
+        while not any(b.key == "submit_0" for b in self.at.button):
+            if time.perf_counter() > deadline:
+                raise RuntimeError("submit button never appeared")
+            time.sleep(0.1)
+            self.at.run()
+        self.at.button(key="submit_0").click().run()
+
+    def run(self):
+        steps = [
+            ("page_load", lambda: self.at.run()),
+            ("upload", lambda: self.at.file_uploader[0].set_value((self.file_name, self.content, "text/plain")).run()),
+            ("summarize", lambda: self._sidebar_button("Summarize").click().run()),
+            ("self_test_first_question", self._wait_for_quiz),
+            ("quiz_answer", self._answer_question),
+            ("chat_open", lambda: self._sidebar_button("Chat").click().run()),
+            ("chat_message", lambda: self.at.chat_input[0].set_value("What does the membrane control?").run()),
+        ]
+        for action, fn in steps:
+            if not self._step(action, fn):
+                break  # later steps depend on earlier ones
+        return self.timings, self.errors
+
+
+def run_level(concurrency: int, sessions: int, args) -> dict:
+    def one_session(i):
+        if args.file:
+            content = Path(args.file).read_bytes()
+            file_name = Path(args.file).name
+        else:
+            content = SAMPLE_TEXT.encode()
+            file_name = "lecture_notes.txt"
+        if args.unique_files:
+            # Trailing bytes change the content hash; PDF readers ignore data after %%EOF
+            content += f"\nSession marker {uuid.uuid4().hex}".encode()
+        try:
+            return SessionDriver(file_name, content, args.timeout, args.quiz_wait).run()
+        except Exception as e:
+            traceback.print_exc()
+            return {}, {"session": f"{type(e).__name__}: {e}"}
+
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one_session, range(sessions)))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    latencies, errors, samples = defaultdict(list), defaultdict(int), {}
+    for timings, session_errors in results:
+        for action, seconds in timings.items():
+            latencies[action].append(seconds)
+        for action, message in session_errors.items():
+            errors[action] += 1
+            samples.setdefault(action, message)
+
+    return {
+        "concurrency": concurrency,
+        "sessions": sessions,
+        "wall_s": wall,
+        "sessions_per_s": sessions / wall if wall else None,
+        "cpu_percent": 100.0 * cpu / wall if wall else None,
+        "memory": process_memory_mb(),
+        "actions": {
+            action: {
+                **percentile_summary(latencies.get(action, [])),
+                "errors": errors.get(action, 0),
+                "error_rate": errors.get(action, 0) / sessions,
+            }
+            for action in ACTIONS + (["session"] if "session" in errors else [])
+        },
+        "error_samples": samples,
+    }
+
+
+def print_level(report: dict):
+    mem = report["memory"]
+    print(
+        f"\n=== concurrency {report['concurrency']} | {report['sessions']} sessions in {report['wall_s']:.1f}s "
+        f"| CPU {report['cpu_percent']:.0f}% | RSS {mem['rss_mb'] or 0:.0f} MB (peak {mem['peak_rss_mb']:.0f} MB) ==="
+    )
+    print(f"{'action':<26}{'n':>5}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}{'err%':>7}")
+    for action, stats in report["actions"].items():
+        if not stats.get("count") and not stats["errors"]:
+            continue
+        row = f"{action:<26}{stats.get('count', 0):>5}"
+        for key in ("p50", "p90", "p99", "max"):
+            row += f"{stats[key]:>8.2f}s" if key in stats else f"{'-':>9}"
+        row += f"{100 * stats['error_rate']:>6.1f}%"
+        print(row)
+    for action, message in report["error_samples"].items():
+        print(f"  ⚠️ {action}: {message}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test app.py with concurrent headless sessions.")
+    parser.add_argument("--levels", default="1,2,4,8", help="comma-separated concurrency levels to ramp through")
+    parser.add_argument("--sessions-per-level", type=int, default=0, help="sessions per level (default: 2 x concurrency)")
+    parser.add_argument("--base-url", default=None, help="use an already running OpenAI-compatible server")
+    parser.add_argument("--latency-ms", type=float, default=200, help="latency of the built-in fake server")
+    parser.add_argument("--file", default=None, help="document to upload (default: generated lecture notes)")
+    parser.add_argument("--unique-files", action="store_true", help="make every session's upload unique (defeats caches)")
+    parser.add_argument("--timeout", type=float, default=120, help="per-run AppTest timeout in seconds")
+    parser.add_argument("--quiz-wait", type=float, default=60, help="max seconds to wait for the first question")
+    parser.add_argument("--json-out", default=None, help="write the full report as JSON")
+    args = parser.parse_args()
+
+    if args.base_url is None:
+        from scripts.fake_openai_server import start_fake_server
+        server = start_fake_server(latency_ms=args.latency_ms)
+        args.base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+        print(f"🧪 Started fake OpenAI server at {args.base_url}")
+
+    # Must be set before the app's modules create their OpenAI clients
+    os.environ["OPENAI_API_KEY"] = os.environ.get("OPENAI_API_KEY", "sk-load-test")
+    os.environ["OPENAI_BASE_URL"] = args.base_url
+    os.environ["OPENAI_API_BASE"] = args.base_url
+    os.chdir(ROOT)
+
+    reports = []
+    for concurrency in [int(level) for level in args.levels.split(",")]:
+        sessions = args.sessions_per_level or 2 * concurrency
+        report = run_level(concurrency, sessions, args)
+        print_level(report)
+        reports.append(report)
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(reports, f, indent=2)
+        print(f"\n📝 Report written to {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
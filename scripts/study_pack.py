@@ -0,0 +1,75 @@
+"""
+Export study packs for lecture files, or show what a pack contains.
+
+A study pack (utils/study_pack.py) holds a document with everything the app
+computed for it: text, chunks and embeddings, summary, MCQ bank and FAQ.
+Students open it from the upload page (or POST it to /v1/packs) and start
+immediately, with no parsing, embedding or LLM calls.
+
+With --complete, a missing summary or MCQ bank is generated before packing;
+otherwise the pack holds what has been computed so far. The FAQ is packed
+once chat has built it.
+
+Usage:
+    python -m scripts.study_pack export lectures/cells.pdf --complete
+    python -m scripts.study_pack export lectures/*.pdf --out packs/
+    python -m scripts.study_pack inspect packs/cells.helpy
+"""
+import sys
+import json
+import argparse
+from pathlib import Path
+
+from utils.study_pack import export_pack, read_manifest, StudyPackError, PACK_EXTENSION
+
+
+def export(files: list, out: str, complete: bool) -> int:
+    from utils.metering import metering_context
+
+    out_dir = Path(out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    failed = 0
+    with metering_context(user_id="batch", feature="pack"):
+        for file_path in files:
+            target = out_dir / f"{Path(file_path).stem}.{PACK_EXTENSION}"
+            try:
+                manifest = export_pack(file_path, target, complete=complete)
+            except (StudyPackError, FileNotFoundError) as e:
+                print(f"❌ {file_path}: {e}")
+                failed += 1
+                continue
+            print(f"✅ {target} ({target.stat().st_size / 1024:.0f} KB): {manifest['counts']}")
+    return 1 if failed else 0
+
+
+def inspect(pack_path: str) -> int:
+    try:
+        manifest = read_manifest(pack_path)
+    except StudyPackError as e:
+        print(f"❌ {e}")
+        return 1
+    print(json.dumps({key: value for key, value in manifest.items() if key != "entries"}, indent=2, ensure_ascii=False))
+    print(f"📦 Entries: {', '.join(sorted(manifest.get('entries', {})))}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or inspect Helpy study packs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="pack documents with their index, summary, MCQs and FAQ")
+    export_parser.add_argument("files", nargs="+", help="documents to pack")
+    export_parser.add_argument("--out", default=".", help="directory for the .helpy files")
+    export_parser.add_argument("--complete", action="store_true", help="generate a missing summary or MCQ bank first")
+
+    inspect_parser = commands.add_parser("inspect", help="print a pack's manifest")
+    inspect_parser.add_argument("pack")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        return export(args.files, args.out, args.complete)
+    return inspect(args.pack)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+"""
+Offline tuning of chunk_size, chunk_overlap and retrieval k.
+
+Builds an index per document for every (chunk_size, chunk_overlap) in a grid,
+runs a question set with known answer spans through the chat retrieval path
+(vector search, then the same context assembly get_qa_chain uses) for every
+k, and reports hit rate and MRR next to index time, index size and prompt
+tokens. Settings that no other setting beats on all of those at once (the
+Pareto front) are listed per document type, with one recommendation each.
+
+Question set (JSONL), one question per line; `doc_type` is optional and
+defaults to Summarizer.detect_type on the document text:
+    {"document": "lectures/cells.pdf", "question": "What is osmosis?", "answer": "diffusion of water"}
+
+A question hits when its answer span (case and whitespace ignored) is inside
+a retrieved passage; its reciprocal rank is 1 / position of that passage.
+Question embeddings are computed once and reused across the whole grid.
+
+Usage:
+    python -m scripts.tune_retrieval questions.jsonl --chunk-sizes 500,1000,1500 --overlaps 0,100,200 --ks 3,5,8
+    python -m scripts.tune_retrieval questions.jsonl --fake --json-out tuning.json   # harness check, no API cost
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+
+from utils.load_config import LoadConfig
+
+CONFIG = LoadConfig()
+# Higher is better for the first two, lower for the rest
+MAXIMIZE = ["hit_rate", "mrr"]
+MINIMIZE = ["prompt_tokens", "index_s", "index_kb"]
+
+
+def parse_int_list(value: str) -> list:
+    return sorted({int(item) for item in value.split(",") if item.strip()})
+
+
+def load_questions(path: str) -> list:
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            missing = {"document", "question", "answer"} - set(item)
+            if missing:
+                raise ValueError(f"{path}:{line_number} is missing {', '.join(sorted(missing))}")
+            # Documents are resolved relative to the question file
+            item["document"] = str((Path(path).parent / item["document"]).resolve())
+            questions.append(item)
+    return questions
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip().lower()
+
+
+def answer_rank(passages: list, answer: str) -> int:
+    """1-based position of the first passage containing the answer span, or 0."""
+    span = _normalize(answer)
+    for position, passage in enumerate(passages, start=1):
+        if span in _normalize(passage.page_content):
+            return position
+    return 0
+
+
+def dominates(a: dict, b: dict) -> bool:
+    no_worse = all(a[m] >= b[m] for m in MAXIMIZE) and all(a[m] <= b[m] for m in MINIMIZE)
+    better = any(a[m] > b[m] for m in MAXIMIZE) or any(a[m] < b[m] for m in MINIMIZE)
+    return no_worse and better
+
+
+def pareto_front(rows: list) -> list:
+    return [row for row in rows if not any(dominates(other, row) for other in rows if other is not row)]
+
+
+def recommend(front: list) -> dict:
+    # Best ranking quality first; among equals, the cheapest prompt and index
+    return max(front, key=lambda row: (row["mrr"], row["hit_rate"], -row["prompt_tokens"], -row["index_s"]))
+
+
+def grid(chunk_sizes: list, overlaps: list) -> list:
+    return [(size, overlap) for size in chunk_sizes for overlap in overlaps if overlap < size]
+
+
+def directory_size(path: str) -> int:
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file())
+
+
+class RetrievalTuner:
+    def __init__(self, questions: list, ks: list, backend_name: str, work_dir: Path):
+        from langchain_openai import OpenAIEmbeddings
+        from utils.vector_store import get_vector_store_backend
+
+        self.questions = questions
+        self.ks = ks
+        self.backend = get_vector_store_backend(backend_name, CONFIG.vector_store_options)
+        self.work_dir = work_dir
+        self.embeddings = OpenAIEmbeddings(openai_api_key=CONFIG.openai_api_key)
+        self.doc_types = self._document_types()
+        print(f"🧮 Embedding {len(questions)} question(s) once for the whole grid")
+        self.query_vectors = self.embeddings.embed_documents([q["question"] for q in questions])
+
+    def _document_types(self) -> dict:
+        from utils.summarizer import Summarizer
+
+        doc_types = {}
+        for item in self.questions:
+            if item.get("doc_type"):
+                doc_types[item["document"]] = item["doc_type"]
+            elif item["document"] not in doc_types:
+                doc_types[item["document"]] = Summarizer.detect_type(Summarizer.extract_text_from_file(item["document"]))
+        return doc_types
+
+    def build_index(self, document: str, chunk_size: int, chunk_overlap: int) -> dict:
+        from utils.prepare_vectordb import PrepareVectorDB
+
+        index_directory = self.work_dir / f"{chunk_size}-{chunk_overlap}" / Path(document).name
+        start = time.perf_counter()
+        published = PrepareVectorDB(
+            data_directory=[document],
+            persist_directory=index_directory,
+            openai_api_key=CONFIG.openai_api_key,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            pdf_workers=CONFIG.pdf_workers,
+            parallel_min_pages=CONFIG.parallel_min_pages,
+            vector_store_backend=self.backend.name,
+            vector_store_options=CONFIG.vector_store_options
+        ).prepare_and_save_vectordb()
+        return {
+            "index_directory": str(index_directory),
+            "index_s": time.perf_counter() - start,
+            "index_bytes": directory_size(published),
+        }
+
+    def evaluate(self, chunk_size: int, chunk_overlap: int) -> list:
+        """Rows of metrics for one (chunk_size, chunk_overlap), one per (doc_type, k)."""
+        from utils.context_assembly import assemble_context
+        from utils.tokens import count_num_tokens
+
+        by_document = defaultdict(list)
+        for item, vector in zip(self.questions, self.query_vectors):
+            by_document[item["document"]].append((item, vector))
+
+        # (doc_type, k) -> ranks, prompt tokens; doc_type -> index costs
+        ranks, tokens = defaultdict(list), defaultdict(list)
+        index_costs = defaultdict(list)
+        for document, items in by_document.items():
+            doc_type = self.doc_types[document]
+            built = self.build_index(document, chunk_size, chunk_overlap)
+            index_costs[doc_type].append(built)
+            vectordb = self.backend.open_published(built["index_directory"], self.embeddings)
+
+            for item, vector in items:
+                # One search at the largest k; smaller k are its prefixes, as in exact search
+                candidates = vectordb.similarity_search_by_vector(vector, k=max(self.ks))
+                for k in self.ks:
+                    passages = assemble_context(
+                        candidates[:k],
+                        token_budget=CONFIG.context_token_budget,
+                        dedupe_threshold=CONFIG.dedupe_threshold,
+                        model=CONFIG.llm_engine
+                    )
+                    ranks[doc_type, k].append(answer_rank(passages, item["answer"]))
+                    tokens[doc_type, k].append(sum(count_num_tokens(p.page_content, CONFIG.llm_engine) for p in passages))
+
+        rows = []
+        for (doc_type, k), type_ranks in sorted(ranks.items()):
+            costs = index_costs[doc_type]
+            rows.append({
+                "doc_type": doc_type,
+                "chunk_size": chunk_size,
+                "chunk_overlap": chunk_overlap,
+                "k": k,
+                "questions": len(type_ranks),
+                "hit_rate": round(sum(1 for r in type_ranks if r) / len(type_ranks), 4),
+                "mrr": round(sum(1 / r for r in type_ranks if r) / len(type_ranks), 4),
+                "prompt_tokens": round(sum(tokens[doc_type, k]) / len(type_ranks), 1),
+                "index_s": round(sum(c["index_s"] for c in costs) / len(costs), 3),
+                "index_kb": round(sum(c["index_bytes"] for c in costs) / len(costs) / 1024, 1),
+            })
+        return rows
+
+    def run(self, settings: list) -> list:
+        rows = []
+        for chunk_size, chunk_overlap in settings:
+            print(f"🔧 chunk_size={chunk_size} chunk_overlap={chunk_overlap}")
+            rows.extend(self.evaluate(chunk_size, chunk_overlap))
+        return rows
+
+
+def report(rows: list) -> dict:
+    """Pareto front and recommendation per document type."""
+    by_type = defaultdict(list)
+    for row in rows:
+        by_type[row["doc_type"]].append(row)
+
+    result = {}
+    for doc_type, type_rows in sorted(by_type.items()):
+        front = sorted(pareto_front(type_rows), key=lambda row: (-row["mrr"], row["prompt_tokens"]))
+        result[doc_type] = {"pareto_front": front, "recommended": recommend(front)}
+    return result
+
+
+def print_report(rows: list, summary: dict):
+    columns = ["chunk_size", "chunk_overlap", "k", "hit_rate", "mrr", "prompt_tokens", "index_s", "index_kb"]
+    for doc_type, result in summary.items():
+        questions = result["recommended"]["questions"]
+        print(f"\n📄 {doc_type} ({questions} question(s), {sum(1 for r in rows if r['doc_type'] == doc_type)} setting(s))")
+        print("   " + "  ".join(f"{c:>13}" for c in columns))
+        for row in result["pareto_front"]:
+            marker = "⭐" if row is result["recommended"] else "  "
+            print(f" {marker}" + "  ".join(f"{row[c]:>13}" for c in columns))
+        best = result["recommended"]
+        print(
+            f"   ➜ splitter_config.chunk_size: {best['chunk_size']}, chunk_overlap: {best['chunk_overlap']}, "
+            f"retrieval_config.k: {best['k']}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grid-search chunking and k against retrieval quality and cost.")
+    parser.add_argument("questions", help="JSONL question set with document, question and answer span")
+    parser.add_argument("--chunk-sizes", type=parse_int_list, default=[500, 1000, 1500])
+    parser.add_argument("--overlaps", type=parse_int_list, default=[0, 100, 200])
+    parser.add_argument("--ks", type=parse_int_list, default=[3, 5, 8])
+    parser.add_argument("--backend", default=CONFIG.vector_store_backend, help="vector store backend to build with")
+    parser.add_argument("--work-dir", default=None, help="where to build indexes (default: a temporary directory)")
+    parser.add_argument("--json-out", default=None, help="write all rows and the per-type report here")
+    parser.add_argument("--fake", action="store_true", help="use the local fake OpenAI server (random embeddings)")
+    args = parser.parse_args()
+
+    if args.fake:
+        from scripts.fake_openai_server import start_fake_server
+
+        server = start_fake_server()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+        os.environ["OPENAI_BASE_URL"] = os.environ["OPENAI_API_BASE"] = base_url
+        CONFIG.openai_api_key = CONFIG.openai_api_key or "sk-tuning"
+        print(f"🧪 Started fake OpenAI server at {base_url}; quality numbers are meaningless")
+
+    questions = load_questions(args.questions)
+    settings = grid(args.chunk_sizes, args.overlaps)
+    if not questions or not settings:
+        print("⚠️ Nothing to evaluate: no questions or no valid (chunk_size, overlap) pairs.")
+        return 1
+
+    from utils.metering import metering_context
+
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="helpy-tuning-") as tmp, metering_context(user_id="batch", feature="tuning"):
+        work_dir = Path(args.work_dir or tmp)
+        tuner = RetrievalTuner(questions, args.ks, args.backend, work_dir)
+        rows = tuner.run(settings)
+
+    summary = report(rows)
+    print_report(rows, summary)
+    print(f"\n🏁 {len(settings)} index setting(s) x {len(args.ks)} k in {time.perf_counter() - start:.1f}s")
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps({"rows": rows, "by_doc_type": summary}, indent=2))
+        print(f"📝 Report written to {args.json_out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+import io
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+from starlette.testclient import TestClient
+from langchain.chains import RetrievalQA
+from langchain_core.documents import Document
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.retrievers import BaseRetriever
+
+import api
+from utils.upload_store import UploadStore
+
+
+CONTENT = b"Osmosis is the diffusion of water across a membrane.\n" * 20
+MCQ = {"question": "What is osmosis?", "options": ["Water diffusion", "B", "C", "D"], "correct": "Water diffusion", "explanation": "A"}
+
+
+class StaticRetriever(BaseRetriever):
+    def _get_relevant_documents(self, query, *, run_manager):
+        return [Document(page_content="Osmosis is the diffusion of water.")]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadStore(tmp_path, max_upload_bytes=10_000, allowed_extensions=["txt", "pdf"])
+
+
+@pytest.fixture
+def client(store):
+    with patch("api.get_upload_store", return_value=store), TestClient(api.app) as client:
+        yield client
+
+
+@pytest.fixture
+def document_id(client):
+    response = client.post("/v1/documents", files={"file": ("notes.txt", CONTENT, "text/plain")})
+    assert response.status_code == 201
+    return response.json()["document_id"]
+
+
+def sse_events(text: str) -> list:
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+# === 1. Upload and delete ===
+def test_upload_returns_content_address(client, document_id, store):
+    assert document_id.endswith(".txt")
+    assert store.refcount(document_id) == 1
+
+    response = client.delete(f"/v1/documents/{document_id}")
+    assert response.json() == {"document_id": document_id, "deleted": True}
+
+
+def test_delete_only_drops_the_callers_reference(client, document_id, store):
+    for user in ("teacher-a", "teacher-b"):
+        response = client.post("/v1/documents", files={"file": ("notes.txt", CONTENT, "text/plain")}, headers={"X-User-Id": user})
+        assert response.json()["document_id"] == document_id
+    assert store.refcount(document_id) == 3
+
+    response = client.delete(f"/v1/documents/{document_id}", headers={"X-User-Id": "teacher-a"})
+    assert response.json()["deleted"] is False
+    assert store.refcount(document_id) == 2
+
+
+@patch("api.Summarizer.summarize_file", return_value="A summary.")
+def test_documents_are_only_visible_to_callers_holding_them(mock_summarize, client, document_id, store):
+    headers = {"X-User-Id": "student-b"}
+    assert client.post(f"/v1/documents/{document_id}/summary", headers=headers).status_code == 404
+    assert client.delete(f"/v1/documents/{document_id}", headers=headers).status_code == 404
+    assert store.refcount(document_id) == 1
+    mock_summarize.assert_not_called()
+
+    client.post("/v1/documents", files={"file": ("notes.txt", CONTENT, "text/plain")}, headers=headers)
+    assert client.post(f"/v1/documents/{document_id}/summary", headers=headers).status_code == 200
+
+
+def test_upload_rejects_unsupported_type(client):
+    response = client.post("/v1/documents", files={"file": ("virus.exe", b"MZ", "application/octet-stream")})
+    assert response.status_code == 415
+    assert "Unsupported" in response.json()["error"]
+
+
+def test_unknown_and_invalid_documents(client):
+    assert client.post(f"/v1/documents/{'0' * 64}.txt/summary").status_code == 404
+    assert client.post("/v1/documents/..%2Fsecrets/summary").status_code in (400, 404)
+
+
+# === 2. Summarize ===
+@patch("api.Summarizer.summarize_file", return_value="A **key** summary.")
+def test_summary(mock_summarize, client, document_id):
+    response = client.post(f"/v1/documents/{document_id}/summary")
+    assert response.json() == {"document_id": document_id, "summary": "A **key** summary."}
+    assert mock_summarize.call_args[0][0].endswith(document_id)
+
+
+@patch("api.Summarizer.summarize_file", return_value="❌ Could not extract text from the uploaded file.")
+def test_summary_failure_is_502(mock_summarize, client, document_id):
+    response = client.post(f"/v1/documents/{document_id}/summary")
+    assert response.status_code == 502
+
+
+@patch("api.Summarizer.summarize_range", return_value="Pages summary.")
+def test_summary_of_a_page_range(mock_range, client, document_id):
+    response = client.post(f"/v1/documents/{document_id}/summary", json={"start": 4, "end": 6})
+    assert response.json()["summary"] == "Pages summary."
+    assert mock_range.call_args[0][1:] == (4, 6)
+
+    assert client.post(f"/v1/documents/{document_id}/summary", json={"start": 6, "end": 4}).status_code == 400
+
+
+def test_page_range_needs_pages(client, document_id):
+    # Plain text has no pages to address
+    response = client.post(f"/v1/documents/{document_id}/summary", json={"start": 1, "end": 2})
+    assert response.status_code == 400
+    assert "PDF and PowerPoint" in response.json()["error"]
+
+
+# === 3. MCQs, plain and streamed ===
+@patch("api.MCQGenerator.generate_mcqs_from_file", return_value=[MCQ])
+def test_mcqs(mock_generate, client, document_id):
+    response = client.post(f"/v1/documents/{document_id}/mcqs", json={"max_questions": 3})
+    assert response.json()["questions"] == [MCQ]
+    assert mock_generate.call_args[0][1] == 3
+
+
+@patch("api.MCQGenerator.iter_mcq_batches", return_value=iter([[MCQ], [MCQ, MCQ]]))
+def test_mcqs_stream_batches(mock_batches, client, document_id):
+    response = client.post(f"/v1/documents/{document_id}/mcqs?stream=true", json={"max_questions": 3})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = sse_events(response.text)
+    assert [name for name, _ in events] == ["questions", "questions", "done"]
+    assert events[-1][1]["count"] == 3
+
+
+def test_mcqs_validates_count(client, document_id):
+    response = client.post(f"/v1/documents/{document_id}/mcqs", json={"max_questions": 500})
+    assert response.status_code == 400
+
+
+# === 4. Ask, plain and streamed ===
+@patch("api.new_chat_memory")
+@patch("api.get_qa_chain")
+def test_ask_uses_history_to_condense(mock_chain, mock_memory, client, document_id):
+    mock_chain.return_value.run.return_value = "Water moves across the membrane."
+    memory = MagicMock(max_pairs=5)
+    memory.condense_question.return_value = "What is osmosis in cells?"
+    mock_memory.return_value = memory
+
+    response = client.post(
+        f"/v1/documents/{document_id}/ask",
+        json={"question": "And in cells?", "history": [["What is osmosis?", "Diffusion of water."]]}
+    )
+
+    assert response.json()["answer"] == "Water moves across the membrane."
+    assert memory.pairs == [("What is osmosis?", "Diffusion of water.")]
+    assert mock_chain.return_value.run.call_args[0] == ("What is osmosis in cells?",)
+
+
+@patch("api.new_chat_memory")
+@patch("api.get_qa_chain")
+def test_ask_stream_yields_tokens(mock_chain, mock_memory, client, document_id):
+    llm = FakeListChatModel(responses=["Water diffuses."])
+    mock_chain.return_value = RetrievalQA.from_chain_type(llm=llm, retriever=StaticRetriever())
+    mock_memory.return_value.condense_question.side_effect = lambda q: q
+
+    response = client.post(f"/v1/documents/{document_id}/ask?stream=1", json={"question": "What is osmosis?"})
+
+    events = sse_events(response.text)
+    assert events[-1] == ("done", {"document_id": document_id, "answer": "Water diffuses."})
+    assert "".join(data for name, data in events if name == "token") == "Water diffuses."
+
+
+class LimiterProbeRetriever(BaseRetriever):
+    borrowed: list = []
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        self.borrowed.append(api.app.state.limiter.borrowed_tokens)
+        return [Document(page_content="Osmosis is the diffusion of water.")]
+
+
+@patch("api.new_chat_memory")
+@patch("api.get_qa_chain")
+def test_ask_stream_holds_a_limiter_slot(mock_chain, mock_memory, client, document_id):
+    retriever = LimiterProbeRetriever()
+    mock_chain.return_value = RetrievalQA.from_chain_type(llm=FakeListChatModel(responses=["Yes."]), retriever=retriever)
+    mock_memory.return_value.condense_question.side_effect = lambda q: q
+
+    client.post(f"/v1/documents/{document_id}/ask?stream=1", json={"question": "What is osmosis?"})
+    assert retriever.borrowed == [1]
+
+
+@patch("api.get_qa_chain", return_value=None)
+def test_ask_chain_failure_is_502(mock_chain, client, document_id):
+    response = client.post(f"/v1/documents/{document_id}/ask", json={"question": "Hi?"})
+    assert response.status_code == 502
+
+
+# === 5. Batch endpoints report per-item errors ===
+@patch("api.Summarizer.summarize_file", return_value="Summary.")
+def test_batch_summary_isolates_failures(mock_summarize, client, document_id):
+    response = client.post("/v1/batch/summary", json={"document_ids": [document_id, "bogus"]})
+    results = response.json()["results"]
+    assert results[0] == {"document_id": document_id, "summary": "Summary."}
+    assert results[1]["document_id"] == "bogus" and "Invalid" in results[1]["error"]
+
+
+def test_batch_size_limit(client):
+    response = client.post("/v1/batch/summary", json={"document_ids": ["x"] * (api.CONFIG.api_max_batch_size + 1)})
+    assert response.status_code == 413
+
+
+# === 6. Study packs ===
+def test_export_study_pack(client, document_id):
+    def export(file_path, target):
+        target.write(b"PK-pack")
+        return {}
+
+    with patch("api.export_pack", side_effect=export) as mock_export:
+        response = client.get(f"/v1/documents/{document_id}/pack")
+    assert response.status_code == 200 and response.content == b"PK-pack"
+    assert response.headers["content-disposition"].endswith('.helpy"')
+    assert mock_export.call_args[0][0].endswith(document_id)
+
+
+def test_import_study_pack(client, store):
+    stored = store.save(io.BytesIO(CONTENT), "notes.txt", "teacher")
+    with patch("api.import_pack", return_value=stored) as mock_import:
+        response = client.post("/v1/packs", files={"file": ("notes.helpy", b"PK", "application/zip")})
+    assert response.status_code == 201
+    assert response.json()["document_id"] == stored.key
+    assert mock_import.call_args[0][1] == api.API_SESSION_ID
+
+    with patch("api.import_pack", side_effect=api.StudyPackError("Not a study pack: bad zip")):
+        response = client.post("/v1/packs", files={"file": ("notes.helpy", b"junk", "application/zip")})
+    assert response.status_code == 422 and "Not a study pack" in response.json()["error"]
+
+
+# === 7. Deadlines and partial results ===
+def test_deadline_header_reaches_the_worker_and_is_capped(client, document_id):
+    from utils.deadline import time_left
+
+    seen = []
+    with patch("api.Summarizer.summarize_file", side_effect=lambda path: seen.append(time_left()) or "Summary."), \
+            patch.object(api.CONFIG, "deadline_max_s", 20):
+        client.post(f"/v1/documents/{document_id}/summary", headers={"X-Deadline-S": "5"})
+        client.post(f"/v1/documents/{document_id}/summary", headers={"X-Deadline-S": "600"})
+    assert 0 < seen[0] <= 5 and 5 < seen[1] <= 20
+
+
+def test_partial_results_are_flagged(client, document_id):
+    with patch("api.Summarizer.summarize_file", side_effect=api.PartialResult("Half a summary.")):
+        response = client.post(f"/v1/documents/{document_id}/summary")
+    assert response.json() == {"document_id": document_id, "summary": "Half a summary.", "partial": True}
+
+    with patch("api.MCQGenerator.generate_mcqs_from_file", side_effect=api.PartialResult([MCQ])):
+        response = client.post(f"/v1/documents/{document_id}/mcqs", json={"max_questions": 3})
+    assert response.json()["questions"] == [MCQ] and response.json()["partial"] is True
@@ -0,0 +1,136 @@
+import json
+import asyncio
+import pytest
+from contextlib import ExitStack
+from unittest.mock import patch
+from scripts.build_study_packs import Manifest, StudyPackBuilder, discover_files, file_digest, parse_file
+from utils.session_store import SessionStore
+from utils.single_flight import SingleFlight
+from utils.study_pack import PackStore
+
+
+TEXT = "Osmosis is the diffusion of water across a semi-permeable membrane. " * 20
+
+
+@pytest.fixture
+def lectures(tmp_path):
+    folder = tmp_path / "lectures"
+    (folder / "week1").mkdir(parents=True)
+    (folder / "week1" / "cells.txt").write_text(TEXT)
+    (folder / "plants.txt").write_text(TEXT + " Photosynthesis.")
+    (folder / "notes.md").write_text("ignored")
+    return folder
+
+
+@pytest.fixture
+def app_stores(tmp_path):
+    """The shared job results and session store the app reads, under tmp_path."""
+    flights, sessions = SingleFlight(tmp_path / "jobs"), SessionStore(tmp_path / "sessions")
+    with ExitStack() as stack:
+        for target in ("scripts.build_study_packs.get_single_flight", "utils.summarizer.get_single_flight", "utils.generate_mcqs.get_single_flight"):
+            stack.enter_context(patch(target, return_value=flights))
+        stack.enter_context(patch("scripts.build_study_packs.get_session_store", return_value=sessions))
+        for target in ("utils.summarizer.get_pack_store", "utils.generate_mcqs.get_pack_store"):
+            stack.enter_context(patch(target, return_value=PackStore(tmp_path / "packs")))
+        yield flights, sessions
+
+
+# === 1. Discovery ===
+def test_discover_files_recurses_and_filters(lectures):
+    files = discover_files([str(lectures)], ["txt", "pdf"])
+    assert [f.name for f in files] == ["plants.txt", "cells.txt"]
+
+
+def test_discover_files_accepts_globs(lectures):
+    files = discover_files([str(lectures / "**" / "*.txt")], ["txt"])
+    assert len(files) == 2
+
+
+# === 2. Parsing ===
+def test_parse_file_hashes_and_extracts(lectures):
+    path = str(lectures / "plants.txt")
+    parsed = parse_file(path)
+    assert parsed["digest"] == file_digest(path)
+    assert parsed["text"].startswith("Osmosis") and parsed["error"] is None
+
+
+# === 3. Manifest ===
+def test_manifest_roundtrip(tmp_path):
+    manifest = Manifest(tmp_path / "manifest.json")
+    manifest.record("abc.txt", "/x/abc.txt", "summary")
+    manifest.record("abc.txt", "/x/abc.txt", "mcqs", error="boom")
+
+    reloaded = Manifest(tmp_path / "manifest.json")
+    assert reloaded.is_done("abc.txt", "summary")
+    assert not reloaded.is_done("abc.txt", "mcqs")
+    assert reloaded.entries["abc.txt"]["errors"] == {"mcqs": "boom"}
+
+
+# === 4. End-to-end run writes JSONL and resumes ===
+@patch("utils.generate_mcqs.MCQGenerator.gpt_generate_mcqs_cached")
+@patch("utils.summarizer.Summarizer.gpt_summarize", return_value="A short summary.")
+@patch("utils.summarizer.count_num_tokens", return_value=500)
+def test_run_writes_outputs_and_resumes(mock_tokens, mock_summarize, mock_mcqs, lectures, tmp_path, app_stores):
+    mock_mcqs.return_value = "Q: What is osmosis?\nA. Water diffusion\nB. b\nC. c\nD. d\nAnswer: A"
+    files = discover_files([str(lectures)], ["txt"])
+    out = tmp_path / "packs"
+
+    builder = StudyPackBuilder(out, ["summary", "mcqs"], concurrency=2, max_questions=1)
+    asyncio.run(builder.run(files, parse_workers=1))
+
+    summaries = [json.loads(line) for line in (out / "summaries.jsonl").read_text().splitlines()]
+    mcqs = [json.loads(line) for line in (out / "mcqs.jsonl").read_text().splitlines()]
+    assert len(summaries) == 2 and len(mcqs) == 2
+    assert summaries[0]["summary"] == "A short **summary**."
+    assert mcqs[0]["questions"][0]["correct"] == "Water diffusion"
+    assert builder.failures == 0
+
+    calls = mock_summarize.call_count
+    rerun = StudyPackBuilder(out, ["summary", "mcqs"], concurrency=2, max_questions=1)
+    asyncio.run(rerun.run(files, parse_workers=1))
+    assert mock_summarize.call_count == calls
+    assert len((out / "summaries.jsonl").read_text().splitlines()) == 2
+
+    forced = StudyPackBuilder(out, ["summary"], concurrency=2, max_questions=1, force=True)
+    asyncio.run(forced.run(files, parse_workers=1))
+    ids = [json.loads(line)["document_id"] for line in (out / "summaries.jsonl").read_text().splitlines()]
+    assert mock_summarize.call_count > calls
+    assert sorted(ids) == sorted(set(ids)) and len(ids) == 2
+
+
+@patch("utils.generate_mcqs.MCQGenerator.gpt_generate_mcqs_cached")
+@patch("utils.summarizer.Summarizer.gpt_summarize", return_value="A short summary.")
+@patch("utils.summarizer.count_num_tokens", return_value=500)
+def test_run_warms_what_the_app_reads(mock_tokens, mock_summarize, mock_mcqs, lectures, tmp_path, app_stores):
+    from utils.summarizer import Summarizer
+    from utils.generate_mcqs import MCQGenerator
+
+    flights, sessions = app_stores
+    mock_mcqs.return_value = "Q: What is osmosis?\nA. Water diffusion\nB. b\nC. c\nD. d\nAnswer: A"
+    path = lectures / "plants.txt"
+    digest = file_digest(str(path))
+
+    with patch("scripts.build_study_packs.CONFIG.quiz_max_questions", 1):
+        builder = StudyPackBuilder(tmp_path / "packs", ["summary", "mcqs"], concurrency=2, max_questions=1)
+        asyncio.run(builder.run([path], parse_workers=1))
+    assert builder.failures == 0
+    assert sessions.load_questions(digest)[0]["correct"] == "Water diffusion"
+
+    # A later upload of the same file is answered from the batch run's results
+    mock_summarize.side_effect = mock_mcqs.side_effect = AssertionError("LLM called")
+    assert Summarizer._summarize_file_cached(str(path)) == "A short **summary**."
+    assert MCQGenerator._llm_mcqs_shared(str(path), max_questions=1)[0]["correct"] == "Water diffusion"
+
+
+# === 5. Indexes are built from the parsed text ===
+@patch("utils.prepare_vectordb.PrepareVectorDB")
+def test_build_index_reuses_parsed_pages(mock_prepare, tmp_path):
+    builder = StudyPackBuilder(tmp_path / "packs", ["index"], concurrency=1, max_questions=1)
+    parsed = {"digest": "ab" * 32, "text": "one\ntwo", "pages": [(0, "one"), (1, "two")], "error": None}
+    with patch("scripts.build_study_packs.CONFIG.custom_persist_directory", tmp_path / "vectorstore"), \
+            patch("scripts.build_study_packs.get_single_flight") as mock_flight:
+        builder.build_index("/x/slides.pdf", f"{parsed['digest']}.pdf", parsed)
+
+    documents = mock_prepare.call_args.kwargs["documents"]
+    assert [(d.page_content, d.metadata["page"]) for d in documents] == [("one", 0), ("two", 1)]
+    assert mock_flight.return_value.do.call_count == 1
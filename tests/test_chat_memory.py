@@ -0,0 +1,78 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from utils.chat_memory import ChatMemory
+
+
+def word_count(text, model="gpt-4"):
+    return len(text.split())
+
+
+def truncate_words(text, max_tokens, model="gpt-4"):
+    return " ".join(text.split()[:max_tokens])
+
+
+@pytest.fixture(autouse=True)
+def fake_tokenizer():
+    with patch("utils.chat_memory.count_num_tokens", side_effect=word_count), \
+         patch("utils.chat_memory.truncate_to_tokens", side_effect=truncate_words):
+        yield
+
+
+@pytest.fixture
+def mock_llm():
+    llm = MagicMock()
+    llm.invoke.return_value = MagicMock(content="Rolled up summary")
+    return llm
+
+
+# === 1. First question is sent as-is ===
+def test_condense_without_history_skips_llm(mock_llm):
+    memory = ChatMemory(mock_llm)
+    assert memory.condense_question("What is osmosis?") == "What is osmosis?"
+    mock_llm.invoke.assert_not_called()
+
+
+# === 2. Follow-ups are condensed with the conversation ===
+def test_condense_follow_up(mock_llm):
+    mock_llm.invoke.return_value = MagicMock(content="How does osmosis differ from diffusion?")
+    memory = ChatMemory(mock_llm)
+    memory.pairs = [("What is osmosis?", "Movement of water across a membrane.")]
+
+    result = memory.condense_question("How is it different from diffusion?")
+    assert result == "How does osmosis differ from diffusion?"
+    assert "What is osmosis?" in mock_llm.invoke.call_args[0][0]
+
+
+def test_condense_falls_back_on_error(mock_llm):
+    mock_llm.invoke.side_effect = Exception("API down")
+    memory = ChatMemory(mock_llm)
+    memory.pairs = [("Q", "A")]
+    assert memory.condense_question("And then?") == "And then?"
+
+
+# === 3. Only the last N pairs are kept; older ones go into the summary ===
+def test_add_turn_keeps_last_n_pairs(mock_llm):
+    memory = ChatMemory(mock_llm, max_pairs=2)
+    for i in range(4):
+        memory.add_turn(f"question {i}", f"answer {i}")
+
+    assert memory.pairs == [("question 2", "answer 2"), ("question 3", "answer 3")]
+    assert memory.summary == "Rolled up summary"
+
+
+# === 4. Token budget evicts turns even below N ===
+def test_add_turn_respects_token_budget(mock_llm):
+    memory = ChatMemory(mock_llm, max_pairs=10, token_budget=30)
+    for i in range(5):
+        memory.add_turn("word " * 5, "word " * 5)
+
+    assert len(memory.pairs) < 5
+    assert memory.token_count() <= 30 + memory.summary_max_tokens
+
+
+def test_summary_is_capped(mock_llm):
+    mock_llm.invoke.return_value = MagicMock(content="long " * 500)
+    memory = ChatMemory(mock_llm, max_pairs=1, summary_max_tokens=20)
+    memory.add_turn("q1", "a1")
+    memory.add_turn("q2", "a2")
+    assert len(memory.summary.split()) == 20
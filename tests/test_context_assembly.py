@@ -0,0 +1,90 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from langchain_core.documents import Document
+from utils.context_assembly import (
+    merge_adjacent_chunks, drop_near_duplicates, trim_to_budget, assemble_context, AssembledContextRetriever
+)
+
+
+PAGE = (
+    "Osmosis is the movement of water across a semi-permeable membrane. "
+    "Diffusion is the movement of particles from high to low concentration. "
+    "Active transport uses energy to move substances against a gradient."
+)
+
+
+def chunk(start, end, page=0, source="notes.pdf"):
+    return Document(page_content=PAGE[start:end], metadata={"source": source, "page": page, "start_index": start})
+
+
+def word_count(text, model="gpt-4"):
+    return len(text.split())
+
+
+def truncate_words(text, max_tokens, model="gpt-4"):
+    return " ".join(text.split()[:max_tokens])
+
+
+@pytest.fixture(autouse=True)
+def fake_tokenizer():
+    with patch("utils.context_assembly.count_num_tokens", side_effect=word_count), \
+         patch("utils.context_assembly.truncate_to_tokens", side_effect=truncate_words):
+        yield
+
+
+# === 1. Merging overlapping and adjacent chunks ===
+def test_overlapping_chunks_become_one_span():
+    merged = merge_adjacent_chunks([chunk(60, 140), chunk(0, 80)])
+    assert len(merged) == 1
+    assert merged[0].page_content == PAGE[0:140]
+    assert merged[0].metadata["start_index"] == 0
+    assert merged[0].metadata["end_index"] == 140
+
+
+def test_adjacent_chunks_merge_and_gaps_do_not():
+    merged = merge_adjacent_chunks([chunk(0, 50), chunk(50, 90), chunk(150, 200)])
+    assert [d.page_content for d in merged] == [PAGE[0:90], PAGE[150:200]]
+
+
+def test_different_pages_are_not_merged():
+    merged = merge_adjacent_chunks([chunk(0, 80, page=0), chunk(60, 140, page=1)])
+    assert len(merged) == 2
+
+
+def test_span_keeps_best_rank_and_passthrough_docs():
+    plain = Document(page_content="no offsets here", metadata={})
+    merged = merge_adjacent_chunks([chunk(150, 200), plain, chunk(0, 80), chunk(70, 120)])
+    assert merged[0].page_content == PAGE[150:200]
+    assert merged[1] is plain
+    assert merged[2].page_content == PAGE[0:120]
+
+
+# === 2. Near-duplicate removal ===
+def test_near_duplicates_dropped():
+    docs = [Document(page_content=PAGE), Document(page_content=PAGE[:120]), Document(page_content="Completely different text about cells")]
+    kept = drop_near_duplicates(docs, threshold=0.9)
+    assert [d.page_content for d in kept] == [PAGE, "Completely different text about cells"]
+
+
+# === 3. Token budget ===
+def test_trim_to_budget_cuts_last_passage():
+    docs = [Document(page_content="one two three"), Document(page_content="four five six seven")]
+    trimmed = trim_to_budget(docs, token_budget=5)
+    assert [d.page_content for d in trimmed] == ["one two three", "four five"]
+    assert trimmed[1].metadata["truncated"] is True
+
+
+def test_assemble_context_end_to_end():
+    docs = [chunk(0, 80), chunk(60, 140), chunk(0, 80, source="copy.pdf")]
+    assembled = assemble_context(docs, token_budget=1000)
+    assert len(assembled) == 1
+    assert assembled[0].page_content == PAGE[0:140]
+
+
+# === 4. Retriever wrapper ===
+def test_assembled_retriever_wraps_base():
+    base = MagicMock()
+    base.invoke.return_value = [chunk(0, 80), chunk(60, 140)]
+    retriever = AssembledContextRetriever.model_construct(base_retriever=base, token_budget=1000, dedupe_threshold=0.9, model="gpt-4")
+    docs = retriever._get_relevant_documents("osmosis", run_manager=MagicMock())
+    assert [d.page_content for d in docs] == [PAGE[0:140]]
@@ -0,0 +1,189 @@
+import time
+import pytest
+from unittest.mock import patch, MagicMock
+from openai import OpenAI
+from langchain.chains import RetrievalQA
+from langchain_core.language_models import FakeListChatModel
+
+from utils import deadline, summarizer, generate_mcqs
+from utils.deadline import deadline_context, time_left, near, DeadlineExceeded, PartialResult, PARTIAL_NOTE
+from utils.model_router import route_completion
+from utils.summarizer import Summarizer
+from utils.generate_mcqs import MCQGenerator
+from utils.chat_with_file import answer_within_deadline
+from tests.test_api import StaticRetriever
+from tests.test_model_router import hung_server  # noqa: F401 (fixture)
+
+MCQ = {"question": "What is osmosis?", "options": ["Water diffusion", "B", "C", "D"], "correct": "Water diffusion", "explanation": ""}
+MCQ_OUTPUT = "Q: What is osmosis?\nA. Water diffusion\nB. B\nC. C\nD. D\nAnswer: A"
+
+
+@pytest.fixture
+def clock():
+    """A monotonic clock the test moves by hand: clock[0] += seconds."""
+    now = [1000.0]
+    with patch.object(deadline.time, "monotonic", side_effect=lambda: now[0]):
+        yield now
+
+
+# === 1. Deadline context ===
+def test_nested_deadlines_only_tighten(clock):
+    assert time_left() is None and not near(100)
+    with deadline_context(30):
+        with deadline_context(60):
+            assert time_left() == 30
+        with deadline_context(10):
+            assert time_left() == 10
+        with deadline_context(None):
+            assert time_left() == 30
+        clock[0] += 25
+        assert near(5) and not near(4)
+        clock[0] += 10
+        assert time_left() == 0
+    assert time_left() is None
+
+
+# === 2. Model calls are capped at the time left ===
+def test_route_completion_caps_timeout_and_stops_at_deadline(clock):
+    client = MagicMock()
+    client.chat.completions.create.side_effect = TimeoutError("too slow")
+    routes = {"summary_map": {"models": ["fast-model", "backup-model"], "timeout_s": 30}}
+
+    with patch("utils.model_router.CONFIG.model_routes", routes), deadline_context(12):
+        def slow_call(**kwargs):
+            clock[0] += kwargs["timeout"]
+            raise TimeoutError("too slow")
+        client.chat.completions.create.side_effect = slow_call
+
+        with pytest.raises(DeadlineExceeded):
+            route_completion(client, "summary_map", messages=[])
+
+    # The fallback model is not tried once the primary used up the time
+    assert [c.kwargs["timeout"] for c in client.chat.completions.create.call_args_list] == [12]
+
+
+# === 3. Summaries merge what finished ===
+def summarize_with(clock, map_seconds: float, chunks: list):
+    def fake_gpt(prompt, max_tokens=300, stage="summary_map"):
+        if stage == "summary_map":
+            clock[0] += map_seconds
+            return f"point {prompt[-1]}"
+        return "merged"
+
+    with patch.object(Summarizer, "gpt_summarize", side_effect=fake_gpt) as mock_gpt, \
+            patch("utils.summarizer.RecursiveCharacterTextSplitter") as mock_splitter, \
+            patch("utils.summarizer.count_num_tokens", return_value=100), \
+            patch.object(summarizer.CONFIG, "deadline_reserve_s", 30):
+        mock_splitter.return_value.split_text.return_value = chunks
+        with deadline_context(100), pytest.raises(PartialResult) as partial:
+            Summarizer.summarize_text("chunk a\nchunk b\nchunk c")
+    return partial.value.result, mock_gpt
+
+
+def test_summary_merges_finished_chunks_at_deadline(clock):
+    result, mock_gpt = summarize_with(clock, 40, ["chunk a", "chunk b", "chunk c"])
+
+    # Two map calls fit before the reserve, then the merge covers just those
+    assert mock_gpt.call_count == 3
+    merge_prompt = mock_gpt.call_args[0][0]
+    assert "point a" in merge_prompt and "point b" in merge_prompt and "point c" not in merge_prompt
+    assert result.startswith("merged") and result.endswith(PARTIAL_NOTE)
+
+
+def test_summary_without_time_to_merge_joins_chunk_summaries(clock):
+    result, mock_gpt = summarize_with(clock, 50, ["chunk a", "chunk b", "chunk c"])
+
+    assert mock_gpt.call_count == 2  # no merge call once the deadline has passed
+    assert "point a" in result and "point b" in result and result.endswith(PARTIAL_NOTE)
+
+
+def test_hung_model_returns_partial_summary_within_deadline(hung_server):
+    base_url, connections = hung_server
+    routes = {stage: {"models": ["fast-model", "backup-model"], "timeout_s": 30} for stage in ("summary_map", "summary_merge")}
+
+    start = time.perf_counter()
+    with patch("utils.summarizer.client", OpenAI(api_key="sk-test", base_url=base_url)), \
+            patch("utils.model_router.CONFIG.model_routes", routes), \
+            patch("utils.summarizer.RecursiveCharacterTextSplitter") as mock_splitter, \
+            patch("utils.summarizer.count_num_tokens", return_value=100), \
+            patch("utils.summarizer.extractive_summary", return_value="Key sentence."), \
+            patch.object(summarizer.CONFIG, "deadline_reserve_s", 0.2):
+        mock_splitter.return_value.split_text.return_value = ["chunk a", "chunk b"]
+        with deadline_context(1.0), pytest.raises(PartialResult) as partial:
+            Summarizer.summarize_text("chunk a\nchunk b")
+
+    assert time.perf_counter() - start < 1.5
+    assert partial.value.result.startswith("Key sentence.")
+    assert len(connections) == 1  # neither the SDK nor the fallback model retried past the deadline
+
+
+def test_summary_without_deadline_is_complete():
+    with patch.object(Summarizer, "gpt_summarize", return_value="merged"), \
+            patch("utils.summarizer.RecursiveCharacterTextSplitter") as mock_splitter, \
+            patch("utils.summarizer.count_num_tokens", return_value=100):
+        mock_splitter.return_value.split_text.return_value = ["chunk a", "chunk b"]
+        assert Summarizer.summarize_text("chunk a\nchunk b") == "merged"
+
+
+# === 4. MCQs return the questions parsed so far ===
+def test_mcq_batches_stop_before_a_call_that_cannot_finish(clock):
+    def fake_generate(prompt):
+        clock[0] += 50
+        return MCQ_OUTPUT
+
+    text = " ".join(["osmosis moves water across a membrane"] * 80)
+    batches = []
+    with patch.object(MCQGenerator, "gpt_generate_mcqs_cached", side_effect=fake_generate) as mock_generate, \
+            patch.object(generate_mcqs.CONFIG, "deadline_reserve_s", 15), deadline_context(60):
+        with pytest.raises(DeadlineExceeded):
+            for batch in MCQGenerator.iter_mcq_batches_from_text(text, max_questions=5):
+                batches.append(batch)
+
+    assert mock_generate.call_count == 1
+    assert [len(batch) for batch in batches] == [1]
+
+
+def test_mcqs_at_deadline_are_partial():
+    def batches(file_path, max_questions):
+        yield [MCQ]
+        raise DeadlineExceeded("late")
+
+    with patch.object(MCQGenerator, "iter_mcq_batches", side_effect=batches), \
+            patch("utils.generate_mcqs.content_key", return_value=None):
+        with pytest.raises(PartialResult) as partial:
+            MCQGenerator.generate_mcqs_from_file("notes.txt", max_questions=5)
+    assert partial.value.result == [MCQ]
+
+
+def test_mcqs_with_none_done_at_deadline_fall_back_to_local():
+    with patch.object(MCQGenerator, "iter_mcq_batches", side_effect=DeadlineExceeded("late")), \
+            patch.object(MCQGenerator, "generate_local_mcqs", return_value=[MCQ]) as mock_local, \
+            patch("utils.generate_mcqs.content_key", return_value=None):
+        assert MCQGenerator.generate_mcqs_from_file("notes.txt", max_questions=5) == [MCQ]
+    mock_local.assert_called_once()
+
+
+# === 5. Chat answers with what has streamed ===
+class SlowStreamingChat(FakeListChatModel):
+    """Streams its answer a character at a time, like ChatOpenAI(streaming=True)."""
+
+    def _should_stream(self, **kwargs) -> bool:
+        return True
+
+
+def test_chat_answer_is_cut_at_deadline():
+    answer_text = "Osmosis is the diffusion of water across a membrane."
+    llm = SlowStreamingChat(responses=[answer_text], sleep=0.05)
+    qa_chain = RetrievalQA.from_chain_type(llm=llm, retriever=StaticRetriever())
+
+    with deadline_context(0.5):
+        answer, partial = answer_within_deadline(qa_chain, "What is osmosis?")
+
+    assert partial and answer.endswith(PARTIAL_NOTE)
+    assert answer_text not in answer
+
+
+def test_chat_answer_without_deadline_is_complete():
+    llm = FakeListChatModel(responses=["Water diffuses."])
+    qa_chain = RetrievalQA.from_chain_type(llm=llm, retriever=StaticRetriever())
+    assert answer_within_deadline(qa_chain, "What is osmosis?") == ("Water diffuses.", False)
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from unittest.mock import patch
+from utils.extractive import split_sentences, split_sections, textrank_scores, extractive_summary
+
+
+def fake_tokens(text, model="gpt-4"):
+    return len(text.split())
+
+
+@pytest.fixture(autouse=True)
+def word_tokens():
+    with patch("utils.extractive.count_num_tokens", side_effect=fake_tokens):
+        yield
+
+
+NOTES = """Cell Membranes
+The cell membrane controls what enters and leaves the cell. Osmosis moves water across the cell membrane.
+Active transport moves substances across the membrane using energy. The weather was pleasant on the day of the lecture.
+
+Photosynthesis
+Plants capture light energy in their chloroplasts. Chlorophyll in chloroplasts absorbs light energy for photosynthesis.
+The Calvin cycle uses light energy products to fix carbon. Lunch was served in the main hall afterwards today.
+"""
+
+
+# === 1. Splitting ===
+def test_split_sentences_drops_fragments():
+    assert split_sentences("Page 3. Osmosis is the diffusion of water. See figure.") == ["Osmosis is the diffusion of water."]
+
+
+def test_split_sections_uses_headings():
+    sections = split_sections(NOTES)
+    assert [heading for heading, _ in sections] == ["Cell Membranes", "Photosynthesis"]
+
+
+def test_split_sections_without_headings_makes_runs():
+    text = " ".join(f"Sentence number {i} talks about cells." for i in range(10))
+    assert len(split_sections(text, sentences_per_section=4)) == 3
+
+
+# === 2. Scoring ===
+def test_textrank_prefers_central_sentences():
+    sentences = split_sentences(split_sections(NOTES)[0][1])
+    scores = textrank_scores(sentences)
+    assert scores.shape == (4,)
+    assert np.isclose(scores.sum(), 1.0)
+    assert np.argmin(scores) == 3  # the off-topic weather sentence
+
+
+# === 3. Budgeted summary ===
+def test_summary_respects_budget_and_covers_sections():
+    summary = extractive_summary(NOTES, token_budget=30)
+    assert fake_tokens(summary.replace("Cell Membranes", "").replace("Photosynthesis", "")) <= 30
+    assert "Cell Membranes" in summary and "Photosynthesis" in summary
+    assert "weather" not in summary and "Lunch" not in summary
+
+
+def test_summary_keeps_document_order_and_skips_repeats():
+    text = "Osmosis moves water across the membrane. " * 5 + "Diffusion spreads particles across the membrane evenly."
+    summary = extractive_summary(text, token_budget=100)
+    assert summary.count("Osmosis") == 1
+    assert summary.index("Osmosis") < summary.index("Diffusion")
+
+
+def test_many_small_sections_still_get_sentences():
+    text = "\n".join(f"Topic {i}\nTopic {i} explains one important idea about cells." for i in range(50))
+    summary = extractive_summary(text, token_budget=40)
+    assert 0 < fake_tokens(summary) <= 40 + 2 * 50
+
+
+# === 4. Summarizer condenses long documents before the LLM ===
+@patch("utils.summarizer.Summarizer.gpt_summarize", return_value="Summary.")
+@patch("utils.summarizer.count_num_tokens", return_value=10_000)
+@patch("utils.summarizer.extractive_summary", return_value="Condensed key sentences.")
+def test_summarize_text_uses_extractive_stage(mock_extractive, mock_count, mock_gpt):
+    from utils.summarizer import Summarizer
+    Summarizer.summarize_text("Very long lecture. " * 5000)
+    mock_extractive.assert_called_once()
+    map_prompts = [c.args[0] for c in mock_gpt.call_args_list[:-1]]
+    assert len(map_prompts) == 1 and map_prompts[0].endswith("Condensed key sentences.")
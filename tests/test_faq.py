@@ -0,0 +1,77 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from utils import faq
+
+
+LECTURE = """Cell Membranes
+The cell membrane is a semi-permeable barrier that controls what enters and leaves the cell.
+Osmosis is the diffusion of water across the membrane from low to high solute concentration.
+
+Photosynthesis
+Plants capture light energy in their chloroplasts during photosynthesis.
+The Calvin cycle fixes carbon dioxide into sugars inside the stroma.
+"""
+
+
+@pytest.fixture(autouse=True)
+def word_tokens():
+    with patch("utils.extractive.count_num_tokens", side_effect=lambda text, model="gpt-4": len(text.split())):
+        yield
+
+
+def completion(text):
+    return MagicMock(choices=[MagicMock(message=MagicMock(content=text))])
+
+
+# === 1. Question drafting ===
+def test_parse_questions_strips_numbering_and_duplicates():
+    output = "1. What is osmosis?\n- What is osmosis?\n2) Summarize the photosynthesis section.\nok\n"
+    assert faq.parse_questions(output, 5) == ["What is osmosis?", "Summarize the photosynthesis section."]
+
+
+@patch("utils.faq.route_completion")
+def test_generate_questions_uses_faq_stage(mock_route):
+    mock_route.return_value = completion("What is osmosis?\nWhat does the Calvin cycle do?")
+    questions = faq.generate_faq_questions(LECTURE, count=2)
+    assert questions == ["What is osmosis?", "What does the Calvin cycle do?"]
+    assert mock_route.call_args.args[1] == "faq"
+    assert "Cell Membranes" in mock_route.call_args.kwargs["messages"][0]["content"]
+
+
+@patch("utils.faq.route_completion", side_effect=RuntimeError("down"))
+def test_generate_questions_falls_back_to_templates(mock_route):
+    questions = faq.generate_faq_questions(LECTURE, count=4)
+    assert questions[0] == 'Summarize the section "Cell Membranes".'
+    assert len(questions) == 4 and questions[-1].startswith("What is ")
+
+
+# === 2. Batched answering ===
+@patch("utils.faq.generate_faq_questions", return_value=["What is osmosis?", "What is the stroma?"])
+def test_build_faq_answers_in_one_batch(mock_questions):
+    qa_chain = MagicMock()
+    qa_chain.batch.return_value = [{"result": "Water diffusion."}, RuntimeError("timeout")]
+
+    entries = faq.build_faq(LECTURE, qa_chain, count=2)
+
+    qa_chain.batch.assert_called_once()
+    assert qa_chain.batch.call_args.args[0] == [{"query": "What is osmosis?"}, {"query": "What is the stroma?"}]
+    assert entries == [{"question": "What is osmosis?", "answer": "Water diffusion."}]
+
+
+# === 3. Storage and background build ===
+def test_save_and_load_roundtrip(tmp_path):
+    path = faq.faq_path_for(tmp_path, "/uploads/abc123.pdf")
+    assert path.name == "abc123.json"
+    assert faq.load_faq(path) == []
+    faq.save_faq(path, [{"question": "Q?", "answer": "A."}])
+    assert faq.load_faq(path) == [{"question": "Q?", "answer": "A."}]
+
+
+@patch("utils.faq.build_faq", return_value=[{"question": "Q?", "answer": "A."}])
+def test_background_build_runs_once(mock_build, tmp_path):
+    path = tmp_path / "faq" / "doc.json"
+    thread = faq.build_faq_in_background(lambda: LECTURE, MagicMock(), path)
+    thread.join(timeout=5)
+    assert faq.load_faq(path)[0]["answer"] == "A."
+    assert faq.build_faq_in_background(lambda: LECTURE, MagicMock(), path) is None
+    mock_build.assert_called_once()
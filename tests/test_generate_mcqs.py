@@ -1,6 +1,7 @@
 import pytest
 from unittest.mock import patch, MagicMock
 from utils import generate_mcqs
+from utils.metering import BudgetExceededError
 
 
 @pytest.fixture
@@ -88,3 +89,93 @@ def test_gpt_generate_mcqs_cached_success(mock_openai_call):
 def test_gpt_generate_mcqs_cached_failure(mock_openai_call):
     result = generate_mcqs.MCQGenerator.gpt_generate_mcqs_cached("generate 1 MCQ")
     assert result == ""
+
+
+@patch("utils.generate_mcqs.MCQGenerator.gpt_generate_mcqs_cached")
+@patch("utils.generate_mcqs.Summarizer.extract_text_from_file")
+def test_iter_mcq_batches_small_first_request(mock_extract_text, mock_gpt_call, mock_text, mock_gpt_output):
+    mock_extract_text.return_value = mock_text * 2
+    mock_gpt_call.return_value = mock_gpt_output
+
+    batches = list(generate_mcqs.MCQGenerator.iter_mcq_batches("fakefile.pdf", max_questions=5, first_batch_size=1))
+    first_prompt = mock_gpt_call.call_args_list[0][0][0]
+    assert first_prompt.startswith("Generate 1 multiple-choice")
+    assert sum(len(batch) for batch in batches) <= 5
+
+
+@patch("utils.generate_mcqs.MCQGenerator.gpt_generate_mcqs_cached")
+@patch("utils.generate_mcqs.Summarizer.extract_text_from_file")
+def test_generation_job_appends_questions(mock_extract_text, mock_gpt_call, mock_text, mock_gpt_output):
+    mock_extract_text.return_value = mock_text * 2
+    mock_gpt_call.return_value = mock_gpt_output
+
+    job = generate_mcqs.MCQGenerationJob("fakefile.pdf", max_questions=5).start()
+    assert job.wait(timeout=5)
+    assert job.error is None
+    assert len(job.questions) == 2
+    assert job.shareable
+
+
+LECTURE = """Cell Membranes
+The cell membrane is a semi-permeable barrier that controls what enters and leaves the cell.
+Osmosis is the diffusion of water across the membrane from low to high solute concentration.
+Active transport uses energy from ATP to move substances against their concentration gradient.
+Mitochondria produce ATP through cellular respiration inside every living cell.
+
+Photosynthesis
+Plants capture light energy in their chloroplasts during photosynthesis.
+Chlorophyll absorbs red and blue light strongly in the leaves of green plants.
+The Calvin cycle fixes carbon dioxide into sugars inside the stroma.
+Stomata are small pores that let carbon dioxide enter the leaf tissue.
+"""
+
+
+@patch("utils.generate_mcqs.MCQGenerator.gpt_generate_mcqs_cached", return_value="")
+@patch("utils.generate_mcqs.Summarizer.extract_text_from_file", return_value=LECTURE)
+def test_generate_mcqs_from_file_falls_back_to_local(mock_extract_text, mock_gpt_call):
+    mcqs = generate_mcqs.MCQGenerator.generate_mcqs_from_file("lecture.txt", max_questions=3)
+    assert len(mcqs) == 3
+    assert all(q["source"] == "local" and q["correct"] in q["options"] for q in mcqs)
+
+
+@patch("utils.generate_mcqs.MCQGenerator.gpt_generate_mcqs_cached")
+@patch("utils.generate_mcqs.Summarizer.extract_text_from_file", return_value=LECTURE)
+def test_generation_job_seeds_local_questions(mock_extract_text, mock_gpt_call, mock_gpt_output):
+    mock_gpt_call.return_value = mock_gpt_output
+
+    job = generate_mcqs.MCQGenerationJob("lecture.txt", max_questions=4, seed_questions=2)
+    job._thread = MagicMock()  # inspect the state before the background thread runs
+    job.start()
+    assert [q["source"] for q in job.questions] == ["local", "local"]
+
+    job._run()
+    assert job.llm_count == 2
+    assert len(job.questions) == 4
+    assert "source" not in job.questions[-1]
+
+
+@patch("utils.generate_mcqs.MCQGenerator.gpt_generate_mcqs_cached", side_effect=RuntimeError("quota"))
+@patch("utils.generate_mcqs.Summarizer.extract_text_from_file", return_value=LECTURE)
+def test_generation_job_fills_locally_when_llm_fails(mock_extract_text, mock_gpt_call):
+    job = generate_mcqs.MCQGenerationJob("lecture.txt", max_questions=4, seed_questions=1).start()
+    assert job.wait(timeout=5)
+    assert job.llm_count == 0
+    assert len(job.questions) == 4
+    assert not job.shareable  # the local fallback quiz must not become the document's shared list
+
+
+@patch("utils.generate_mcqs.Summarizer.extract_text_from_file", return_value=LECTURE * 3)
+def test_generation_job_cut_short_is_not_shareable(mock_extract_text, mock_gpt_output):
+    calls = []
+
+    def one_batch_then_fail(prompt):
+        calls.append(prompt)
+        if len(calls) > 1:
+            raise BudgetExceededError("Daily limit reached")
+        return mock_gpt_output
+
+    with patch.object(generate_mcqs.MCQGenerator, "gpt_generate_mcqs_cached", side_effect=one_batch_then_fail):
+        job = generate_mcqs.MCQGenerationJob("lecture.txt", max_questions=6).start()
+        assert job.wait(timeout=5)
+    assert job.llm_count > 0 and isinstance(job.error, BudgetExceededError)
+    assert not job.shareable
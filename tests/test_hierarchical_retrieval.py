@@ -0,0 +1,76 @@
+from unittest.mock import patch
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from utils.hierarchical_retrieval import build_sections, HierarchicalRetriever, make_retriever, SECTION_KEY
+from utils.vector_store import get_vector_store_backend, SECTIONS_DIR
+from tests.test_vector_store import KeywordEmbeddings
+
+TOPICS = ["cell membrane osmosis", "photosynthesis light energy", "dna gene"]
+
+
+def make_chunks(per_topic=4):
+    # Consecutive runs of chunks on one topic, like chapters of a long document
+    return [
+        Document(page_content=f"{topic} part {i}", metadata={"page": t * per_topic + i})
+        for t, topic in enumerate(TOPICS)
+        for i in range(per_topic)
+    ]
+
+
+def word_count(text, model=None):
+    return len(text.split())
+
+
+# === 1. Sections ===
+def test_build_sections_tags_chunks_and_covers_pages():
+    chunks = make_chunks()
+    with patch("utils.extractive.count_num_tokens", side_effect=word_count):
+        sections = build_sections(chunks, section_chunks=4)
+
+    assert [chunk.metadata[SECTION_KEY] for chunk in chunks] == [0] * 4 + [1] * 4 + [2] * 4
+    assert [s.metadata["chunks"] for s in sections] == [4, 4, 4]
+    assert (sections[1].metadata["first_page"], sections[1].metadata["last_page"]) == (4, 7)
+    assert all(section.page_content for section in sections)
+
+
+# === 2. Two-stage retrieval ===
+def publish_hierarchy(tmp_path, section_chunks=4):
+    chunks = make_chunks()
+    with patch("utils.extractive.count_num_tokens", side_effect=word_count):
+        sections = build_sections(chunks, section_chunks=section_chunks)
+    backend = get_vector_store_backend("numpy")
+    published = backend.publish(chunks, KeywordEmbeddings(), str(tmp_path / "index"), sections=sections)
+    return backend, published
+
+
+def test_published_sections_are_opened_with_their_chunks(tmp_path):
+    backend, published = publish_hierarchy(tmp_path)
+    assert backend.exists(f"{published}/{SECTIONS_DIR}")
+
+    chunk_store, section_store = backend.open_hierarchy(str(tmp_path / "index"), KeywordEmbeddings())
+    assert len(chunk_store.documents) == 12 and len(section_store.documents) == 3
+
+
+def test_retriever_searches_only_chunks_of_best_sections(tmp_path):
+    backend, _ = publish_hierarchy(tmp_path)
+    chunk_store, section_store = backend.open_hierarchy(str(tmp_path / "index"), KeywordEmbeddings())
+    retriever = make_retriever(chunk_store, section_store, k=6, top_sections=1)
+    assert isinstance(retriever, HierarchicalRetriever)
+
+    results = retriever.invoke("how does light give energy")
+    # k exceeds the section, so a flat search would have padded with other topics
+    assert len(results) == 4
+    assert all(doc.metadata[SECTION_KEY] == 1 for doc in results)
+
+
+# === 3. Flat fallback ===
+def test_small_documents_stay_flat(tmp_path):
+    backend = get_vector_store_backend("numpy")
+    backend.publish(make_chunks(), KeywordEmbeddings(), str(tmp_path / "index"))
+
+    chunk_store, section_store = backend.open_hierarchy(str(tmp_path / "index"), KeywordEmbeddings())
+    assert section_store is None
+    retriever = make_retriever(chunk_store, section_store, k=6, top_sections=1)
+    assert not isinstance(retriever, HierarchicalRetriever) and isinstance(retriever, BaseRetriever)
+    assert len(retriever.invoke("how does light give energy")) == 6
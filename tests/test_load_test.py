@@ -0,0 +1,61 @@
+import json
+import urllib.request
+import pytest
+from scripts.fake_openai_server import fake_completion_text, fake_embedding, start_fake_server
+from scripts.load_test import percentile_summary, process_memory_mb
+from utils.generate_mcqs import MCQGenerator
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = start_fake_server(latency_ms=0, dims=8)
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def _post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        return response.read().decode()
+
+
+# === 1. Canned MCQs parse with the app's own parser ===
+def test_fake_mcqs_parse():
+    prompt = "Generate 3 multiple-choice questions from the following text."
+    mcqs = MCQGenerator.parse_mcqs(fake_completion_text([{"role": "user", "content": prompt}]))
+    assert len(mcqs) == 3
+    assert all(q["correct"] == q["options"][0] for q in mcqs)
+
+
+# === 2. Embeddings are deterministic and unit length ===
+def test_fake_embedding_is_stable():
+    first, second = fake_embedding("membrane", 8), fake_embedding("membrane", 8)
+    assert first == second
+    assert sum(v * v for v in first) == pytest.approx(1.0)
+    assert fake_embedding("osmosis", 8) != first
+
+
+# === 3. Server answers chat, streaming and embedding calls ===
+def test_server_roundtrip(server):
+    chat = json.loads(_post(f"{server}/v1/chat/completions", {"messages": [{"role": "user", "content": "Summarize this."}]}))
+    assert "document covers" in chat["choices"][0]["message"]["content"]
+    assert chat["usage"]["total_tokens"] > 0
+
+    stream = _post(f"{server}/v1/chat/completions", {"stream": True, "messages": [{"role": "user", "content": "Hi"}]})
+    assert stream.rstrip().endswith("data: [DONE]")
+
+    embeddings = json.loads(_post(f"{server}/v1/embeddings", {"input": ["a", "b"]}))
+    assert [len(item["embedding"]) for item in embeddings["data"]] == [8, 8]
+
+
+# === 4. Report helpers ===
+def test_percentile_summary():
+    stats = percentile_summary([1.0, 2.0, 3.0, 4.0])
+    assert stats["count"] == 4
+    assert stats["p50"] == pytest.approx(2.5)
+    assert stats["max"] == 4.0
+    assert percentile_summary([]) == {"count": 0}
+
+
+def test_process_memory_reports_peak():
+    assert process_memory_mb()["peak_rss_mb"] > 0
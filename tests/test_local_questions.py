@@ -0,0 +1,50 @@
+import re
+from utils.local_questions import BLANK, generate_local_questions, key_terms
+from utils.extractive import split_sentences
+
+
+LECTURE = """Cell Membranes
+The cell membrane is a semi-permeable barrier that controls what enters and leaves the cell.
+Osmosis is the diffusion of water across the membrane from low to high solute concentration.
+Active transport uses energy from ATP to move substances against their concentration gradient.
+Mitochondria produce ATP through cellular respiration inside every living cell.
+
+Photosynthesis
+Plants capture light energy in their chloroplasts during photosynthesis.
+Chlorophyll absorbs red and blue light strongly in the leaves of green plants.
+The Calvin cycle fixes carbon dioxide into sugars inside the stroma.
+Stomata are small pores that let carbon dioxide enter the leaf tissue.
+"""
+
+
+# === 1. Key terms ===
+def test_key_terms_skip_stopwords_and_short_tokens():
+    terms = key_terms(split_sentences(LECTURE))
+    assert "membrane" in terms and "carbon" in terms
+    assert "the" not in terms and "atp" not in terms  # <4 characters
+
+
+# === 2. Question shape ===
+def test_questions_match_quiz_shape():
+    questions = generate_local_questions(LECTURE, max_questions=4)
+    assert len(questions) == 4
+    for q in questions:
+        assert set(q) == {"question", "options", "correct", "explanation", "source"}
+        assert BLANK in q["question"]
+        assert len(q["options"]) == 4 and len(set(q["options"])) == 4
+        assert q["correct"] in q["options"]
+        assert not re.search(rf"\b{q['correct']}\b", q["question"], re.IGNORECASE)
+
+
+def test_answers_are_not_reused():
+    questions = generate_local_questions(LECTURE, max_questions=6)
+    answers = [q["correct"].lower() for q in questions]
+    assert len(answers) == len(set(answers))
+
+
+def test_deterministic_for_same_text():
+    assert generate_local_questions(LECTURE) == generate_local_questions(LECTURE)
+
+
+def test_short_text_yields_nothing():
+    assert generate_local_questions("Too short to quiz on.") == []
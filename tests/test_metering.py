@@ -0,0 +1,183 @@
+import time
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from starlette.testclient import TestClient
+
+import api
+from utils import metering
+from utils.metering import (
+    UsageStore, BudgetExceededError, MeteredEmbeddings, MeteringCallbackHandler,
+    metering_context, check_budget, estimate_cost, metered_cache, note_cache_miss,
+    current_user, current_feature,
+)
+from utils.model_router import route_completion
+
+
+PRICES = {"gpt-4o": {"prompt": 0.0025, "completion": 0.01}, "gpt-4o-mini": {"prompt": 0.00015, "completion": 0.0006}}
+
+
+@pytest.fixture
+def store(tmp_path):
+    usage_store = UsageStore(tmp_path / "usage.db")
+    with patch("utils.metering.get_usage_store", return_value=usage_store), \
+            patch.object(metering.CONFIG, "usage_prices_per_1k", PRICES), \
+            patch.object(metering.CONFIG, "usage_daily_token_budget", 1000), \
+            patch.object(metering.CONFIG, "usage_exempt_users", ["batch"]):
+        yield usage_store
+
+
+def completion(prompt_tokens=100, completion_tokens=50, model="gpt-4o-mini-2024-07-18"):
+    return SimpleNamespace(
+        model=model,
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens),
+        choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))]
+    )
+
+
+# === 1. Store totals per user and feature ===
+def test_summary_groups_usage(store):
+    store.record("alice", "chat", "chat", "gpt-4o", prompt_tokens=100, completion_tokens=20, cost_usd=0.5)
+    store.record("alice", "summary", "summary_map", "gpt-4o-mini", prompt_tokens=300, cost_usd=0.1)
+    store.record("bob", "chat", "faq", "cache", cache_hit=True)
+
+    by_user = {row["name"]: row for row in store.summary(group_by="user_id")}
+    assert by_user["alice"]["calls"] == 2
+    assert by_user["alice"]["prompt_tokens"] == 400
+    assert by_user["bob"]["cache_hits"] == 1
+    assert [row["name"] for row in store.summary(group_by="feature")][0] == "chat"
+    assert store.tokens_since("alice", 0) == 420
+    assert store.tokens_since("alice", time.time() + 1) == 0
+
+    with pytest.raises(ValueError):
+        store.summary(group_by="ts; DROP TABLE usage")
+
+
+# === 2. Context attribution ===
+def test_metering_context_nests_and_resets():
+    with metering_context(user_id="alice", feature="chat"):
+        with metering_context(feature="index"):
+            assert (current_user(), current_feature()) == ("alice", "index")
+        assert current_feature() == "chat"
+    assert current_user() == "anonymous"
+
+
+def test_estimate_cost_matches_dated_model_names(store):
+    assert estimate_cost("gpt-4o-mini-2024-07-18", 1000, 1000) == pytest.approx(0.00075)
+    assert estimate_cost("gpt-4o", 1000, 0) == pytest.approx(0.0025)
+    assert estimate_cost("unknown-model", 1000, 1000) == 0
+
+
+# === 3. Routed completions are metered and budgeted ===
+def test_route_completion_records_usage(store):
+    client = MagicMock()
+    client.chat.completions.create.return_value = completion()
+    with metering_context(user_id="alice", feature="summary"):
+        route_completion(client, "summary_map", messages=[])
+
+    [row] = store.recent()
+    assert (row["user_id"], row["feature"], row["stage"]) == ("alice", "summary", "summary_map")
+    assert (row["prompt_tokens"], row["completion_tokens"]) == (100, 50)
+    assert row["cost_usd"] == pytest.approx(0.000045)
+    assert row["latency_ms"] >= 0
+
+
+def test_budget_blocks_calls_before_the_api(store):
+    store.record("alice", "chat", "chat", "gpt-4o", prompt_tokens=1000)
+    client = MagicMock()
+    with metering_context(user_id="alice"):
+        with pytest.raises(BudgetExceededError):
+            route_completion(client, "summary_map", messages=[])
+    client.chat.completions.create.assert_not_called()
+
+    # Other users and exempt users are unaffected
+    check_budget("bob")
+    store.record("batch", "index", "embedding", "ada", embedding_tokens=5000)
+    check_budget("batch")
+
+
+def test_budget_disabled(store):
+    store.record("alice", "chat", "chat", "gpt-4o", prompt_tokens=5000)
+    with patch.object(metering.CONFIG, "usage_daily_token_budget", 0):
+        check_budget("alice")
+
+
+# === 4. Cache hits ===
+def test_metered_cache_records_hits_only(store):
+    cache = {}
+
+    @metered_cache("summary")
+    def summarize(key):
+        if key not in cache:
+            note_cache_miss()
+            cache[key] = key.upper()
+        return cache[key]
+
+    assert summarize("a") == "A"
+    assert store.recent() == []
+    assert summarize("a") == "A"
+    [row] = store.recent()
+    assert row["cache_hit"] == 1 and row["stage"] == "summary"
+
+
+# === 5. LangChain calls and embeddings ===
+def test_callback_handler_records_token_usage(store):
+    handler = MeteringCallbackHandler("chat")
+    handler.on_chat_model_start({}, [[]], run_id="run-1")
+    handler.on_llm_end(
+        LLMResult(
+            generations=[[ChatGeneration(message=AIMessage(content="hi"))]],
+            llm_output={"token_usage": {"prompt_tokens": 40, "completion_tokens": 10}, "model_name": "gpt-4o"}
+        ),
+        run_id="run-1"
+    )
+    [row] = store.recent()
+    assert (row["stage"], row["model"], row["prompt_tokens"], row["completion_tokens"]) == ("chat", "gpt-4o", 40, 10)
+
+
+def test_callback_handler_reads_streamed_usage(store):
+    handler = MeteringCallbackHandler("chat")
+    message = AIMessage(content="hi", usage_metadata={"input_tokens": 7, "output_tokens": 3, "total_tokens": 10})
+    handler.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]), run_id="run-2")
+    [row] = store.recent()
+    assert (row["prompt_tokens"], row["completion_tokens"]) == (7, 3)
+
+
+@patch("utils.metering.count_num_tokens", side_effect=lambda text, model: len(text.split()))
+def test_metered_embeddings(mock_count, store):
+    inner = MagicMock()
+    inner.embed_documents.return_value = [[0.1], [0.2]]
+    inner.embed_query.return_value = [0.3]
+    embeddings = MeteredEmbeddings(inner, "text-embedding-ada-002")
+
+    with metering_context(user_id="alice", feature="index"):
+        assert embeddings.embed_documents(["one two", "three"]) == [[0.1], [0.2]]
+        assert embeddings.embed_query("four five six") == [0.3]
+
+    assert [row["embedding_tokens"] for row in store.recent()] == [3, 3]
+    assert {row["feature"] for row in store.recent()} == {"index"}
+
+
+def test_metering_failure_does_not_break_calls(store):
+    with patch.object(store, "record", side_effect=RuntimeError("disk full")):
+        client = MagicMock()
+        client.chat.completions.create.return_value = completion()
+        assert route_completion(client, "summary_map", messages=[]).choices[0].message.content == "ok"
+
+
+# === 6. API callers are identified and budgeted ===
+def test_api_rejects_callers_over_budget(store):
+    store.record("lms-user-1", "chat", "chat", "gpt-4o", prompt_tokens=2000)
+    with TestClient(api.app) as client:
+        response = client.post(
+            f"/v1/documents/{'0' * 64}.txt/summary",
+            headers={"X-User-Id": "lms-user-1"}
+        )
+        assert response.status_code == 429
+        assert "limit" in response.json()["error"]
+
+        # Another caller reaches the handler (and its 404 for the unknown document)
+        response = client.post(f"/v1/documents/{'0' * 64}.txt/summary", headers={"X-User-Id": "lms-user-2"})
+        assert response.status_code == 404
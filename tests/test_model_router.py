@@ -0,0 +1,123 @@
+import socket
+import threading
+import time
+import pytest
+from unittest.mock import patch, MagicMock
+from openai import OpenAI
+from utils import model_router
+from utils.model_router import ModelRoute, get_route, route_completion, get_chat_model
+
+
+ROUTES = {
+    "summary_map": {"models": ["fast-model", "backup-model"], "timeout_s": 5},
+    "summary_merge": {"models": ["strong-model"], "timeout_s": 30},
+    "mcq": {"models": ["fast-model"], "timeout_s": 10},
+    "chat": {"models": ["strong-model", "fast-model"], "timeout_s": 20},
+    "memory": {"models": ["fast-model"], "timeout_s": 5},
+}
+
+
+@pytest.fixture(autouse=True)
+def routes():
+    with patch.object(model_router.CONFIG, "model_routes", ROUTES):
+        yield
+
+
+def response(text):
+    return MagicMock(choices=[MagicMock(message=MagicMock(content=text))])
+
+
+# === 1. Route lookup ===
+def test_get_route():
+    assert get_route("summary_map") == ModelRoute("summary_map", ["fast-model", "backup-model"], 5)
+    with pytest.raises(ValueError):
+        get_route("unknown")
+
+
+# === 2. Primary model answers within budget ===
+def test_route_completion_uses_primary_model():
+    client = MagicMock()
+    client.chat.completions.create.return_value = response("ok")
+
+    result = route_completion(client, "summary_map", messages=[{"role": "user", "content": "hi"}], max_tokens=50)
+
+    assert result.choices[0].message.content == "ok"
+    kwargs = client.chat.completions.create.call_args.kwargs
+    assert kwargs["model"] == "fast-model"
+    assert kwargs["timeout"] == 5
+    assert kwargs["max_tokens"] == 50
+
+
+# === 3. Errors and timeouts fall back to the next model ===
+def test_route_completion_falls_back():
+    client = MagicMock()
+    client.chat.completions.create.side_effect = [TimeoutError("too slow"), response("from backup")]
+
+    result = route_completion(client, "summary_map", messages=[])
+
+    assert result.choices[0].message.content == "from backup"
+    assert [c.kwargs["model"] for c in client.chat.completions.create.call_args_list] == ["fast-model", "backup-model"]
+
+
+def test_route_completion_raises_when_all_fail():
+    client = MagicMock()
+    client.chat.completions.create.side_effect = RuntimeError("down")
+    with pytest.raises(RuntimeError):
+        route_completion(client, "summary_map", messages=[])
+    assert client.chat.completions.create.call_count == 2
+
+
+@pytest.fixture
+def hung_server():
+    """A local endpoint that accepts connections and never answers; yields the connection count."""
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    connections = []
+
+    def accept():
+        while True:
+            try:
+                connections.append(listener.accept()[0])
+            except OSError:
+                return
+
+    threading.Thread(target=accept, daemon=True).start()
+    yield f"http://127.0.0.1:{listener.getsockname()[1]}/v1", connections
+    listener.close()
+    for connection in connections:
+        connection.close()
+
+
+def test_timed_out_model_falls_back_after_one_attempt(hung_server):
+    base_url, connections = hung_server
+    client = OpenAI(api_key="sk-test", base_url=base_url)  # SDK default: 2 retries
+    routes = {"summary_map": {"models": ["fast-model", "backup-model"], "timeout_s": 0.5}}
+
+    start = time.perf_counter()
+    with patch.object(model_router.CONFIG, "model_routes", routes), pytest.raises(Exception):
+        route_completion(client, "summary_map", messages=[{"role": "user", "content": "hi"}])
+
+    assert len(connections) == 2  # one attempt per model
+    assert time.perf_counter() - start < 2
+
+
+def test_chat_models_do_not_retry():
+    llm = get_chat_model("chat", 0.5, "sk-test")
+    assert llm.runnable.max_retries == 0 and all(fallback.max_retries == 0 for fallback in llm.fallbacks)
+
+
+# === 4. Stages reach the right models ===
+@patch("utils.summarizer.client.chat.completions.create")
+def test_summarizer_merge_uses_strong_model(mock_create):
+    from utils.summarizer import Summarizer
+    mock_create.return_value = response("merged")
+    Summarizer.gpt_summarize("Merge these.", max_tokens=600, stage="summary_merge")
+    assert mock_create.call_args.kwargs["model"] == "strong-model"
+
+
+def test_chat_model_has_fallbacks():
+    llm = get_chat_model("chat", 0.5, "sk-test")
+    assert llm.runnable.model_name == "strong-model"
+    assert [fallback.model_name for fallback in llm.fallbacks] == ["fast-model"]
+    assert get_chat_model("memory", 0, "sk-test").model_name == "fast-model"
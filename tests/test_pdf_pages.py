@@ -0,0 +1,41 @@
+import pytest
+from unittest.mock import patch
+from utils.pdf_pages import extract_pdf_pages, shard_page_ranges, resolve_workers
+
+
+SAMPLE_PDF = "data/uploads/Reiseone WEEK 1 Social-media Deliverables.pdf"
+
+
+# === 1. Page range sharding ===
+@pytest.mark.parametrize("num_pages, workers", [(1, 4), (7, 2), (400, 8), (10, 1)])
+def test_shard_page_ranges_cover_all_pages(num_pages, workers):
+    ranges = shard_page_ranges(num_pages, workers)
+    covered = [page for start, end in ranges for page in range(start, end)]
+    assert covered == list(range(num_pages))
+
+
+def test_shard_page_ranges_empty():
+    assert shard_page_ranges(0, 4) == []
+
+
+def test_resolve_workers_defaults_to_cpu_count():
+    with patch("utils.pdf_pages.os.cpu_count", return_value=6):
+        assert resolve_workers(0) == 6
+        assert resolve_workers(None) == 6
+    assert resolve_workers(3) == 3
+
+
+# === 2. Serial fallback for small files ===
+@patch("utils.pdf_pages.ProcessPoolExecutor")
+def test_small_file_extracted_serially(mock_pool):
+    pages = extract_pdf_pages(SAMPLE_PDF, workers=4, min_pages_for_parallel=100)
+    mock_pool.assert_not_called()
+    assert [page for page, _ in pages] == list(range(len(pages)))
+
+
+# === 3. Parallel extraction matches serial output, in order ===
+def test_parallel_matches_serial():
+    serial = extract_pdf_pages(SAMPLE_PDF, workers=1)
+    parallel = extract_pdf_pages(SAMPLE_PDF, workers=2, min_pages_for_parallel=2)
+    assert parallel == serial
+    assert any(text.strip() for _, text in parallel)
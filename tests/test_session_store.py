@@ -0,0 +1,99 @@
+import os
+import time
+import pytest
+from utils.session_store import SessionStore, SessionMemoryTracker, deep_sizeof
+
+
+QUESTIONS = [
+    {"question": f"Question {i}?", "options": ["a", "b", "c", "d"], "correct": "a", "explanation": "x" * 200}
+    for i in range(10)
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(tmp_path)
+
+
+# === 1. Chat history is append-only and read as a tail ===
+def test_chat_tail(store):
+    for i in range(50):
+        store.append_chat("session-a", f"q{i}", f"a{i}")
+
+    assert len(store.load_chat("session-a")) == 50
+    tail = store.load_chat("session-a", last_n=3)
+    assert tail == [("q47", "a47"), ("q48", "a48"), ("q49", "a49")]
+    assert store.load_chat("session-b") == []
+
+
+def test_clear_session_only_removes_that_session(store):
+    store.append_chat("session-a", "q", "a")
+    store.append_chat("session-b", "q", "a")
+    store.clear_session("session-a")
+    assert store.load_chat("session-a") == []
+    assert store.load_chat("session-b") == [("q", "a")]
+
+
+# === 2. Questions are stored once per document and shared ===
+def test_questions_are_shared_between_sessions(store):
+    store.save_questions("digest", QUESTIONS)
+    first = store.load_questions("digest")
+    second = store.load_questions("digest")
+    assert first == QUESTIONS
+    # Same object: sessions on the same document don't each hold a copy
+    assert first is second
+    assert store.load_questions("missing") == []
+
+
+def test_resaved_questions_are_reloaded(store):
+    store.save_questions("digest", QUESTIONS)
+    store.load_questions("digest")
+    path = store.questions_dir / "digest.json"
+    store.save_questions("digest", QUESTIONS[:2])
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 1_000_000))
+    assert len(store.load_questions("digest")) == 2
+
+
+def test_stored_questions_are_not_replaced_on_request(store):
+    assert store.save_questions("digest", QUESTIONS, replace=False)
+    assert not store.save_questions("digest", QUESTIONS[:1], replace=False)
+    assert store.load_questions("digest") == QUESTIONS
+    assert [p.name for p in store.questions_dir.iterdir()] == ["digest.json"]  # no temp files left
+
+
+# === 3. Idle sessions are pruned ===
+def test_prune_removes_idle_sessions(store):
+    store.append_chat("old", "q", "a")
+    store.append_chat("new", "q", "a")
+    old_dir = store.sessions_dir / "old"
+    os.utime(old_dir, (time.time() - 7200, time.time() - 7200))
+
+    assert store.prune(3600) == 1
+    assert not old_dir.exists()
+    assert store.load_chat("new") == [("q", "a")]
+
+
+# === 4. Memory accounting ===
+def test_deep_sizeof_follows_containers():
+    small = deep_sizeof({"score": 1, "file_hash": "a" * 64})
+    large = deep_sizeof({"score": 1, "questions": QUESTIONS})
+    assert large > small + 2000
+
+
+def test_deep_sizeof_handles_cycles():
+    cyclic = []
+    cyclic.append(cyclic)
+    assert deep_sizeof(cyclic) > 0
+
+
+def test_tracker_totals_and_expiry():
+    tracker = SessionMemoryTracker(ttl_seconds=60)
+    tracker.record("a", 1000)
+    tracker.record("b", 500)
+    assert tracker.total() == 1500
+
+    tracker._sizes["a"] = (1000, time.time() - 120)
+    assert tracker.snapshot() == {"b": 500}
+
+    tracker.forget("b")
+    assert tracker.total() == 0
@@ -0,0 +1,176 @@
+import time
+import threading
+import multiprocessing
+import pytest
+from unittest.mock import patch
+
+from utils import generate_mcqs
+from utils.single_flight import SingleFlight, content_key
+
+
+@pytest.fixture
+def flights(tmp_path):
+    return SingleFlight(tmp_path / "jobs", wait_timeout=10)
+
+
+def run_concurrently(count, target):
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = target()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+# === 1. Concurrent callers share one run ===
+def test_concurrent_threads_run_the_job_once(flights):
+    calls = []
+
+    def job():
+        calls.append(1)
+        time.sleep(0.2)
+        return "summary"
+
+    results = run_concurrently(8, lambda: flights.do("summary", "abc", job))
+    assert results == ["summary"] * 8
+    assert len(calls) == 1
+
+
+def test_followers_share_the_leaders_error(flights):
+    calls = []
+
+    def job():
+        calls.append(1)
+        time.sleep(0.2)
+        raise RuntimeError("rate limited")
+
+    results = run_concurrently(4, lambda: flights.do("summary", "abc", job))
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(calls) == 1
+
+    # Failures aren't remembered: the next request tries again
+    assert flights.do("summary", "abc", lambda: "ok") == "ok"
+
+
+def test_followers_rerun_after_the_leaders_own_budget_error(flights):
+    from utils.metering import BudgetExceededError
+
+    calls = []
+
+    def job():
+        calls.append(1)
+        time.sleep(0.2)
+        if len(calls) == 1:
+            raise BudgetExceededError("leader is over budget")
+        return "summary"
+
+    results = run_concurrently(3, lambda: flights.do("summary", "abc", job))
+    assert sum(isinstance(result, BudgetExceededError) for result in results) == 1
+    assert results.count("summary") == 2
+    assert len(calls) == 2  # one new leader, not one run per follower
+
+
+def test_different_keys_run_independently(flights):
+    assert flights.do("summary", "a", lambda: "A") == "A"
+    assert flights.do("summary", "b", lambda: "B") == "B"
+    assert flights.do("mcqs", "a", lambda: ["q"]) == ["q"]
+
+
+# === 2. Results and artifacts shared across processes ===
+def test_persisted_results_are_reused(flights, tmp_path):
+    assert flights.do("summary", "abc", lambda: "first", persist=True) == "first"
+    # A fresh coordinator (another process) finds the stored result
+    other = SingleFlight(tmp_path / "jobs")
+    assert other.do("summary", "abc", lambda: "second", persist=True) == "first"
+
+
+def test_rejected_results_are_not_persisted(flights):
+    keep = lambda summary: not summary.startswith("❌")
+    assert flights.do("summary", "abc", lambda: "❌ failed", persist=True, keep=keep) == "❌ failed"
+    assert flights.do("summary", "abc", lambda: "fine", persist=True, keep=keep) == "fine"
+
+
+def test_done_skips_finished_artifacts(flights):
+    assert flights.do("index", "abc", lambda: pytest.fail("should not rebuild"), done=lambda: True) is None
+
+
+def test_prune_removes_old_results(flights):
+    flights.save_result("summary", "abc", "old")
+    assert flights.prune(max_age_seconds=-1) == 1
+    assert flights.load_result("summary", "abc") is None
+
+
+def _build_in_process(root, marker, log):
+    flights = SingleFlight(root, wait_timeout=10)
+
+    def build():
+        with open(log, "a") as f:
+            f.write("built\n")
+        time.sleep(0.5)
+        open(marker, "w").close()
+
+    flights.do("index", "abc", build, done=lambda: marker.exists())
+
+
+def test_processes_wait_on_the_file_lock(tmp_path):
+    marker, log = tmp_path / "index.ready", tmp_path / "builds.log"
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_build_in_process, args=(tmp_path / "jobs", marker, log)) for _ in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(20)
+
+    assert all(process.exitcode == 0 for process in processes)
+    assert log.read_text().count("built") == 1
+
+
+# === 3. Content keys ===
+def test_content_key(tmp_path):
+    digest = "a" * 64
+    assert content_key(f"/uploads/{digest}.pdf") == digest
+    assert content_key(tmp_path / "missing.pdf") is None
+
+    first, second = tmp_path / "one.txt", tmp_path / "two.txt"
+    first.write_text("same content")
+    second.write_text("same content")
+    assert content_key(first) == content_key(second)
+
+
+# === 4. Quiz sessions join one generation job ===
+def test_sessions_share_a_running_mcq_job():
+    release = threading.Event()
+
+    def slow_batches(file_path, max_questions, first_batch_size):
+        release.wait(5)
+        yield [{"question": "Q1"}]
+
+    with patch.object(generate_mcqs.MCQGenerator, "iter_mcq_batches", side_effect=slow_batches) as mock_iter:
+        first = generate_mcqs.MCQGenerationJob.shared("lecture.txt", max_questions=3)
+        second = generate_mcqs.MCQGenerationJob.shared("lecture.txt", max_questions=3)
+        assert first is second
+
+        # One session leaving doesn't stop generation for the other
+        first.cancel()
+        assert not first._cancelled.is_set()
+
+        release.set()
+        assert second.wait(5)
+        assert second.questions == [{"question": "Q1"}]
+        assert mock_iter.call_count == 1
+
+    # Finished jobs aren't reused; the next request starts fresh
+    with patch.object(generate_mcqs.MCQGenerator, "iter_mcq_batches", return_value=iter([])):
+        third = generate_mcqs.MCQGenerationJob.shared("lecture.txt", max_questions=3)
+        assert third is not second
+        third.wait(5)
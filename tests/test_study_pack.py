@@ -0,0 +1,236 @@
+import io
+import json
+import zipfile
+import numpy as np
+import pytest
+from contextlib import ExitStack
+from unittest.mock import patch
+from langchain_core.documents import Document
+
+from utils import study_pack
+from utils.study_pack import StudyPack, PackStore, StudyPackError, write_pack, read_pack, read_manifest, export_pack, import_pack
+from utils.summarizer import Summarizer
+from utils.generate_mcqs import MCQGenerator
+from utils.faq import faq_path_for, save_faq, load_faq
+from utils.session_store import SessionStore
+from utils.single_flight import SingleFlight, content_key
+from utils.upload_store import UploadStore
+from utils.vector_store import get_vector_store_backend, index_directory_for
+from tests.test_vector_store import KeywordEmbeddings
+
+TEXT = "the cell membrane controls osmosis\nphotosynthesis turns light into energy\ndna carries each gene\n"
+MCQ = {"question": "What controls osmosis?", "options": ["The membrane", "B", "C", "D"], "correct": "The membrane", "explanation": "A"}
+
+
+def small_pack(**overrides) -> StudyPack:
+    chunks = [Document(page_content=line, metadata={"start_index": i}) for i, line in enumerate(TEXT.splitlines())]
+    fields = dict(
+        manifest={"document_id": "0" * 64, "file_name": "notes.txt", "embedding_model": "keyword"},
+        document=TEXT.encode(),
+        text=TEXT,
+        chunks=chunks,
+        embeddings=np.asarray(KeywordEmbeddings().embed_documents([c.page_content for c in chunks]), dtype=np.float32),
+    )
+    return StudyPack(**{**fields, **overrides})
+
+
+# === 1. Archive format ===
+def test_round_trip_keeps_every_artifact():
+    buffer = io.BytesIO()
+    sections = [Document(page_content="cell membrane", metadata={"section": 0})]
+    manifest = write_pack(buffer, small_pack(
+        sections=sections,
+        section_embeddings=np.ones((1, 8), dtype=np.float32),
+        units=[(1, "page one")],
+        summary="A **summary**.",
+        mcqs=[MCQ],
+        faq=[{"question": "What is osmosis?", "answer": "Diffusion of water."}]
+    ))
+    assert manifest["counts"] == {"chunks": 3, "sections": 1, "units": 1, "mcqs": 1, "faq": 1}
+
+    pack = read_pack(buffer)
+    assert pack.text == TEXT and pack.document == TEXT.encode()
+    assert [c.page_content for c in pack.chunks] == TEXT.splitlines()
+    assert pack.embeddings.shape == (3, 8) and pack.section_embeddings.shape == (1, 8)
+    assert pack.sections[0].metadata == {"section": 0}
+    assert pack.units == [(1, "page one")]
+    assert (pack.summary, pack.mcqs, len(pack.faq)) == ("A **summary**.", [MCQ], 1)
+
+
+def test_optional_artifacts_may_be_missing():
+    buffer = io.BytesIO()
+    manifest = write_pack(buffer, small_pack())
+    assert "summary.md" not in manifest["entries"]
+
+    pack = read_pack(buffer)
+    assert (pack.summary, pack.mcqs, pack.faq, pack.sections) == (None, [], [], [])
+
+
+def test_corrupted_oversized_and_foreign_archives_are_rejected():
+    buffer = io.BytesIO()
+    write_pack(buffer, small_pack())
+    with pytest.raises(StudyPackError, match="limit"):
+        read_pack(buffer, max_bytes=100)
+
+    # Same manifest, tampered text
+    tampered = io.BytesIO()
+    with zipfile.ZipFile(buffer) as source, zipfile.ZipFile(tampered, "w") as target:
+        for info in source.infolist():
+            target.writestr(info, b"other text" if info.filename == "text.txt" else source.read(info))
+    with pytest.raises(StudyPackError, match="text.txt is corrupted"):
+        read_pack(tampered)
+
+    foreign = io.BytesIO()
+    with zipfile.ZipFile(foreign, "w") as archive:
+        archive.writestr("manifest.json", json.dumps({"format": "something-else"}))
+    with pytest.raises(StudyPackError, match="Not a study pack"):
+        read_manifest(foreign)
+    with pytest.raises(StudyPackError, match="Not a study pack"):
+        read_manifest(io.BytesIO(b"not a zip"))
+
+
+def test_pack_store_round_trip(tmp_path):
+    store = PackStore(tmp_path)
+    store.save("abc", text="Hello", units=[[1, "p1"]], summary=None, mcqs=[])
+    assert store.load("abc", "text") == "Hello"
+    assert store.load("abc", "units") == [[1, "p1"]]
+    assert store.load("abc", "summary") is None and store.load("abc", "mcqs") is None
+    assert store.load(None, "text") is None
+
+    store.save("abc", replace=False, text="Edited", summary="Added")
+    assert store.load("abc", "text") == "Hello" and store.load("abc", "summary") == "Added"
+
+
+# === 2. Export from one deployment, import into another ===
+class Deployment:
+    """The stores one app deployment keeps its per-document work in, under tmp_path."""
+
+    def __init__(self, root, trusted: bool = False):
+        self.root = root
+        self.trusted = trusted
+        self.persist_directory = root / "vectorstore"
+        self.uploads = UploadStore(root / "uploads", allowed_extensions=["txt"])
+        self.packs = PackStore(root / "packs")
+        self.sessions = SessionStore(root / "sessions")
+        self.flights = SingleFlight(root / "jobs")
+        self.backend = get_vector_store_backend("numpy")
+
+    def active(self):
+        stack = ExitStack()
+        for target, value in [
+            ("utils.study_pack.get_pack_store", self.packs),
+            ("utils.summarizer.get_pack_store", self.packs),
+            ("utils.generate_mcqs.get_pack_store", self.packs),
+            ("utils.upload_store.get_upload_store", self.uploads),
+            ("utils.session_store.get_session_store", self.sessions),
+            ("utils.single_flight.get_single_flight", self.flights),
+        ]:
+            stack.enter_context(patch(target, return_value=value))
+        stack.enter_context(patch.object(study_pack.CONFIG, "custom_persist_directory", self.persist_directory))
+        stack.enter_context(patch.object(study_pack.CONFIG, "vector_store_backend", "numpy"))
+        stack.enter_context(patch.object(study_pack.CONFIG, "vector_store_options", {}))
+        stack.enter_context(patch.object(study_pack.CONFIG, "study_pack_trust_imports", self.trusted))
+        stack.enter_context(patch("utils.study_pack.embedding_model", return_value="keyword"))
+        return stack
+
+    def index_directory(self, file_path):
+        return index_directory_for(self.persist_directory, str(file_path), "numpy")
+
+
+def test_exported_pack_opens_elsewhere_without_recomputing(tmp_path):
+    # The instructor's deployment has indexed, summarized, quizzed and chatted on the document
+    teacher = Deployment(tmp_path / "teacher")
+    document = tmp_path / "notes.txt"
+    document.write_text(TEXT)
+    digest = content_key(document)
+    chunks = [Document(page_content=line) for line in TEXT.splitlines()]
+    teacher.backend.publish(chunks, KeywordEmbeddings(), teacher.index_directory(document))
+    teacher.flights.save_result("summary", digest, "Cells and energy.")
+    teacher.sessions.save_questions(digest, [MCQ])
+    save_faq(faq_path_for(teacher.persist_directory, str(document)), [{"question": "What is osmosis?", "answer": "Water diffusion."}])
+
+    pack_path = tmp_path / "notes.helpy"
+    with teacher.active():
+        manifest = export_pack(str(document), pack_path)
+    assert manifest["document_id"] == digest
+    assert {"summary.md", "mcqs.json", "faq.json", "document/notes.txt"} <= set(manifest["entries"])
+
+    # A student's deployment trusts its instructor's packs and has never seen
+    # this one: no parsing, embedding or LLM call may happen
+    student = Deployment(tmp_path / "student", trusted=True)
+    with student.active(), \
+            patch("utils.summarizer.Summarizer.gpt_summarize", side_effect=AssertionError("LLM called")), \
+            patch("utils.generate_mcqs.MCQGenerator.gpt_generate_mcqs_cached", side_effect=AssertionError("LLM called")):
+        stored = import_pack(str(pack_path), "student-session")
+        assert stored.digest == digest and student.uploads.refcount(stored.key) == 1
+        assert Summarizer._summarize_file_cached(stored.path) == "Cells and energy."
+        assert Summarizer.extract_text_from_file(stored.path) == TEXT
+        assert MCQGenerator._llm_mcqs_shared(stored.path, max_questions=5) == [MCQ]
+        assert student.packs.load(digest, "text") == TEXT
+
+    assert student.sessions.load_questions(digest) == [MCQ]
+    assert load_faq(faq_path_for(student.persist_directory, stored.path))[0]["answer"] == "Water diffusion."
+    index = student.backend.open_published(student.index_directory(stored.path), KeywordEmbeddings())
+    assert index.similarity_search("light energy", k=1)[0].page_content == "photosynthesis turns light into energy"
+
+
+def edited_pack(tmp_path) -> io.BytesIO:
+    """A pack holding the real document, but text, summary and MCQs its author made up."""
+    document = tmp_path / "notes.txt"
+    document.write_text(TEXT)
+    buffer = io.BytesIO()
+    write_pack(buffer, small_pack(
+        manifest={"document_id": content_key(document), "file_name": "notes.txt", "embedding_model": "keyword"},
+        text="made-up text",
+        summary="Made-up summary.",
+        mcqs=[{**MCQ, "correct": "B"}]
+    ))
+    buffer.seek(0)
+    return buffer
+
+
+def test_untrusted_import_opens_like_an_upload(tmp_path):
+    deployment = Deployment(tmp_path)
+    with deployment.active():
+        stored = import_pack(edited_pack(tmp_path), "session")
+
+    assert deployment.uploads.refcount(stored.key) == 1
+    assert deployment.packs.load(stored.digest, "text") is None
+    assert deployment.packs.load(stored.digest, "summary") is None
+    assert deployment.sessions.load_questions(stored.digest) == []
+    assert not deployment.backend.is_published(deployment.index_directory(stored.path))
+
+
+def test_trusted_import_keeps_what_the_document_already_has(tmp_path):
+    deployment = Deployment(tmp_path, trusted=True)
+    pack = edited_pack(tmp_path)
+    digest = content_key(tmp_path / "notes.txt")
+    deployment.packs.save(digest, text=TEXT, summary="Real summary.")
+    deployment.sessions.save_questions(digest, [MCQ])
+
+    with deployment.active():
+        import_pack(pack, "session")
+
+    assert deployment.packs.load(digest, "text") == TEXT
+    assert deployment.packs.load(digest, "summary") == "Real summary."
+    assert deployment.sessions.load_questions(digest) == [MCQ]
+
+
+def test_export_on_a_backend_that_cannot_read_back_is_a_pack_error(tmp_path):
+    document = tmp_path / "notes.txt"
+    document.write_text(TEXT)
+    deployment = Deployment(tmp_path)
+    with deployment.active(), patch.object(study_pack.CONFIG, "vector_store_backend", "remote"), \
+            patch("utils.chat_with_file.build_index_once", side_effect=AssertionError("index built")):
+        with pytest.raises(StudyPackError, match="remote"):
+            export_pack(str(document), io.BytesIO())
+
+
+def test_import_rejects_packs_from_another_embedding_model(tmp_path):
+    buffer = io.BytesIO()
+    write_pack(buffer, small_pack())
+    student = Deployment(tmp_path)
+    with student.active(), patch("utils.study_pack.embedding_model", return_value="text-embedding-3-large"):
+        with pytest.raises(StudyPackError, match="embedded with keyword"):
+            import_pack(buffer, "session")
+    assert not list((tmp_path / "uploads" / "objects").iterdir())
@@ -1,6 +1,8 @@
 import pytest
 from unittest.mock import patch, MagicMock, mock_open
+from utils import summarizer
 from utils.summarizer import Summarizer
+from utils.section_summaries import ChunkSummaryStore, chunk_units, overlapping, parse_range_request
 
 
 # === 1. Text Extraction Tests ===
@@ -92,3 +94,80 @@ def test_summarize_file_success(mock_token, mock_gpt, mock_extract):
 def test_summarize_file_error(mock_extract):
     summary = Summarizer.summarize_file("broken.pdf")
     assert summary.startswith("❌")
+
+
+# === 6. Page and Slide Range Summaries ===
+@pytest.mark.parametrize("text, expected", [
+    ("Summarize pages 40-55", (40, 55)),
+    ("can you summarise slides 12 to 20?", (12, 20)),
+    ("Summary of page 7 please", (7, 7)),
+    ("summarize pp. 9–3", (3, 9)),
+    ("Please summarize the slides 3-5", (3, 5)),
+    ("What is on page 4?", None),
+    ("Summarize the document", None),
+    ("In the summary you gave, what does page 12 mean?", None),
+    ("Why does the summary skip page 3?", None),
+    ("Explain page 2, then summarize pages 4-6", None),
+])
+def test_parse_range_request(text, expected):
+    assert parse_range_request(text) == expected
+
+
+def test_chunk_units_packs_consecutive_pages():
+    units = [(1, "a" * 30), (2, ""), (3, "b" * 30), (4, "c" * 30), (5, "d" * 120)]
+    chunks = chunk_units(units, max_chars=70)
+    assert [(c["start"], c["end"]) for c in chunks] == [(1, 3), (4, 4), (5, 5), (5, 5)]
+    assert overlapping(chunks, 3, 4) == [0, 1]
+
+
+PAGES = [(1, "Cells and membranes. " * 20), (2, "Osmosis moves water. " * 20), (3, "Diffusion of solutes. " * 20)]
+
+
+@pytest.fixture
+def chunk_store(tmp_path):
+    store = ChunkSummaryStore(tmp_path / "chunks")
+    with patch("utils.summarizer.get_chunk_summary_store", return_value=store), \
+            patch.object(summarizer.CONFIG, "map_chunk_size", 500):
+        yield store
+
+
+@patch("utils.summarizer.Summarizer.extract_units", return_value=PAGES)
+@patch("utils.summarizer.Summarizer.gpt_summarize", side_effect=lambda prompt, **kwargs: f"summary {len(prompt)}")
+def test_range_summary_reuses_stored_chunk_summaries(mock_gpt, mock_units, chunk_store):
+    file_path = f"/uploads/{'1' * 64}.pdf"
+    Summarizer.summarize_range(file_path, 1, 2)
+    # Two map calls (pages 1 and 2) and one merge
+    assert mock_gpt.call_count == 3
+    assert mock_gpt.call_args.kwargs["stage"] == "summary_merge"
+    assert "pages 1–2" in mock_gpt.call_args.args[0]
+
+    mock_gpt.reset_mock()
+    Summarizer.summarize_range(file_path, 2, 3)
+    # Page 2 comes from the store: one map call for page 3, then the merge
+    assert mock_gpt.call_count == 2
+    stored = chunk_store.load(f"{'1' * 64}-500")
+    assert [(entry["start"], entry["end"]) for entry in stored.values()] == [(1, 1), (2, 2), (3, 3)]
+
+
+@patch("utils.summarizer.Summarizer.extract_units", return_value=PAGES)
+@patch("utils.summarizer.Summarizer.gpt_summarize", side_effect=["❌ GPT summarization failed: timeout", "merged"])
+def test_range_summary_does_not_store_failures(mock_gpt, mock_units, chunk_store):
+    assert Summarizer.summarize_range(f"/uploads/{'2' * 64}.pdf", 3, 3).startswith("❌")
+    assert chunk_store.load(f"{'2' * 64}-500") == {}
+
+
+@patch("utils.summarizer.Summarizer.extract_units", return_value=PAGES)
+def test_range_summary_rejects_bad_ranges(mock_units, chunk_store):
+    with pytest.raises(ValueError, match="3 pages"):
+        Summarizer.summarize_range(f"/uploads/{'3' * 64}.pdf", 5, 9)
+    with pytest.raises(ValueError, match="PDF and PowerPoint"):
+        Summarizer.summarize_range(f"/uploads/{'3' * 64}.txt", 1, 2)
+
+
+@patch("utils.summarizer.Summarizer.extract_text_from_file", return_value="Cells. Osmosis. Diffusion.")
+@patch("utils.summarizer.Summarizer.extract_units", return_value=PAGES)
+@patch("utils.summarizer.Summarizer.gpt_summarize", return_value="Chunk summary")
+@patch("utils.summarizer.count_num_tokens", return_value=80)
+def test_short_file_summary_stores_located_chunks(mock_tokens, mock_gpt, mock_units, mock_extract, chunk_store):
+    Summarizer._summarize_file_uncached(f"/uploads/{'4' * 64}.pdf")
+    assert len(chunk_store.load(f"{'4' * 64}-500")) == 3
@@ -0,0 +1,101 @@
+import json
+import hashlib
+import numpy as np
+import pytest
+from unittest.mock import patch
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from scripts.tune_retrieval import (
+    RetrievalTuner, load_questions, answer_rank, pareto_front, recommend, report, grid, parse_int_list,
+)
+
+
+class BagOfWordsEmbeddings(Embeddings):
+    """Deterministic local embeddings: questions land near passages sharing their words."""
+
+    model = "bag-of-words"
+
+    def _embed(self, text: str) -> list:
+        vector = np.zeros(64)
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.strip("?.,").encode()).hexdigest(), 16) % 64] += 1
+        return (vector / (np.linalg.norm(vector) or 1)).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def row(**metrics):
+    base = {"doc_type": "generic", "chunk_size": 1000, "chunk_overlap": 100, "k": 5, "questions": 4,
+            "hit_rate": 0.5, "mrr": 0.5, "prompt_tokens": 500, "index_s": 1.0, "index_kb": 10}
+    return {**base, **metrics}
+
+
+# === 1. Inputs ===
+def test_load_questions_resolves_documents(tmp_path):
+    path = tmp_path / "questions.jsonl"
+    path.write_text(json.dumps({"document": "notes.txt", "question": "Q?", "answer": "A"}) + "\n\n")
+    [item] = load_questions(str(path))
+    assert item["document"] == str(tmp_path / "notes.txt")
+
+    path.write_text(json.dumps({"document": "notes.txt", "question": "Q?"}) + "\n")
+    with pytest.raises(ValueError, match="answer"):
+        load_questions(str(path))
+
+
+def test_grid_skips_overlaps_not_smaller_than_chunks():
+    assert parse_int_list("500, 1000,500") == [500, 1000]
+    assert grid([200, 500], [0, 200]) == [(200, 0), (500, 0), (500, 200)]
+
+
+# === 2. Scoring ===
+def test_answer_rank_ignores_case_and_whitespace():
+    passages = [Document(page_content="Cells divide."), Document(page_content="Osmosis is the\n diffusion of WATER.")]
+    assert answer_rank(passages, "diffusion of water") == 2
+    assert answer_rank(passages, "photosynthesis") == 0
+
+
+def test_pareto_front_and_recommendation():
+    cheap = row(k=3, mrr=0.4, hit_rate=0.5, prompt_tokens=300)
+    best = row(k=8, mrr=0.8, hit_rate=1.0, prompt_tokens=900)
+    dominated = row(k=5, mrr=0.4, hit_rate=0.5, prompt_tokens=600)
+    front = pareto_front([cheap, best, dominated])
+    assert cheap in front and best in front and dominated not in front
+    assert recommend(front) is best
+
+    summary = report([cheap, best, dominated, row(doc_type="academic")])
+    assert set(summary) == {"generic", "academic"}
+    assert summary["generic"]["recommended"]["k"] == 8
+
+
+# === 3. End to end over a small corpus ===
+def test_tuner_reports_quality_and_cost(tmp_path):
+    document = tmp_path / "cells.txt"
+    document.write_text(
+        ("Osmosis is the diffusion of water across a membrane. " * 4
+         + "Mitochondria produce ATP through cellular respiration. " * 4
+         + "Chloroplasts capture light energy during photosynthesis. " * 4) * 3
+    )
+    questions = [
+        {"document": str(document), "question": "What is osmosis diffusion of water?", "answer": "diffusion of water"},
+        {"document": str(document), "question": "What do mitochondria produce?", "answer": "mitochondria produce ATP"},
+    ]
+
+    with patch("langchain_openai.OpenAIEmbeddings", return_value=BagOfWordsEmbeddings()), \
+            patch("utils.prepare_vectordb.OpenAIEmbeddings", return_value=BagOfWordsEmbeddings()), \
+            patch("utils.tokens.count_num_tokens", side_effect=lambda text, model=None: len(text.split())), \
+            patch("utils.context_assembly.count_num_tokens", side_effect=lambda text, model=None: len(text.split())):
+        tuner = RetrievalTuner(questions, ks=[1, 3], backend_name="numpy", work_dir=tmp_path / "work")
+        rows = tuner.run([(200, 0), (400, 50)])
+
+    assert {(r["chunk_size"], r["chunk_overlap"], r["k"]) for r in rows} == {(200, 0, 1), (200, 0, 3), (400, 50, 1), (400, 50, 3)}
+    assert all(r["questions"] == 2 and r["index_kb"] > 0 and r["index_s"] >= 0 for r in rows)
+    assert all(0 <= r["mrr"] <= r["hit_rate"] <= 1 for r in rows)
+    # More passages can only add answer hits, and cost more prompt tokens
+    by_key = {(r["chunk_size"], r["k"]): r for r in rows}
+    assert by_key[200, 3]["hit_rate"] >= by_key[200, 1]["hit_rate"]
+    assert by_key[200, 3]["prompt_tokens"] >= by_key[200, 1]["prompt_tokens"]
@@ -0,0 +1,68 @@
+import io
+import hashlib
+import pytest
+from utils.upload_store import UploadStore, UploadRejectedError
+
+
+CONTENT = b"Lecture 1: Cell biology\n" * 100
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadStore(tmp_path, max_upload_bytes=10_000, chunk_size=64, allowed_extensions=["pdf", "txt"])
+
+
+# === 1. Streaming save is content-addressed ===
+def test_save_streams_and_hashes(store):
+    stored = store.save(io.BytesIO(CONTENT), "notes.txt", "session-a")
+    assert stored.digest == hashlib.sha256(CONTENT).hexdigest()
+    assert stored.size == len(CONTENT)
+    assert stored.path.endswith(f"{stored.digest}.txt")
+    with open(stored.path, "rb") as f:
+        assert f.read() == CONTENT
+
+
+# === 2. Identical uploads are deduplicated ===
+def test_same_content_shares_one_object(store):
+    first = store.save(io.BytesIO(CONTENT), "a.txt", "session-a")
+    second = store.save(io.BytesIO(CONTENT), "b.txt", "session-b")
+    assert first.path == second.path
+    assert store.refcount(first.key) == 2
+    assert not list(store.tmp_dir.iterdir())
+
+
+# === 3. Refcounted cleanup ===
+def test_release_deletes_only_after_last_reference(store):
+    stored = store.save(io.BytesIO(CONTENT), "a.txt", "session-a")
+    store.save(io.BytesIO(CONTENT), "a.txt", "session-b")
+
+    assert store.release(stored.path, "session-a") is False
+    assert store.refcount(stored.key) == 1
+    assert store.release(stored.path, "session-b") is True
+    assert not store.object_path(stored.digest, "txt").exists()
+
+
+def test_prune_expires_stale_references(store):
+    stored = store.save(io.BytesIO(CONTENT), "a.txt", "session-a")
+    assert store.prune(max_age_seconds=-1) == 1
+    assert not store.object_path(stored.digest, "txt").exists()
+
+
+# === 4. Limits ===
+def test_declared_size_rejected_up_front(store):
+    stream = io.BytesIO(CONTENT)
+    with pytest.raises(UploadRejectedError):
+        store.save(stream, "big.txt", "session-a", size=50_000)
+    assert stream.tell() == 0
+
+
+def test_actual_size_enforced_while_streaming(store):
+    with pytest.raises(UploadRejectedError):
+        store.save(io.BytesIO(b"x" * 20_000), "big.txt", "session-a")
+    assert not list(store.tmp_dir.iterdir())
+    assert not list(store.objects_dir.iterdir())
+
+
+def test_unsupported_extension(store):
+    with pytest.raises(UploadRejectedError, match="Unsupported file type"):
+        store.save(io.BytesIO(CONTENT), "virus.exe", "session-a")
@@ -0,0 +1,275 @@
+import numpy as np
+import pytest
+from pathlib import Path
+from unittest.mock import patch
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from utils.vector_store import (
+    NumpyVectorStore, top_k_indices, get_vector_store_backend, index_directory_for,
+    quantize, dequantize, recall_at_k, RemoteBackend, IndexServerUnavailable
+)
+from utils import index_versions
+
+
+class KeywordEmbeddings(Embeddings):
+    """Deterministic bag-of-words embeddings over a tiny vocabulary."""
+    VOCAB = ["cell", "membrane", "osmosis", "photosynthesis", "light", "energy", "dna", "gene"]
+
+    def _embed(self, text):
+        words = text.lower().split()
+        return [float(words.count(term)) + 0.01 for term in self.VOCAB]
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+DOCS = [
+    Document(page_content="the cell membrane controls osmosis", metadata={"page": 0}),
+    Document(page_content="photosynthesis turns light into energy", metadata={"page": 1}),
+    Document(page_content="dna carries each gene", metadata={"page": 2}),
+]
+
+
+# === 1. Exact top-k ===
+def test_top_k_indices_matches_full_sort():
+    scores = np.random.default_rng(0).normal(size=500).astype(np.float32)
+    assert list(top_k_indices(scores, 10)) == list(np.argsort(-scores)[:10])
+    assert len(top_k_indices(scores, 1000)) == 500
+
+
+def test_similarity_search_ranks_relevant_chunk_first():
+    store = NumpyVectorStore.from_documents(DOCS, KeywordEmbeddings())
+    results = store.similarity_search("how does light give energy", k=2)
+    assert results[0].metadata["page"] == 1
+    assert len(results) == 2
+
+
+# === 2. Persistence with a memory-mapped matrix ===
+def test_save_and_load_round_trip(tmp_path):
+    NumpyVectorStore.from_documents(DOCS, KeywordEmbeddings(), persist_directory=tmp_path)
+    assert NumpyVectorStore.exists(tmp_path)
+
+    loaded = NumpyVectorStore.load(tmp_path, KeywordEmbeddings())
+    assert isinstance(loaded.matrix, np.memmap)
+    assert loaded.matrix.dtype == np.float32
+    assert loaded.similarity_search("gene dna", k=1)[0].page_content == "dna carries each gene"
+
+
+def test_as_retriever(tmp_path):
+    store = NumpyVectorStore.from_documents(DOCS, KeywordEmbeddings())
+    docs = store.as_retriever(search_kwargs={"k": 1}).invoke("cell membrane")
+    assert docs[0].metadata["page"] == 0
+
+
+# === 3. Backend selection ===
+def test_backend_registry():
+    assert get_vector_store_backend("numpy").name == "numpy"
+    assert get_vector_store_backend("chroma").name == "chroma"
+    with pytest.raises(ValueError, match="Unknown vector store backend"):
+        get_vector_store_backend("faiss")
+
+
+def test_index_directory_is_per_document(tmp_path):
+    path = index_directory_for(tmp_path, "data/uploads/objects/ab/abc123.pdf", "numpy")
+    assert path == str(tmp_path / "numpy" / "abc123")
+
+
+# === 4. Quantized storage ===
+def random_unit_vectors(n, dims, seed=0):
+    matrix = np.random.default_rng(seed).normal(size=(n, dims)).astype(np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("dtype, stored", [("float16", np.float16), ("int8", np.int8)])
+def test_quantize_round_trip_is_close(dtype, stored):
+    matrix = random_unit_vectors(50, 64)
+    quantized, scales = quantize(matrix, dtype)
+    assert quantized.dtype == stored
+    assert np.abs(dequantize(quantized, scales) - matrix).max() < 0.02
+
+
+def test_quantize_rejects_unknown_dtype():
+    with pytest.raises(ValueError, match="Unsupported embedding dtype"):
+        quantize(random_unit_vectors(2, 4), "int4")
+
+
+def make_store(dtype, full, rescore_factor=4):
+    store = NumpyVectorStore(KeywordEmbeddings(), dtype=dtype, rescore_factor=rescore_factor)
+    store._set_vectors(full)
+    store.documents = [Document(page_content=str(i)) for i in range(len(full))]
+    return store
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_quantized_recall_against_exact(dtype):
+    full = random_unit_vectors(400, 96)
+    store = make_store(dtype, full)
+    assert store.measure_recall(k=5) == 1.0
+    assert store.measure_recall(k=5, rescore=False) > 0.8
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_metadata_filter_restricts_search_to_matching_rows(dtype):
+    full = random_unit_vectors(200, 32)
+    store = make_store(dtype, full)
+    for i, doc in enumerate(store.documents):
+        doc.metadata["section"] = i // 20
+    query = full[5]  # row 5 is in section 0
+
+    allowed = store.similarity_search_by_vector(query, k=5, filter={"section": {"$in": [2, 7]}})
+    assert len(allowed) == 5 and {doc.metadata["section"] for doc in allowed} <= {2, 7}
+    rows = store.filter_rows({"section": {"$in": [2, 7]}})
+    expected = rows[np.argsort(-(full[rows] @ query))[:5]]
+    assert [doc.page_content for doc in allowed] == [str(i) for i in expected]
+
+    assert store.similarity_search_by_vector(query, k=1, filter={"section": 0})[0].page_content == "5"
+    assert store.similarity_search_by_vector(query, k=5, filter={"section": 99}) == []
+
+
+def test_int8_index_saved_smaller_and_reloaded(tmp_path):
+    store = NumpyVectorStore.from_documents(DOCS, KeywordEmbeddings(), persist_directory=tmp_path, dtype="int8")
+    assert "recall" in store.meta
+
+    loaded = NumpyVectorStore.load(tmp_path, KeywordEmbeddings())
+    assert loaded.dtype == "int8"
+    assert loaded.matrix.dtype == np.int8
+    assert loaded.scales is not None
+    assert loaded.similarity_search("gene dna", k=1)[0].page_content == "dna carries each gene"
+
+
+def test_recall_at_k():
+    exact = [np.array([1, 2, 3]), np.array([4, 5, 6])]
+    approximate = [np.array([1, 2, 9]), np.array([6, 5, 4])]
+    assert recall_at_k(exact, approximate, 3) == pytest.approx(5 / 6)
+
+
+# === 5. Versioned, atomically published indexes ===
+def test_publish_swaps_in_new_version_while_readers_keep_old(tmp_path):
+    backend = get_vector_store_backend("numpy")
+    index_directory = str(tmp_path / "doc")
+    assert not backend.is_published(index_directory)
+
+    first = backend.publish(DOCS[:2], KeywordEmbeddings(), index_directory)
+    reader = backend.open_published(index_directory, KeywordEmbeddings())
+    manifest = index_versions.read_manifest(index_directory)
+    assert manifest["path"].endswith(manifest["version"]) and manifest["chunks"] == 2
+
+    second = backend.publish(DOCS, KeywordEmbeddings(), index_directory)
+    assert second != first
+    assert index_versions.read_manifest(index_directory)["previous"] == manifest["version"]
+
+    # The earlier reader still serves its version; new readers get the new one
+    assert len(reader.similarity_search("light energy", k=5)) == 2
+    assert len(backend.open_published(index_directory, KeywordEmbeddings()).similarity_search("dna", k=5)) == 3
+    assert not list((tmp_path / "doc" / index_versions.STAGING_DIR).iterdir())
+
+
+def test_failed_build_leaves_live_version_untouched(tmp_path):
+    class BrokenEmbeddings(KeywordEmbeddings):
+        def embed_documents(self, texts):
+            raise RuntimeError("no such column: collections.topic")
+
+    backend = get_vector_store_backend("numpy")
+    index_directory = str(tmp_path / "doc")
+    live = backend.publish(DOCS, KeywordEmbeddings(), index_directory)
+
+    with pytest.raises(RuntimeError):
+        backend.publish(DOCS, BrokenEmbeddings(), index_directory)
+
+    assert backend.published_directory(index_directory) == live
+    assert NumpyVectorStore.exists(live)
+    assert not list((tmp_path / "doc" / index_versions.STAGING_DIR).iterdir())
+
+
+def test_legacy_flat_index_is_still_served(tmp_path):
+    NumpyVectorStore.from_documents(DOCS, KeywordEmbeddings(), persist_directory=tmp_path)
+    backend = get_vector_store_backend("numpy")
+    assert backend.published_directory(str(tmp_path)) == str(tmp_path)
+
+
+def test_prune_keeps_live_and_recent_versions(tmp_path):
+    backend = get_vector_store_backend("numpy")
+    index_directory = str(tmp_path / "doc")
+    for _ in range(4):
+        backend.publish(DOCS, KeywordEmbeddings(), index_directory)
+    versions_dir = tmp_path / "doc" / index_versions.VERSIONS_DIR
+    assert len(list(versions_dir.iterdir())) == 4  # all within the grace period
+
+    live = backend.published_directory(index_directory)
+    assert index_versions.prune(index_directory, keep=2, grace_seconds=0) == 2
+    assert sorted(p.name for p in versions_dir.iterdir())[-1] == Path(live).name
+    assert backend.is_published(index_directory)
+
+
+# === 6. Client/server mode ===
+@pytest.fixture
+def index_server(tmp_path):
+    from starlette.testclient import TestClient
+    import index_server
+
+    with patch.object(index_server.CONFIG, "index_server_directory", tmp_path / "shared"), \
+            patch.object(index_server.CONFIG, "index_server_backend", "numpy"), \
+            patch.object(index_server.CONFIG, "index_server_options", {}), \
+            TestClient(index_server.app, base_url="http://index-server") as client:
+        # Replicas talk to the in-process server through the pooled-client hook
+        with patch("utils.vector_store._http_client", return_value=client):
+            RemoteBackend._health_checked.clear()
+            yield client
+
+
+def test_remote_index_is_built_once_and_served_to_every_replica(index_server, tmp_path):
+    embedding = KeywordEmbeddings()
+    replica_a = get_vector_store_backend("remote", {"url": "http://index-server"})
+    replica_b = get_vector_store_backend("remote", {"url": "http://index-server"})
+    # Each replica derives its own local path; only the content-hash name is shared
+    directory_a = index_directory_for(tmp_path / "replica-a", "abc123.pdf", "remote")
+    directory_b = index_directory_for(tmp_path / "replica-b", "abc123.pdf", "remote")
+
+    assert not replica_a.is_published(directory_a)
+    replica_a.publish(DOCS, embedding, directory_a, {"source": "abc123.pdf"})
+
+    assert replica_b.is_published(directory_b)
+    retriever = replica_b.open_published(directory_b, embedding).as_retriever(search_kwargs={"k": 1})
+    [doc] = retriever.invoke("how does osmosis work at the membrane")
+    assert doc.page_content == "the cell membrane controls osmosis"
+    assert doc.metadata == {"page": 0}
+
+    info = index_server.get("/v1/indexes/abc123").json()
+    assert (info["chunks"], info["source"]) == (3, "abc123.pdf")
+    assert index_server.get("/stats").json()["indexes"] == 1
+
+
+def test_remote_server_validates_requests(index_server):
+    assert index_server.get("/v1/indexes/missing").status_code == 404
+    assert index_server.post("/v1/indexes/missing/search", json={"embedding": [0.1], "k": 1}).status_code == 404
+    assert index_server.get("/v1/indexes/.hidden").status_code == 400
+    response = index_server.put("/v1/indexes/doc", json={"texts": ["a", "b"], "embeddings": [[0.1]]})
+    assert response.status_code == 400
+
+
+def test_remote_server_health_is_independent_of_load(index_server):
+    import index_server as server
+
+    # Neither scans the indexes nor waits for a build/search slot
+    with patch.object(server.IndexRegistry, "count", side_effect=AssertionError("health must not count indexes")), \
+            patch.object(server, "run_blocking", side_effect=AssertionError("health must not use the limiter")):
+        assert index_server.get("/health").json() == {"status": "ok", "backend": "numpy"}
+
+
+def test_remote_server_rejects_oversized_bodies(index_server):
+    import index_server as server
+
+    with patch.object(server.CONFIG, "index_server_max_body_mb", 0.001):
+        texts = ["chunk"] * 50
+        response = index_server.put("/v1/indexes/doc", json={"texts": texts, "embeddings": [[0.1] * 8] * 50})
+    assert response.status_code == 413
+
+
+def test_remote_backend_reports_unavailable_server():
+    RemoteBackend._health_checked.clear()
+    backend = get_vector_store_backend("remote", {"url": "http://127.0.0.1:9", "timeout_s": 1})
+    with pytest.raises(IndexServerUnavailable):
+        backend.is_published("vectorstore/custom/remote/abc123")
@@ -1,6 +1,9 @@
 import os
+import shutil
 import pytest
+from pathlib import Path
 from unittest.mock import patch, MagicMock
+from utils import index_versions
 from utils.prepare_vectordb import PrepareVectorDB
 
 
@@ -14,23 +17,29 @@ SAMPLE_CHUNKS = [MagicMock() for _ in range(3)]
 # === 1. Successful vector DB preparation ===
 @patch("utils.prepare_vectordb.PyPDFLoader")
 @patch("utils.prepare_vectordb.OpenAIEmbeddings")
-@patch("utils.prepare_vectordb.Chroma")
 @patch("utils.prepare_vectordb.RecursiveCharacterTextSplitter")
-def test_prepare_vectordb_success(mock_splitter, mock_chroma, mock_embeddings, mock_loader):
+def test_prepare_vectordb_success(mock_splitter, mock_embeddings, mock_loader, tmp_path):
+    mock_loader.__name__ = "PyPDFLoader"
     mock_loader.return_value.load.return_value = [SAMPLE_DOC]
     mock_splitter.return_value.split_documents.return_value = SAMPLE_CHUNKS
-    mock_chroma.from_documents.return_value.persist.return_value = None
 
     prep = PrepareVectorDB(
         data_directory=FAKE_FILE,
-        persist_directory=FAKE_DB_PATH,
+        persist_directory=tmp_path / "index",
         openai_api_key=API_KEY
     )
 
-    with patch("os.path.exists", return_value=True):
-        prep.prepare_and_save_vectordb()
-        mock_loader.assert_called_once()
-        mock_chroma.from_documents.assert_called_once()
+    with patch("os.path.exists", return_value=True), \
+            patch.object(prep.backend, "build") as mock_build:
+        published = prep.prepare_and_save_vectordb()
+
+    mock_loader.assert_called_once()
+    mock_build.assert_called_once()
+    # Built in staging, then renamed into versions/ and recorded in the manifest
+    assert "staging" in mock_build.call_args[0][2]
+    manifest = index_versions.read_manifest(tmp_path / "index")
+    assert published.endswith(manifest["path"])
+    assert manifest["chunks"] == len(SAMPLE_CHUNKS)
 
 
 # === 2. Unsupported file extension ===
@@ -53,13 +62,15 @@ def test_file_not_found():
         openai_api_key=API_KEY
     )
     with patch("os.path.exists", return_value=False):
-        with pytest.raises(FileNotFoundError):
+        with pytest.raises(RuntimeError) as exc_info:
             prep.prepare_and_save_vectordb()
+    assert isinstance(exc_info.value.__cause__, FileNotFoundError)
 
 
 # === 4. Document loading failure ===
 @patch("utils.prepare_vectordb.PyPDFLoader")
 def test_load_document_failure(mock_loader):
+    mock_loader.__name__ = "PyPDFLoader"
     mock_loader.return_value.load.side_effect = Exception("Corrupted PDF")
 
     prep = PrepareVectorDB(
@@ -69,14 +80,16 @@ def test_load_document_failure(mock_loader):
     )
 
     with patch("os.path.exists", return_value=True):
-        with pytest.raises(Exception, match="Corrupted PDF"):
+        with pytest.raises(RuntimeError) as exc_info:
             prep.prepare_and_save_vectordb()
+    assert "Corrupted PDF" in str(exc_info.value.__cause__)
 
 
 # === 5. No chunks after splitting ===
 @patch("utils.prepare_vectordb.PyPDFLoader")
 @patch("utils.prepare_vectordb.RecursiveCharacterTextSplitter")
 def test_no_chunks_extracted(mock_splitter, mock_loader):
+    mock_loader.__name__ = "PyPDFLoader"
     mock_loader.return_value.load.return_value = [SAMPLE_DOC]
     mock_splitter.return_value.split_documents.return_value = []
 
@@ -87,42 +100,69 @@ def test_no_chunks_extracted(mock_splitter, mock_loader):
     )
 
     with patch("os.path.exists", return_value=True):
-        with pytest.raises(ValueError, match="no text chunks"):
+        with pytest.raises(RuntimeError) as exc_info:
             prep.prepare_and_save_vectordb()
+    assert "no text chunks" in str(exc_info.value.__cause__)
 
 
-# === 6. Recovery from corrupt vector store (e.g. "no such column") ===
+# === 6. A failed rebuild never touches the live index ===
 @patch("utils.prepare_vectordb.PyPDFLoader")
 @patch("utils.prepare_vectordb.RecursiveCharacterTextSplitter")
 @patch("utils.prepare_vectordb.OpenAIEmbeddings")
-@patch("utils.prepare_vectordb.Chroma.from_documents")
-@patch("os.path.exists", return_value=True)
-@patch("shutil.rmtree")
-def test_corrupt_vector_db_retry(
-    mock_rmtree, mock_exists, mock_chroma, mock_embeddings,
-    mock_splitter, mock_loader
+@patch("shutil.rmtree", wraps=shutil.rmtree)
+def test_failed_rebuild_keeps_serving_previous_version(
+    mock_rmtree, mock_embeddings, mock_splitter, mock_loader, tmp_path
 ):
-    # First call fails with "no such column", second succeeds
+    mock_loader.__name__ = "PyPDFLoader"
     mock_loader.return_value.load.return_value = [SAMPLE_DOC]
     mock_splitter.return_value.split_documents.return_value = SAMPLE_CHUNKS
 
-    # First Chroma.from_documents call fails
-    def side_effect(*args, **kwargs):
-        if not hasattr(side_effect, "called"):
-            side_effect.called = True
-            raise Exception("no such column: embeddings")
-        else:
-            return MagicMock(persist=MagicMock())
-
-    mock_chroma.side_effect = side_effect
-
     prep = PrepareVectorDB(
         data_directory=FAKE_FILE,
-        persist_directory=FAKE_DB_PATH,
+        persist_directory=tmp_path / "index",
         openai_api_key=API_KEY
     )
 
-    prep.prepare_and_save_vectordb()
+    def build(documents, embedding, directory):
+        # Stand-in for a real index: one file in the build directory
+        (Path(directory) / "index.bin").write_bytes(b"v1")
+
+    with patch("os.path.exists", return_value=True):
+        with patch.object(prep.backend, "build", side_effect=build):
+            live = prep.prepare_and_save_vectordb()
+
+        with patch.object(prep.backend, "build", side_effect=Exception("no such column: collections.topic")):
+            with pytest.raises(RuntimeError):
+                prep.prepare_and_save_vectordb()
+
+    # Only the failed build's own staging directory was removed
+    assert all("staging" in str(call.args[0]) for call in mock_rmtree.call_args_list)
+    assert (Path(live) / "index.bin").read_bytes() == b"v1"
+    assert str(tmp_path / "index" / index_versions.read_manifest(tmp_path / "index")["path"]) == live
+
+
+# === 7. Long documents also get section summaries ===
+@patch("utils.prepare_vectordb.build_sections")
+@patch("utils.prepare_vectordb.PyPDFLoader")
+@patch("utils.prepare_vectordb.OpenAIEmbeddings")
+@patch("utils.prepare_vectordb.RecursiveCharacterTextSplitter")
+def test_hierarchical_sections_only_above_threshold(mock_splitter, mock_embeddings, mock_loader, mock_sections, tmp_path):
+    mock_loader.__name__ = "PyPDFLoader"
+    mock_loader.return_value.load.return_value = [SAMPLE_DOC]
+    mock_splitter.return_value.split_documents.return_value = SAMPLE_CHUNKS
+    mock_sections.return_value = [MagicMock()]
+
+    for min_chunks, expected in [(4, None), (3, mock_sections.return_value)]:
+        prep = PrepareVectorDB(
+            data_directory=FAKE_FILE,
+            persist_directory=tmp_path / "index",
+            openai_api_key=API_KEY,
+            hierarchical_min_chunks=min_chunks,
+            section_chunks=2
+        )
+        with patch("os.path.exists", return_value=True), \
+                patch.object(prep.backend, "publish", return_value="published") as mock_publish:
+            prep.prepare_and_save_vectordb()
+        assert mock_publish.call_args.kwargs["sections"] == expected
 
-    assert mock_rmtree.called
-    assert mock_chroma.call_count == 2
+    mock_sections.assert_called_once_with(SAMPLE_CHUNKS, 2)
@@ -0,0 +1,109 @@
+import traceback
+from typing import List, Tuple
+from utils.tokens import count_num_tokens, truncate_to_tokens
+
+
+CONDENSE_PROMPT = (
+    "Given the conversation so far and a follow-up question, rewrite the follow-up "
+    "as a single standalone question that can be understood without the conversation. "
+    "Keep names, terms and page references. Return only the question.\n\n"
+    "Conversation:\n{history}\n\n"
+    "Follow-up question: {question}\n"
+    "Standalone question:"
+)
+
+SUMMARY_PROMPT = (
+    "Update the running summary of a study conversation about a document. "
+    "Fold the new turns into the existing summary in at most {max_tokens} tokens, "
+    "keeping the topics, terms and facts the student asked about.\n\n"
+    "Existing summary:\n{summary}\n\n"
+    "New turns:\n{turns}\n\n"
+    "Updated summary:"
+)
+
+
+class ChatMemory:
+    """
+    Bounded conversational memory for chat with a file.
+
+    Keeps the last `max_pairs` Q/A pairs within `token_budget` tokens; older
+    turns are rolled into a running summary so the prompt size stays flat
+    however long the session runs.
+    """
+
+    def __init__(
+        self,
+        llm,
+        max_pairs: int = 5,
+        token_budget: int = 1500,
+        summary_max_tokens: int = 300,
+        model: str = "gpt-4"
+    ):
+        self.llm = llm
+        self.max_pairs = max_pairs
+        self.token_budget = token_budget
+        self.summary_max_tokens = summary_max_tokens
+        self.model = model
+        self.pairs: List[Tuple[str, str]] = []
+        self.summary = ""
+
+    @staticmethod
+    def _format_turns(pairs: List[Tuple[str, str]]) -> str:
+        return "\n".join(f"Student: {q}\nHelpy: {a}" for q, a in pairs)
+
+    def render(self) -> str:
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of earlier conversation: {self.summary}")
+        if self.pairs:
+            parts.append(self._format_turns(self.pairs))
+        return "\n".join(parts)
+
+    def token_count(self) -> int:
+        return count_num_tokens(self.render(), self.model)
+
+    def condense_question(self, question: str) -> str:
+        """Rewrite a follow-up into a standalone query for retrieval."""
+        if not self.pairs and not self.summary:
+            return question
+
+        prompt = CONDENSE_PROMPT.format(history=self.render(), question=question)
+        try:
+            standalone = self.llm.invoke(prompt).content.strip()
+            return standalone or question
+        except Exception as e:
+            print(f"[⚠️ Failed to condense question, using it as-is]: {e}")
+            traceback.print_exc()
+            return question
+
+    def add_turn(self, question: str, answer: str):
+        self.pairs.append((question, answer))
+
+        evicted = []
+        while len(self.pairs) > self.max_pairs:
+            evicted.append(self.pairs.pop(0))
+        while len(self.pairs) > 1 and self.token_count() > self.token_budget:
+            evicted.append(self.pairs.pop(0))
+
+        if evicted:
+            self._roll_into_summary(evicted)
+
+    def _roll_into_summary(self, evicted: List[Tuple[str, str]]):
+        prompt = SUMMARY_PROMPT.format(
+            max_tokens=self.summary_max_tokens,
+            summary=self.summary or "(none)",
+            turns=self._format_turns(evicted)
+        )
+        try:
+            summary = self.llm.invoke(prompt).content.strip()
+        except Exception as e:
+            print(f"[⚠️ Failed to update conversation summary]: {e}")
+            traceback.print_exc()
+            # Keep the raw turns rather than losing them; the cap below bounds the size
+            summary = f"{self.summary}\n{self._format_turns(evicted)}".strip()
+
+        self.summary = truncate_to_tokens(summary, self.summary_max_tokens, self.model)
+
+    def clear(self):
+        self.pairs = []
+        self.summary = ""
@@ -5,51 +5,117 @@ try:
 except ImportError:
     pass  # Use built-in sqlite3 on Windows/local
     
+import uuid
+import hashlib
+import threading
 import traceback
+import contextvars
+from typing import Tuple
 import streamlit as st
 from utils.prepare_vectordb import PrepareVectorDB
 from langchain.chains import RetrievalQA
-from langchain_community.vectorstores import Chroma
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_community.embeddings import OpenAIEmbeddings
-from langchain_openai import ChatOpenAI
 from utils.load_config import LoadConfig
+from utils.chat_memory import ChatMemory
+from utils.vector_store import get_vector_store_backend, index_directory_for, IndexServerUnavailable
+from utils.context_assembly import AssembledContextRetriever
+from utils.hierarchical_retrieval import make_retriever
+from utils.model_router import get_chat_model
+from utils.faq import faq_path_for, load_faq, build_faq_in_background
+from utils.summarizer import Summarizer
+from utils.section_summaries import parse_range_request, unit_label
+from utils.session_store import get_session_store
+from utils.single_flight import get_single_flight, content_key
+from utils.metering import MeteredEmbeddings, metering_context, check_budget, record_cache_hit, BudgetExceededError
+from utils.deadline import deadline_context, time_left, near, mark_partial, DeadlineExceeded, PartialResult
 
 CONFIG = LoadConfig()
 
 
+def build_index_once(file_path: str, index_directory: str, backend) -> None:
+    """Build the index unless it's published; concurrent builders of one document share a run."""
+    key = content_key(file_path)
+    if key is None:
+        build_index(file_path, index_directory, backend.name)
+        return
+    get_single_flight().do(
+        "index", f"{backend.name}-{key}",
+        lambda: build_index(file_path, index_directory, backend.name),
+        done=lambda: backend.is_published(index_directory)
+    )
+
+
+def build_index(file_path: str, index_directory: str, backend_name: str) -> str:
+    # Published atomically as a new version; readers of the previous one are unaffected
+    processor = PrepareVectorDB(
+        data_directory=[file_path],
+        persist_directory=index_directory,
+        openai_api_key=CONFIG.openai_api_key,
+        chunk_size=CONFIG.chunk_size,
+        chunk_overlap=CONFIG.chunk_overlap,
+        pdf_workers=CONFIG.pdf_workers,
+        parallel_min_pages=CONFIG.parallel_min_pages,
+        vector_store_backend=backend_name,
+        vector_store_options=CONFIG.vector_store_options,
+        hierarchical_min_chunks=CONFIG.hierarchical_min_chunks,
+        section_chunks=CONFIG.section_chunks
+    )
+    with metering_context(feature="index"):
+        return processor.prepare_and_save_vectordb()
+
+
 #function 1
 @st.cache_resource(show_spinner=False)
 def get_qa_chain(file_path: str):
     try:
-        # Step 1: Prepare vector store (if not already persisted)
-        processor = PrepareVectorDB(
-            data_directory=[file_path],
-            persist_directory=CONFIG.custom_persist_directory,
-            openai_api_key=CONFIG.openai_api_key,
-            chunk_size=CONFIG.chunk_size,
-            chunk_overlap=CONFIG.chunk_overlap
-        )
-        processor.prepare_and_save_vectordb()
+        backend = get_vector_store_backend(CONFIG.vector_store_backend, CONFIG.vector_store_options)
+        index_directory = index_directory_for(CONFIG.custom_persist_directory, file_path, backend.name)
+
+        # Step 1: Build the per-document index (file names are content hashes, so reuse is safe)
+        if not backend.is_published(index_directory):
+            build_index_once(file_path, index_directory, backend)
 
-        # Step 2: Load vector store and retriever
-        vectordb = Chroma(
-            persist_directory=str(CONFIG.custom_persist_directory),
-            embedding_function=OpenAIEmbeddings(openai_api_key=CONFIG.openai_api_key)
+        # Step 2: Load vector store and retriever (query embeddings are metered)
+        embeddings = OpenAIEmbeddings(openai_api_key=CONFIG.openai_api_key)
+        embeddings = MeteredEmbeddings(embeddings, embeddings.model)
+        try:
+            vectordb, sections = backend.open_hierarchy(index_directory, embeddings)
+        except IndexServerUnavailable:
+            raise  # nothing to rebuild; the shared index server is down
+        except Exception as e:
+            # Unreadable (e.g. written by an incompatible Chroma): publish a fresh version
+            # next to it instead of deleting the directory other sessions may be reading
+            print(f"⚠️ Published index could not be opened ({type(e).__name__}: {e}). Rebuilding...")
+            build_index(file_path, index_directory, backend.name)
+            vectordb, sections = backend.open_hierarchy(index_directory, embeddings)
+
+        # Long documents search their best sections first; overlapping neighbours
+        # are then merged and trimmed before they reach the prompt
+        retriever = AssembledContextRetriever(
+            base_retriever=make_retriever(vectordb, sections, CONFIG.k, CONFIG.top_sections),
+            token_budget=CONFIG.context_token_budget,
+            dedupe_threshold=CONFIG.dedupe_threshold,
+            model=CONFIG.llm_engine
         )
-        retriever = vectordb.as_retriever(search_kwargs={"k": CONFIG.k})
 
         # Step 3: Setup QA chain
-        llm = ChatOpenAI(
-            model_name=CONFIG.llm_engine,
-            temperature=CONFIG.temperature,
-            openai_api_key=CONFIG.openai_api_key
-        )
+        llm = get_chat_model("chat", CONFIG.temperature, CONFIG.openai_api_key)
         qa_chain = RetrievalQA.from_chain_type(
             llm=llm,
             retriever=retriever,
             return_source_documents=False
         )
 
+        # Step 4: Answer the likely first questions in the background, off the interactive path
+        if CONFIG.faq_enabled:
+            build_faq_in_background(
+                lambda: Summarizer.extract_text_from_file(file_path),
+                qa_chain,
+                faq_path_for(CONFIG.custom_persist_directory, file_path),
+                CONFIG.faq_num_questions
+            )
+
         return qa_chain
 
     except Exception as e:
@@ -58,10 +124,163 @@ def get_qa_chain(file_path: str):
         return None
 
 
+@st.cache_resource(show_spinner=False)
+def get_memory_llm():
+    # Deterministic model for condensing follow-ups and rolling up old turns
+    return get_chat_model("memory", 0, CONFIG.openai_api_key)
+
+
+def new_chat_memory() -> ChatMemory:
+    return ChatMemory(
+        llm=get_memory_llm(),
+        max_pairs=CONFIG.number_of_q_a_pairs,
+        token_budget=CONFIG.memory_token_budget,
+        summary_max_tokens=CONFIG.memory_summary_max_tokens,
+        model=CONFIG.llm_engine
+    )
+
+
+class AnswerCollector(BaseCallbackHandler):
+    """Keeps the answer tokens as they stream; once abandoned, stops the chain at its next token."""
+
+    raise_error = True
+
+    def __init__(self):
+        self.tokens = []
+        self.abandoned = threading.Event()
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.tokens = []  # a fallback model starts the answer over
+
+    def on_llm_new_token(self, token: str, **kwargs):
+        if self.abandoned.is_set():
+            raise DeadlineExceeded("Answer abandoned at the deadline")
+        self.tokens.append(token)
+
+
+def answer_within_deadline(qa_chain, question: str) -> Tuple[str, bool]:
+    """
+    Answer with the QA chain; under a request deadline, stop waiting when it passes.
+
+    Returns (answer, partial). A partial answer is what the model had
+    streamed by the deadline, marked as partial.
+    """
+    left = time_left()
+    if left is None:
+        return qa_chain.run(question), False
+
+    collector = AnswerCollector()
+    outcome = {}
+
+    def run():
+        try:
+            outcome["answer"] = qa_chain.run(question, callbacks=[collector])
+        except Exception as e:
+            outcome["error"] = e
+
+    # The worker inherits the caller's context, so its usage is metered to the same user
+    worker = threading.Thread(target=contextvars.copy_context().run, args=(run,), daemon=True)
+    worker.start()
+    worker.join(left)
+    if "answer" in outcome:
+        return outcome["answer"], False
+    if "error" in outcome and not near():
+        raise outcome["error"]
+
+    collector.abandoned.set()
+    answer = "".join(collector.tokens).strip()
+    print(f"⏱️ Deadline reached: answering with {len(collector.tokens)} streamed tokens")
+    return mark_partial(answer or "I couldn't finish an answer in time; try asking a narrower question."), True
+
+
+def show_earlier_messages():
+    st.session_state.chat_window_size += CONFIG.chat_window
+
+
+def session_id() -> str:
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    return st.session_state.session_id
+
+
+def record_turn(question: str, answer: str):
+    # The transcript goes to disk; session state only keeps its length
+    get_session_store().append_chat(session_id(), question, answer)
+    st.session_state.chat_count += 1
+
+
+def render_chat_history():
+    # Only the most recent window is read from disk and rendered, as a single HTML block
+    if "chat_window_size" not in st.session_state:
+        st.session_state.chat_window_size = CONFIG.chat_window
+
+    visible = get_session_store().load_chat(session_id(), last_n=st.session_state.chat_window_size)
+    hidden = max(0, st.session_state.chat_count - len(visible))
+    if hidden:
+        st.button(
+            f"⬆️ Show earlier messages ({hidden} hidden)",
+            key="chat_show_earlier",
+            on_click=show_earlier_messages
+        )
+
+    if not visible:
+        return
+
+    st.markdown("".join(
+        f'''
+            <div class="chat-row user">
+                <div class="chat-bubble user-msg"><b>You:</b> {user_msg}</div>
+            </div>
+            <div class="chat-row bot">
+                <div class="chat-bubble bot-msg"><b>Helpy:</b> {bot_msg}</div>
+            </div>
+        '''
+        for user_msg, bot_msg in visible
+    ), unsafe_allow_html=True)
+
+
+def faq_key(question: str) -> str:
+    return hashlib.md5(question.encode()).hexdigest()[:10]
+
+
+def answer_from_faq(question: str, answer: str):
+    # Precomputed at index time: no retrieval or LLM call on click
+    record_cache_hit("faq")
+    record_turn(question, answer)
+    st.session_state.chat_memory.add_turn(question, answer)
+    st.session_state.faq_asked.add(faq_key(question))
+
+
+def render_faq_chips(file_path: str):
+    entries = load_faq(faq_path_for(CONFIG.custom_persist_directory, file_path))
+    pending = [entry for entry in entries if faq_key(entry["question"]) not in st.session_state.faq_asked]
+    if not pending:
+        return
+
+    st.caption("💡 Suggested questions")
+    columns = st.columns(min(3, len(pending)))
+    for i, entry in enumerate(pending):
+        columns[i % len(columns)].button(
+            entry["question"],
+            key=f"faq_{faq_key(entry['question'])}",
+            on_click=answer_from_faq,
+            args=(entry["question"], entry["answer"])
+        )
+
+
 #function 2
 def chat_with_file(file_path: str):
-    if "chat_history" not in st.session_state:
-        st.session_state.chat_history = []
+    # Fragment reruns skip app.py's top level, so the user is set here too
+    with metering_context(user_id=session_id(), feature="chat"):
+        _chat_with_file(file_path)
+
+
+def _chat_with_file(file_path: str):
+    if "chat_count" not in st.session_state:
+        st.session_state.chat_count = 0
+        st.session_state.faq_asked = set()
+    if "chat_memory" not in st.session_state:
+        st.session_state.chat_memory = new_chat_memory()
 
     #Load or Get Cached QA Chain
     qa_chain = get_qa_chain(file_path)
@@ -69,22 +288,15 @@ def chat_with_file(file_path: str):
         return
 
     #First-time bot greeting
-    if not st.session_state.chat_history:
+    if not st.session_state.chat_count:
         st.markdown('''
             <div class="chat-row bot">
                 <div class="chat-bubble bot-msg"><b>Helpy:</b> Hey, let me help you have a conversation with your file. Ask me anything!</div>
             </div>
         ''', unsafe_allow_html=True)
 
-    for user_msg, bot_msg in st.session_state.chat_history:
-        st.markdown(f'''
-            <div class="chat-row user">
-                <div class="chat-bubble user-msg"><b>You:</b> {user_msg}</div>
-            </div>
-            <div class="chat-row bot">
-                <div class="chat-bubble bot-msg"><b>Helpy:</b> {bot_msg}</div>
-            </div>
-        ''', unsafe_allow_html=True)
+    render_chat_history()
+    render_faq_chips(file_path)
 
     #Chat input
     user_input = st.chat_input("Ask something about your uploaded file...")
@@ -96,10 +308,32 @@ def chat_with_file(file_path: str):
             </div>
         ''', unsafe_allow_html=True)
 
+        try:
+            check_budget()
+        except BudgetExceededError as e:
+            st.warning(f"⏳ {e}")
+            return
+
         with st.spinner("Thinking..."):
             try:
-                response = qa_chain.run(user_input)
-                st.session_state.chat_history.append((user_input, response))
+                memory = st.session_state.chat_memory
+                page_range = parse_range_request(user_input) if unit_label(file_path) else None
+                if page_range:
+                    # "Summarize pages 40-55": reduce the stored chunk summaries instead of retrieving
+                    try:
+                        with deadline_context(CONFIG.deadlines["summary"]):
+                            response = Summarizer.summarize_range(file_path, *page_range)
+                    except PartialResult as e:
+                        response = e.result
+                    except ValueError as e:
+                        response = f"⚠️ {e}"
+                else:
+                    # Follow-ups are rewritten as standalone queries so retrieval finds the right chunks
+                    with deadline_context(CONFIG.deadlines["chat"]):
+                        standalone_question = memory.condense_question(user_input)
+                        response, _ = answer_within_deadline(qa_chain, standalone_question)
+                memory.add_turn(user_input, response)
+                record_turn(user_input, response)
             except Exception:
                 st.error("❌ Failed to get a response from the model.")
                 traceback.print_exc()
@@ -125,8 +359,11 @@ def chat_with_file(file_path: str):
 def reset_app_state():
     for key in [
         "file_path", "file_text", "questions", "current_question", "score",
-        "answered", "score_history", "active_tab", "chat_history"
+        "answered", "score_history", "active_tab", "chat_history", "chat_memory",
+        "chat_window_size", "chat_count", "faq_asked"
     ]:
         if key in st.session_state:
             del st.session_state[key]
+    if "session_id" in st.session_state:
+        get_session_store().clear_session(st.session_state["session_id"])
     st.rerun()
@@ -0,0 +1,124 @@
+import re
+from typing import List
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from utils.tokens import count_num_tokens, truncate_to_tokens
+
+
+def _span_key(doc: Document):
+    return (doc.metadata.get("source"), doc.metadata.get("page"))
+
+
+def merge_adjacent_chunks(docs: List[Document]) -> List[Document]:
+    """
+    Stitch overlapping or touching chunks of the same source/page back into
+    contiguous spans using their `start_index` metadata.
+
+    Spans keep the rank of their best-ranked chunk; chunks without offsets
+    are passed through untouched.
+    """
+    spans = {}
+    passthrough = []
+
+    for rank, doc in enumerate(docs):
+        if "start_index" not in doc.metadata:
+            passthrough.append((rank, doc))
+            continue
+        spans.setdefault(_span_key(doc), []).append((rank, doc))
+
+    merged = []
+    for group in spans.values():
+        group.sort(key=lambda item: item[1].metadata["start_index"])
+        rank, first = group[0]
+        start = first.metadata["start_index"]
+        text = first.page_content
+
+        for next_rank, doc in group[1:]:
+            next_start = doc.metadata["start_index"]
+            end = start + len(text)
+            if next_start <= end:
+                # Overlapping or adjacent: append only the part we don't have yet
+                text += doc.page_content[end - next_start:]
+                rank = min(rank, next_rank)
+            else:
+                merged.append((rank, _span(first, start, text)))
+                rank, first, start, text = next_rank, doc, next_start, doc.page_content
+
+        merged.append((rank, _span(first, start, text)))
+
+    ordered = sorted(merged + passthrough, key=lambda item: item[0])
+    return [doc for _, doc in ordered]
+
+
+def _span(first: Document, start: int, text: str) -> Document:
+    metadata = {**first.metadata, "start_index": start, "end_index": start + len(text)}
+    return Document(page_content=text, metadata=metadata)
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def drop_near_duplicates(docs: List[Document], threshold: float = 0.9) -> List[Document]:
+    """Drop passages whose word-shingle overlap with a higher-ranked one is >= threshold."""
+    kept, kept_shingles = [], []
+    for doc in docs:
+        shingles = _shingles(doc.page_content)
+        is_duplicate = False
+        for other in kept_shingles:
+            if not shingles or not other:
+                continue
+            # Containment of the smaller set catches passages repeated inside longer spans
+            overlap = len(shingles & other) / min(len(shingles), len(other))
+            if overlap >= threshold:
+                is_duplicate = True
+                break
+        if not is_duplicate:
+            kept.append(doc)
+            kept_shingles.append(shingles)
+    return kept
+
+
+def trim_to_budget(docs: List[Document], token_budget: int, model: str = "gpt-4") -> List[Document]:
+    """Keep passages in rank order until `token_budget` tokens; the last one may be cut."""
+    trimmed, used = [], 0
+    for doc in docs:
+        remaining = token_budget - used
+        if remaining <= 0:
+            break
+        tokens = count_num_tokens(doc.page_content, model)
+        if tokens > remaining:
+            text = truncate_to_tokens(doc.page_content, remaining, model)
+            trimmed.append(Document(page_content=text, metadata={**doc.metadata, "truncated": True}))
+            break
+        trimmed.append(doc)
+        used += tokens
+    return trimmed
+
+
+def assemble_context(
+    docs: List[Document],
+    token_budget: int = 3000,
+    dedupe_threshold: float = 0.9,
+    model: str = "gpt-4"
+) -> List[Document]:
+    docs = merge_adjacent_chunks(docs)
+    docs = drop_near_duplicates(docs, dedupe_threshold)
+    return trim_to_budget(docs, token_budget, model)
+
+
+class AssembledContextRetriever(BaseRetriever):
+    """Wraps a retriever so the "stuff" chain only sees merged, de-duplicated, budgeted context."""
+
+    base_retriever: BaseRetriever
+    token_budget: int = 3000
+    dedupe_threshold: float = 0.9
+    model: str = "gpt-4"
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        docs = self.base_retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        return assemble_context(docs, self.token_budget, self.dedupe_threshold, self.model)
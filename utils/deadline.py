@@ -0,0 +1,71 @@
+"""
+Per-request deadlines for model calls.
+
+A deadline is set once per request (by app.py per feature, by api.py from
+the X-Deadline-S header or the configured default) and, like the metering
+context, reaches worker threads started through contextvars.copy_context().
+route_completion caps every attempt at the time left. Multi-call pipelines
+check `near()` between calls: when the deadline is close they stop and
+raise PartialResult with what finished, marked as partial, instead of
+failing or overrunning.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Optional
+
+PARTIAL_NOTE = "⏱️ *Partial result: the time limit was reached before everything was finished.*"
+
+# Monotonic time by which the current request must be answered
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """No time is left for another model call."""
+
+
+class PartialResult(Exception):
+    """
+    Work cut short by the deadline; `result` holds what finished, already marked partial.
+
+    Raised rather than returned, so st.cache_data and the shared result
+    cache never keep a partial answer in place of the full one.
+    """
+
+    def __init__(self, result: Any):
+        super().__init__("Partial result: the deadline was reached")
+        self.result = result
+
+
+@contextmanager
+def deadline_context(seconds: Optional[float]):
+    """Model calls inside the block must finish within `seconds`; nested deadlines can only tighten."""
+    if not seconds:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(deadline if outer is None else min(outer, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def time_left() -> Optional[float]:
+    """Seconds until the deadline (0 once passed), or None without one."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def near(reserve_s: float = 0) -> bool:
+    """True when at most `reserve_s` seconds are left; never without a deadline."""
+    left = time_left()
+    return left is not None and left <= reserve_s
+
+
+def mark_partial(text: str) -> str:
+    return f"{text}\n\n{PARTIAL_NOTE}" if text else PARTIAL_NOTE
@@ -0,0 +1,161 @@
+import re
+from typing import List, Tuple
+import numpy as np
+from utils.tokens import count_num_tokens
+
+STOPWORDS = set("""
+a about above after again against all also am an and any are as at be because been before being below between
+both but by can could did do does doing down during each few for from further had has have having he her here
+hers herself him himself his how i if in into is it its itself just me more most my myself no nor not now of
+off on once only or other our ours ourselves out over own same she should so some such than that the their
+theirs them themselves then there these they this those through to too under until up very was we were what
+when where which while who whom why will with would you your yours yourself yourselves
+""".split())
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+_HEADING = re.compile(r"^(\d+(\.\d+)*[.)]?\s+)?[A-Z][^.!?]{0,78}$")
+
+
+def split_sentences(text: str) -> List[str]:
+    sentences = []
+    for block in re.split(r"\n\s*\n", text):
+        block = " ".join(block.split())
+        sentences.extend(s.strip() for s in _SENTENCE_END.split(block) if len(s.split()) >= 4)
+    return sentences
+
+
+def split_sections(text: str, sentences_per_section: int = 40) -> List[Tuple[str, str]]:
+    """
+    Split text into (heading, body) sections.
+
+    Short capitalised lines without closing punctuation are treated as headings;
+    documents without any are cut into runs of `sentences_per_section` sentences
+    so budgets are still spread across the whole file.
+    """
+    sections, heading, body = [], "", []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped and len(stripped.split()) <= 10 and _HEADING.match(stripped):
+            if body:
+                sections.append((heading, "\n".join(body)))
+            heading, body = stripped, []
+        elif stripped:
+            body.append(stripped)
+    if body:
+        sections.append((heading, "\n".join(body)))
+
+    if len(sections) > 1:
+        return sections
+
+    sentences = split_sentences(text)
+    return [
+        ("", " ".join(sentences[i:i + sentences_per_section]))
+        for i in range(0, len(sentences), sentences_per_section)
+    ]
+
+
+def content_terms(sentence: str) -> List[str]:
+    return [w for w in re.findall(r"[a-z][a-z0-9\-]+", sentence.lower()) if w not in STOPWORDS]
+
+
+def tfidf_matrix(sentences: List[str]) -> np.ndarray:
+    """L2-normalised TF-IDF rows, one per sentence."""
+    tokenized = [content_terms(s) for s in sentences]
+    vocabulary = {term: i for i, term in enumerate(sorted({t for terms in tokenized for t in terms}))}
+    matrix = np.zeros((len(sentences), max(len(vocabulary), 1)), dtype=np.float32)
+    for row, terms in enumerate(tokenized):
+        for term in terms:
+            matrix[row, vocabulary[term]] += 1
+
+    document_frequency = np.count_nonzero(matrix, axis=0)
+    idf = np.log((1 + len(sentences)) / (1 + document_frequency)) + 1
+    matrix *= idf
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def textrank_scores(sentences: List[str], damping: float = 0.85, iterations: int = 50) -> np.ndarray:
+    """Sentence centrality: PageRank over the cosine-similarity graph of TF-IDF vectors."""
+    n = len(sentences)
+    if n == 0:
+        return np.zeros(0)
+    if n == 1:
+        return np.ones(1)
+
+    vectors = tfidf_matrix(sentences)
+    similarity = vectors @ vectors.T
+    np.fill_diagonal(similarity, 0)
+    row_sums = similarity.sum(axis=1, keepdims=True)
+    # Sentences with no overlap link uniformly so every row stays stochastic
+    transition = np.where(row_sums > 0, similarity / np.where(row_sums == 0, 1, row_sums), 1.0 / n)
+
+    scores = np.full(n, 1.0 / n)
+    for _ in range(iterations):
+        updated = (1 - damping) / n + damping * transition.T @ scores
+        if np.abs(updated - scores).sum() < 1e-6:
+            return updated
+        scores = updated
+    return scores
+
+
+def extractive_summary(text: str, token_budget: int = 2000, model: str = "gpt-4", max_run: int = 200) -> str:
+    """
+    Keep the most salient sentences of each section within `token_budget` tokens.
+
+    Each section first fills a share of the budget proportional to its length
+    with its best sentences; what is left goes round-robin to the next-best
+    sentence of each section, largest first, so documents with many short
+    sections are still covered. Output keeps document order.
+    """
+    sections = []
+    for heading, body in split_sections(text):
+        sentences = split_sentences(body)
+        # Very long sections are ranked in runs to keep the similarity matrix small
+        for start in range(0, len(sentences), max_run):
+            sections.append((heading if start == 0 else "", sentences[start:start + max_run]))
+    if not sections or token_budget <= 0:
+        return ""
+
+    rankings = [list(np.argsort(-textrank_scores(sentences), kind="stable")) for _, sentences in sections]
+    lengths = np.array([sum(len(s) for s in sentences) for _, sentences in sections], dtype=float)
+    quotas = lengths / lengths.sum() * token_budget
+
+    chosen = [set() for _ in sections]
+    section_tokens = [0] * len(sections)
+    seen = set()
+    used = 0
+
+    def take(section: int, index: int, limit: float) -> bool:
+        nonlocal used
+        sentence = sections[section][1][index]
+        key = sentence.lower()
+        if key in seen:
+            return True  # repeated boilerplate: skip it, but it counts as handled
+        tokens = count_num_tokens(sentence, model)
+        if used + tokens > token_budget or section_tokens[section] + tokens > limit:
+            return False
+        seen.add(key)
+        chosen[section].add(index)
+        section_tokens[section] += tokens
+        used += tokens
+        return True
+
+    # Pass 1: proportional share per section
+    for section, ranking in enumerate(rankings):
+        while ranking and take(section, ranking[0], quotas[section]):
+            ranking.pop(0)
+
+    # Pass 2: spread the remainder, one sentence per section per round
+    order = np.argsort(-lengths, kind="stable")
+    while used < token_budget and any(rankings):
+        for section in order:
+            if rankings[section]:
+                take(section, rankings[section].pop(0), float("inf"))
+
+    parts = []
+    for (heading, sentences), indices in zip(sections, chosen):
+        if not indices:
+            continue
+        body = " ".join(sentences[i] for i in sorted(indices))
+        parts.append(f"{heading}\n{body}" if heading else body)
+    return "\n\n".join(parts)
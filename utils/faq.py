@@ -0,0 +1,146 @@
+import os
+import re
+import json
+import threading
+import traceback
+from pathlib import Path
+from typing import List, Optional, Union
+from openai import OpenAI
+from utils.extractive import extractive_summary, split_sections, split_sentences
+from utils.local_questions import key_terms
+from utils.model_router import route_completion
+from utils.metering import metering_context
+from utils.single_flight import get_single_flight
+
+# route_completion falls back across models instead of letting the SDK retry
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+
+FAQ_QUESTIONS_PROMPT = (
+    "Below are the key passages of a student's study document{headings}.\n\n"
+    "{passages}\n\n"
+    "List the {count} questions a student is most likely to ask about this document first: "
+    "definitions of its key terms, its main concepts, and requests to summarize its sections. "
+    "One question per line. No numbering, no answers."
+)
+
+_running = set()
+_running_lock = threading.Lock()
+
+
+def faq_path_for(persist_directory: Union[str, os.PathLike], file_path: str) -> Path:
+    """One FAQ per document: <persist_directory>/faq/<file stem>.json."""
+    return Path(persist_directory) / "faq" / f"{Path(file_path).stem}.json"
+
+
+def load_faq(path: Union[str, os.PathLike]) -> List[dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+
+
+def save_faq(path: Union[str, os.PathLike], entries: List[dict]):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entries, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def parse_questions(output: str, count: int) -> List[str]:
+    questions = []
+    for line in output.splitlines():
+        line = re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", line).strip()
+        if len(line.split()) >= 3 and line not in questions:
+            questions.append(line)
+    return questions[:count]
+
+
+def local_faq_questions(text: str, count: int) -> List[str]:
+    """Template questions from section headings and key terms, used when the LLM call fails."""
+    headings = [heading for heading, _ in split_sections(text) if heading]
+    questions = [f"Summarize the section \"{heading}\"." for heading in headings[:count // 2]]
+    for term in key_terms(split_sentences(text)):
+        if len(questions) >= count:
+            break
+        questions.append(f"What is {term}?")
+    return questions
+
+
+def generate_faq_questions(text: str, count: int = 6, token_budget: int = 1500) -> List[str]:
+    """One fast-model call over the document's key sentences."""
+    headings = [heading for heading, _ in split_sections(text) if heading]
+    prompt = FAQ_QUESTIONS_PROMPT.format(
+        headings=f" (sections: {'; '.join(headings[:20])})" if headings else "",
+        passages=extractive_summary(text, token_budget),
+        count=count
+    )
+    try:
+        response = route_completion(
+            client,
+            "faq",
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.3,
+            max_tokens=60 * count
+        )
+        questions = parse_questions(response.choices[0].message.content, count)
+        if questions:
+            return questions
+    except Exception as e:
+        print(f"[⚠️ FAQ question generation failed, using templates]: {e}")
+    return local_faq_questions(text, count)
+
+
+def build_faq(text: str, qa_chain, count: int = 6, max_concurrency: int = 4) -> List[dict]:
+    """Generate likely questions and answer them all in one batched pass through the QA chain."""
+    questions = generate_faq_questions(text, count)
+    if not questions:
+        return []
+    results = qa_chain.batch(
+        [{"query": question} for question in questions],
+        config={"max_concurrency": max_concurrency},
+        return_exceptions=True
+    )
+    return [
+        {"question": question, "answer": result["result"]}
+        for question, result in zip(questions, results)
+        if isinstance(result, dict) and result.get("result")
+    ]
+
+
+def build_faq_in_background(text_loader, qa_chain, path: Union[str, os.PathLike], count: int = 6) -> Optional[threading.Thread]:
+    """
+    Build and save the FAQ off the interactive path, once per document per process.
+
+    `text_loader` is called on the worker thread so extraction doesn't block the caller.
+    """
+    key = str(path)
+    with _running_lock:
+        if key in _running or Path(path).exists():
+            return None
+        _running.add(key)
+
+    def build():
+        # Shared by every session on this document, so not charged to whoever triggered it
+        with metering_context(user_id="system", feature="faq"):
+            entries = build_faq(text_loader(), qa_chain, count)
+        if entries:
+            save_faq(path, entries)
+            print(f"💡 Precomputed {len(entries)} FAQ answers: {path}")
+
+    def run():
+        try:
+            # Other processes serving the same document wait for this build instead of repeating it
+            get_single_flight().do("faq", Path(path).stem, build, done=Path(path).exists)
+        except Exception as e:
+            print(f"[❌ FAQ precomputation failed]: {e}")
+            traceback.print_exc()
+        finally:
+            with _running_lock:
+                _running.discard(key)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
@@ -1,14 +1,27 @@
 import os
 import re
+import threading
 import traceback
+import contextvars
+from typing import Optional
 import streamlit as st
 from dotenv import load_dotenv
 from openai import OpenAI
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from utils.load_config import LoadConfig
 from utils.summarizer import Summarizer
+from utils.model_router import route_completion
+from utils.local_questions import generate_local_questions
+from utils.metering import metered_cache, note_cache_miss, BudgetExceededError
+from utils.deadline import near, DeadlineExceeded, PartialResult
+from utils.single_flight import get_single_flight, content_key
+from utils.study_pack import get_pack_store
+
+CONFIG = LoadConfig()
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# route_completion falls back across models instead of letting the SDK retry
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
 
 class MCQGenerator:
 
@@ -18,14 +31,17 @@ class MCQGenerator:
 
    
     @staticmethod
+    @metered_cache("mcq")
     @st.cache_data(show_spinner=False)
     def gpt_generate_mcqs_cached(prompt: str) -> str:
 
 
         """Cached GPT call to reduce regeneration delay."""
+        note_cache_miss()
         try:
-            response = client.chat.completions.create(
-                model="gpt-4",
+            response = route_completion(
+                client,
+                "mcq",
                 messages=[
                     {
                         "role": "system",
@@ -40,60 +56,131 @@ class MCQGenerator:
                 max_tokens=1200
             )
             return response.choices[0].message.content.strip()
+        except (BudgetExceededError, DeadlineExceeded):
+            raise  # per-user/per-request, so they must not be cached as an empty result for everyone
         except Exception as e:
+            if near():
+                raise DeadlineExceeded("MCQ generation ran out of time") from e
             print(f"[❌ GPT API Error] {e}")
             traceback.print_exc()
             return ""
 
     @staticmethod
-    def generate_mcqs_from_file(file_path: str, max_questions: int = 10) -> list:
+    def build_prompt(num_questions: int, chunk: str) -> str:
+        return (
+            f"Generate {num_questions} multiple-choice questions from the following academic content:\n\n"
+            f"{chunk}\n\n"
+            "For each question, use the EXACT format below:\n"
+            "Q: <question>\n"
+            "A. <option A>\n"
+            "B. <option B>\n"
+            "C. <option C>\n"
+            "D. <option D>\n"
+            "Answer: <A/B/C/D>\n\n"
+            "Do not add explanations or section titles."
+        )
+
+    @staticmethod
+    def iter_mcq_batches(file_path: str, max_questions: int = 10, first_batch_size: Optional[int] = None):
+        """
+        Yield parsed MCQs one GPT request at a time.
+
+        `first_batch_size` caps the first request so the caller has something to
+        show after one small call; later requests ask for the remainder. Raises
+        DeadlineExceeded instead of starting a request too close to the deadline.
+        """
         text = MCQGenerator.extract_text(file_path)
+        yield from MCQGenerator.iter_mcq_batches_from_text(text, max_questions, first_batch_size)
+
+    @staticmethod
+    def iter_mcq_batches_from_text(text: str, max_questions: int = 10, first_batch_size: Optional[int] = None):
         if not text or len(text.split()) < 50:
             print("[⚠️ Warning] Insufficient content for MCQ generation.")
-            return []
+            return
 
         splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
         chunks = splitter.split_text(text)
 
-        all_mcqs = []
         question_count = 0
 
         for chunk in chunks:
             if question_count >= max_questions:
                 break
 
-            prompt = (
-                f"Generate {max_questions - question_count} multiple-choice questions from the following academic content:\n\n"
-                f"{chunk}\n\n"
-                "For each question, use the EXACT format below:\n"
-                "Q: <question>\n"
-                "A. <option A>\n"
-                "B. <option B>\n"
-                "C. <option C>\n"
-                "D. <option D>\n"
-                "Answer: <A/B/C/D>\n\n"
-                "Do not add explanations or section titles."
-            )
+            requested = max_questions - question_count
+            if first_batch_size and question_count == 0:
+                requested = min(requested, first_batch_size)
+            if near(CONFIG.deadline_reserve_s):
+                raise DeadlineExceeded(f"Deadline reached after {question_count} questions")
 
-            output = MCQGenerator.gpt_generate_mcqs_cached(prompt)
+            output = MCQGenerator.gpt_generate_mcqs_cached(MCQGenerator.build_prompt(requested, chunk))
             if not output or not output.strip().startswith("Q:"):
                 print("[⚠️ GPT output malformed or empty]", output[:300])
                 continue
 
             try:
-                parsed = MCQGenerator.parse_mcqs(output)
-                for q in parsed:
-                    if question_count < max_questions:
-                        all_mcqs.append(q)
-                        question_count += 1
-                    else:
-                        break
+                parsed = MCQGenerator.parse_mcqs(output)[:max_questions - question_count]
             except Exception as e:
                 print(f"[❌ Failed to parse MCQs]: {e}")
                 traceback.print_exc()
+                continue
+
+            if parsed:
+                question_count += len(parsed)
+                yield parsed
 
+    @staticmethod
+    def generate_mcqs_from_file(file_path: str, max_questions: int = 10, local_fallback: bool = True) -> list:
+        """
+        LLM questions for the file, or local ones if the LLM produced none.
+
+        Raises PartialResult holding the questions parsed so far when the
+        request deadline stops generation early.
+        """
+        all_mcqs = []
+        try:
+            all_mcqs = MCQGenerator._llm_mcqs_shared(file_path, max_questions)
+        except (BudgetExceededError, DeadlineExceeded) as e:
+            if not local_fallback:
+                raise
+            print(f"[⚠️ {e}]")
+        if not all_mcqs and local_fallback:
+            all_mcqs = MCQGenerator.generate_local_mcqs(file_path, max_questions)
+            if all_mcqs:
+                print(f"[↪️ LLM returned no MCQs, using {len(all_mcqs)} local questions]")
         return all_mcqs
 
+    @staticmethod
+    def _llm_mcqs_shared(file_path: str, max_questions: int) -> list:
+        def generate():
+            questions = []
+            try:
+                for batch in MCQGenerator.iter_mcq_batches(file_path, max_questions=max_questions):
+                    questions.extend(batch)
+            except DeadlineExceeded:
+                if questions:
+                    print(f"⏱️ Deadline reached: returning {len(questions)} of {max_questions} questions")
+                    raise PartialResult(questions)  # raised, so the partial set is never stored as the result
+                raise
+            return questions
+
+        key = content_key(file_path)
+        if key is None:
+            return generate()
+        packed = get_pack_store().load(key, "mcqs")
+        if packed:
+            return packed[:max_questions]
+        # Concurrent requests for the same document share one run; only LLM questions are kept
+        return get_single_flight().do("mcqs", f"{key}-{max_questions}", generate, persist=True, keep=bool)
+
+    @staticmethod
+    def generate_local_mcqs(file_path: str, max_questions: int = 10) -> list:
+        """Fill-in-the-blank MCQs built locally in milliseconds, no API call."""
+        text = MCQGenerator.extract_text(file_path)
+        if not text or text.startswith("❌"):
+            return []
+        return generate_local_questions(text, max_questions=max_questions)
+
     @staticmethod
     def parse_mcqs(gpt_output: str) -> list:
         mcqs = []
@@ -145,3 +232,99 @@ class MCQGenerator:
                 continue
 
         return mcqs
+
+
+_shared_jobs = {}
+_shared_jobs_lock = threading.Lock()
+
+
+class MCQGenerationJob:
+    """
+    Background MCQ generation for progressive quiz delivery.
+
+    Batches are appended to `questions` as they arrive, so the quiz can put
+    this list straight into session state and show Q1 before the rest exist.
+    With `seed_questions`, that many local questions are ready before the
+    first API call; if the LLM produces nothing, local questions fill the quiz.
+    Use `shared()` so sessions opening the same document join one job.
+    """
+
+    def __init__(self, file_path: str, max_questions: int = 10, first_batch_size: int = 2, seed_questions: int = 0):
+        self.file_path = file_path
+        self.max_questions = max_questions
+        self.first_batch_size = first_batch_size
+        self.seed_questions = seed_questions
+        self.questions = []
+        self.llm_count = 0
+        self._local_questions = []
+        self.done = False
+        self.error = None
+        self._cancelled = threading.Event()
+        self._subscribers = 1
+        # The worker inherits the caller's context, so its usage is metered to the same user
+        self._thread = threading.Thread(target=contextvars.copy_context().run, args=(self._run,), daemon=True)
+
+    @staticmethod
+    def shared(file_path: str, max_questions: int = 10, first_batch_size: int = 2, seed_questions: int = 0) -> "MCQGenerationJob":
+        """Start a job, or join the one already running for the same document and settings."""
+        key = (content_key(file_path) or file_path, max_questions, first_batch_size, seed_questions)
+        with _shared_jobs_lock:
+            job = _shared_jobs.get(key)
+            if job is not None and not job.done and not job._cancelled.is_set():
+                job._subscribers += 1
+                print(f"🔗 Joining running MCQ generation for {file_path}")
+                return job
+            job = _shared_jobs[key] = MCQGenerationJob(file_path, max_questions, first_batch_size, seed_questions)
+        return job.start()
+
+    def start(self) -> "MCQGenerationJob":
+        if self.seed_questions:
+            try:
+                self._local_questions = MCQGenerator.generate_local_mcqs(self.file_path, self.max_questions)
+            except Exception as e:
+                print(f"[⚠️ Local question generation failed]: {e}")
+            self.questions.extend(self._local_questions[:self.seed_questions])
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        # A shared job stops only when every session using it has let go
+        with _shared_jobs_lock:
+            self._subscribers -= 1
+            if self._subscribers <= 0:
+                self._cancelled.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        self._thread.join(timeout)
+        return self.done
+
+    @property
+    def shareable(self) -> bool:
+        """Finished cleanly with LLM questions; local fill-ins and cut-short lists stay per session."""
+        return self.done and self.error is None and self.llm_count > 0 and not self._cancelled.is_set()
+
+    def _run(self):
+        try:
+            # LLM questions are appended after the local seeds, up to max_questions in total
+            for batch in MCQGenerator.iter_mcq_batches(
+                self.file_path,
+                max_questions=self.max_questions - len(self.questions),
+                first_batch_size=self.first_batch_size
+            ):
+                if self._cancelled.is_set():
+                    break
+                self.questions.extend(batch)
+                self.llm_count += len(batch)
+        except Exception as e:
+            self.error = e
+            print(f"[❌ Background MCQ generation failed]: {e}")
+            traceback.print_exc()
+        finally:
+            if not self.llm_count and not self._cancelled.is_set():
+                # LLM slow-failed or returned nothing: fill the quiz locally
+                self.questions.extend(self._local_questions[len(self.questions):])
+            self.done = True
+            with _shared_jobs_lock:
+                for key, job in list(_shared_jobs.items()):
+                    if job is self:
+                        del _shared_jobs[key]
@@ -0,0 +1,77 @@
+"""
+Two-stage retrieval for very long documents.
+
+At index time, consecutive chunks are grouped into sections and every
+section gets a summary vector (the embedding of its key sentences, picked
+locally). At query time the best sections are found first and only their
+chunks are searched, which keeps the chunk search small and stops stray
+look-alike chunks from far-away chapters crowding out the right ones.
+Small documents are indexed and searched flat.
+"""
+
+from typing import List, Optional
+from pydantic import ConfigDict
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+from utils.extractive import extractive_summary
+
+SECTION_KEY = "section"
+
+
+def build_sections(chunks: List[Document], section_chunks: int = 20, token_budget: int = 300, model: str = "gpt-4") -> List[Document]:
+    """
+    Group chunks into sections of `section_chunks` and return one summary document per section.
+
+    Tags each chunk's metadata with its section id. Section documents carry
+    the page range they cover when the chunks have page metadata.
+    """
+    sections = []
+    for section_id, start in enumerate(range(0, len(chunks), section_chunks)):
+        members = chunks[start:start + section_chunks]
+        for chunk in members:
+            chunk.metadata[SECTION_KEY] = section_id
+
+        text = "\n".join(chunk.page_content for chunk in members)
+        metadata = {SECTION_KEY: section_id, "chunks": len(members)}
+        pages = [chunk.metadata["page"] for chunk in members if isinstance(chunk.metadata.get("page"), int)]
+        if pages:
+            metadata.update(first_page=min(pages), last_page=max(pages))
+        summary = extractive_summary(text, token_budget, model) or text[:2000]
+        sections.append(Document(page_content=summary, metadata=metadata))
+    return sections
+
+
+class HierarchicalRetriever(BaseRetriever):
+    """Finds the `top_sections` best sections, then the top `k` chunks within them."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    chunk_store: VectorStore
+    section_store: VectorStore
+    k: int = 5
+    top_sections: int = 3
+
+    def select_sections(self, query_vector: List[float]) -> List[int]:
+        sections = self.section_store.similarity_search_by_vector(query_vector, k=self.top_sections)
+        return [doc.metadata[SECTION_KEY] for doc in sections if SECTION_KEY in doc.metadata]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        # One query embedding serves both stages
+        query_vector = self.chunk_store.embeddings.embed_query(query)
+        section_ids = self.select_sections(query_vector)
+        if not section_ids:
+            return self.chunk_store.similarity_search_by_vector(query_vector, k=self.k)
+        return self.chunk_store.similarity_search_by_vector(
+            query_vector,
+            k=self.k,
+            filter={SECTION_KEY: {"$in": section_ids}}
+        )
+
+
+def make_retriever(chunk_store: VectorStore, section_store: Optional[VectorStore], k: int, top_sections: int) -> BaseRetriever:
+    """Hierarchical retriever when the index has sections, flat top-k otherwise."""
+    if section_store is None:
+        return chunk_store.as_retriever(search_kwargs={"k": k})
+    return HierarchicalRetriever(chunk_store=chunk_store, section_store=section_store, k=k, top_sections=top_sections)
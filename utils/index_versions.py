@@ -0,0 +1,152 @@
+"""
+Versioned, atomically published index directories.
+
+    <index_directory>/
+        manifest.json          {"version": ..., "path": "versions/<version>", ...}
+        versions/<version>/    immutable, fully written index
+        staging/<version>/     index being built (private to one builder)
+
+An index is built in its own staging directory, fsynced, renamed into
+versions/ and then published by atomically replacing manifest.json. Readers
+resolve the manifest once and keep using that version, so a rebuild never
+changes or deletes files under an open index. Older versions are pruned only
+after a grace period.
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+from pathlib import Path
+from typing import Optional, Union
+
+MANIFEST_FILE = "manifest.json"
+VERSIONS_DIR = "versions"
+STAGING_DIR = "staging"
+
+
+def new_version() -> str:
+    # Sortable by time (to the microsecond); the suffix keeps concurrent builders apart
+    now = time.time_ns()
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now // 1_000_000_000))
+    return f"{stamp}.{now // 1000 % 1_000_000:06d}-{uuid.uuid4().hex[:8]}"
+
+
+def _fsync_directory(path: Path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return  # Windows can't open directories; rename durability is up to the OS there
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def fsync_tree(root: Union[str, os.PathLike]):
+    """Flush every file and directory under `root` to disk."""
+    for directory, _, files in os.walk(root):
+        for name in files:
+            with open(os.path.join(directory, name), "rb") as f:
+                os.fsync(f.fileno())
+        _fsync_directory(Path(directory))
+
+
+def read_manifest(index_directory: Union[str, os.PathLike]) -> Optional[dict]:
+    try:
+        with open(Path(index_directory) / MANIFEST_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def current_version_path(index_directory: Union[str, os.PathLike]) -> Optional[Path]:
+    """Directory of the published version, or None if nothing has been published."""
+    manifest = read_manifest(index_directory)
+    if not manifest:
+        return None
+    path = Path(index_directory) / manifest["path"]
+    return path if path.is_dir() else None
+
+
+def staging_path(index_directory: Union[str, os.PathLike], version: str) -> Path:
+    path = Path(index_directory) / STAGING_DIR / version
+    path.mkdir(parents=True, exist_ok=False)
+    return path
+
+
+def publish(index_directory: Union[str, os.PathLike], staged: Union[str, os.PathLike], version: str, info: Optional[dict] = None) -> Path:
+    """
+    Make a fully built staging directory the live version.
+
+    The rename into versions/ and the manifest replace are both atomic on one
+    filesystem; readers see either the old manifest or the new one.
+    """
+    index_directory = Path(index_directory)
+    staged = Path(staged)
+    fsync_tree(staged)
+
+    versions_dir = index_directory / VERSIONS_DIR
+    versions_dir.mkdir(parents=True, exist_ok=True)
+    target = versions_dir / version
+    os.rename(staged, target)
+    _fsync_directory(versions_dir)
+
+    previous = read_manifest(index_directory)
+    files = [p for p in target.rglob("*") if p.is_file()]
+    manifest = {
+        **(info or {}),
+        "version": version,
+        "path": f"{VERSIONS_DIR}/{version}",
+        "published_at": time.time(),
+        "files": len(files),
+        "bytes": sum(p.stat().st_size for p in files),
+        "previous": previous["version"] if previous else None,
+    }
+    tmp_path = index_directory / f".{MANIFEST_FILE}.{version}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, index_directory / MANIFEST_FILE)
+    _fsync_directory(index_directory)
+    return target
+
+
+def discard(staged: Union[str, os.PathLike]):
+    """Remove a failed build's staging directory; the live version is untouched."""
+    shutil.rmtree(staged, ignore_errors=True)
+
+
+def prune(index_directory: Union[str, os.PathLike], keep: int = 2, grace_seconds: float = 3600) -> int:
+    """
+    Delete old versions and abandoned staging directories.
+
+    The `keep` newest versions (always including the live one) stay, and
+    nothing younger than `grace_seconds` is removed, so readers that opened
+    a version just before a swap keep working.
+    """
+    index_directory = Path(index_directory)
+    current = current_version_path(index_directory)
+    cutoff = time.time() - grace_seconds
+    removed = 0
+
+    versions_dir = index_directory / VERSIONS_DIR
+    if versions_dir.is_dir():
+        versions = sorted(versions_dir.iterdir(), key=lambda p: p.name, reverse=True)
+        for path in versions[keep:]:
+            if path != current and path.stat().st_mtime < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+
+    staging_dir = index_directory / STAGING_DIR
+    if staging_dir.is_dir():
+        for path in staging_dir.iterdir():
+            # Builds take minutes; a day-old staging directory belongs to a crashed builder
+            if path.stat().st_mtime < time.time() - max(grace_seconds, 24 * 3600):
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+    return removed
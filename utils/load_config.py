@@ -23,6 +23,16 @@ class LoadConfig:
         self.llm_system_role = app_config["llm_config"].get("llm_system_role", "You are a helpful assistant.")
         self.temperature = app_config["llm_config"].get("temperature", 0.7)
 
+        # === Model Routing ===
+        routing_config = app_config.get("model_routing", {})
+        self.model_routes = {
+            stage: {
+                "models": routing_config.get(stage, {}).get("models", [self.llm_engine]),
+                "timeout_s": routing_config.get(stage, {}).get("timeout_s", 60),
+            }
+            for stage in ("summary_map", "summary_merge", "mcq", "chat", "memory", "faq")
+        }
+
         # === Directories ===
         self.persist_directory = here(app_config["directories"].get("persist_directory", "vector_db")).resolve()
         self.custom_persist_directory = here(app_config["directories"].get("custom_persist_directory", "custom_db")).resolve()
@@ -32,8 +42,39 @@ class LoadConfig:
         self.embedding_model_engine = app_config["embedding_model_config"].get("engine", "text-embedding-ada-002")
         self.embedding_model = OpenAIEmbeddings()  # Automatically uses env key
 
+        # === Vector Store ===
+        vector_store_config = app_config.get("vector_store_config", {})
+        self.vector_store_backend = vector_store_config.get("backend", "chroma")
+        numpy_options = {
+            "dtype": vector_store_config.get("dtype", "float32"),
+            "rescore": vector_store_config.get("rescore", False),
+            "rescore_factor": vector_store_config.get("rescore_factor", 4),
+            "recall_k": app_config["retrieval_config"].get("k", 5),
+        }
+        remote_options = {
+            "url": vector_store_config.get("url", "http://127.0.0.1:8100"),
+            "pool_size": vector_store_config.get("pool_size", 10),
+            "timeout_s": vector_store_config.get("timeout_s", 30),
+            "health_check_interval_s": vector_store_config.get("health_check_interval_s", 15),
+        }
+        backend_options = {"numpy": numpy_options, "remote": remote_options}
+        self.vector_store_options = backend_options.get(self.vector_store_backend, {})
+
+        # === Index server (index_server.py) ===
+        index_server_config = app_config.get("index_server_config", {})
+        self.index_server_backend = index_server_config.get("backend", "numpy")
+        self.index_server_options = backend_options.get(self.index_server_backend, {})
+        self.index_server_directory = here(index_server_config.get("directory", "vectorstore/shared")).resolve()
+        self.index_server_max_concurrency = index_server_config.get("max_concurrency", 16)
+        self.index_server_max_body_mb = index_server_config.get("max_body_mb", 256)
+
         # === RAG & Chunking ===
         self.k = app_config["retrieval_config"].get("k", 5)
+        self.context_token_budget = app_config["retrieval_config"].get("context_token_budget", 3000)
+        self.dedupe_threshold = app_config["retrieval_config"].get("dedupe_threshold", 0.9)
+        self.hierarchical_min_chunks = app_config["retrieval_config"].get("hierarchical_min_chunks", 0)
+        self.section_chunks = app_config["retrieval_config"].get("section_chunks", 20)
+        self.top_sections = app_config["retrieval_config"].get("top_sections", 3)
         self.chunk_size = app_config["splitter_config"].get("chunk_size", 1000)
         self.chunk_overlap = app_config["splitter_config"].get("chunk_overlap", 200)
 
@@ -47,9 +88,90 @@ class LoadConfig:
             "final_summarizer_llm_system_role", "Provide a final summary."
         )
         self.character_overlap = app_config["summarizer_config"].get("character_overlap", 50)
+        self.extractive_token_budget = app_config["summarizer_config"].get("extractive_token_budget", 2400)
+        self.preview_token_budget = app_config["summarizer_config"].get("preview_token_budget", 400)
+        self.map_chunk_size = app_config["summarizer_config"].get("map_chunk_size", 4000)
+        self.chunk_summary_directory = here(
+            app_config["summarizer_config"].get("chunk_summary_directory", "data/chunk_summaries")
+        ).resolve()
+
+        # === Extraction ===
+        extraction_config = app_config.get("extraction_config", {})
+        self.pdf_workers = extraction_config.get("pdf_workers", 0)
+        self.parallel_min_pages = extraction_config.get("parallel_min_pages", 40)
+
+        # === Uploads ===
+        upload_config = app_config.get("upload_config", {})
+        self.max_upload_mb = upload_config.get("max_upload_mb", 50)
+        self.upload_chunk_kb = upload_config.get("chunk_kb", 1024)
+        self.upload_ref_ttl_hours = upload_config.get("ref_ttl_hours", 24)
+        self.allowed_extensions = upload_config.get("allowed_extensions", ["pdf", "docx", "pptx", "xlsx", "txt"])
+
+        # === HTTP API ===
+        api_config = app_config.get("api_config", {})
+        self.api_max_concurrency = api_config.get("max_concurrency", 8)
+        self.api_max_batch_size = api_config.get("max_batch_size", 20)
+
+        # === Batch pre-generation ===
+        batch_config = app_config.get("batch_config", {})
+        self.batch_output_directory = here(batch_config.get("output_directory", "data/study_packs")).resolve()
+        self.batch_max_concurrency = batch_config.get("max_concurrency", 8)
+        self.batch_parse_workers = batch_config.get("parse_workers", 0)
+
+        # === FAQ ===
+        faq_config = app_config.get("faq_config", {})
+        self.faq_enabled = faq_config.get("enabled", False)
+        self.faq_num_questions = faq_config.get("num_questions", 6)
+
+        # === Quiz ===
+        quiz_config = app_config.get("quiz_config", {})
+        self.quiz_max_questions = quiz_config.get("max_questions", 10)
+        self.local_seed_questions = quiz_config.get("local_seed_questions", 2)
+
+        # === Usage metering ===
+        usage_config = app_config.get("usage_config", {})
+        self.usage_database = here(usage_config.get("database", "data/usage/usage.db")).resolve()
+        self.usage_daily_token_budget = usage_config.get("daily_token_budget", 0)
+        self.usage_exempt_users = usage_config.get("exempt_users", [])
+        self.usage_prices_per_1k = usage_config.get("prices_per_1k", {})
+
+        # === Session state ===
+        session_config = app_config.get("session_config", {})
+        self.session_store_directory = here(session_config.get("store_directory", "data/sessions")).resolve()
+        self.session_state_limit_kb = session_config.get("state_limit_kb", 256)
+        self.session_ttl_hours = session_config.get("ttl_hours", 24)
+        self.show_session_memory = session_config.get("show_memory", False)
+
+        # === Single-flight jobs ===
+        single_flight_config = app_config.get("single_flight_config", {})
+        self.single_flight_directory = here(single_flight_config.get("directory", "data/jobs")).resolve()
+        self.single_flight_wait_timeout = single_flight_config.get("wait_timeout_s", 900)
+        self.single_flight_result_ttl_hours = single_flight_config.get("result_ttl_hours", 168)
+
+        # === Request deadlines (keyed by metering feature) ===
+        deadline_config = app_config.get("deadline_config", {})
+        self.deadlines = {
+            "summary": deadline_config.get("summary_s", 0),
+            "quiz": deadline_config.get("quiz_s", 0),
+            "chat": deadline_config.get("chat_s", 0),
+        }
+        self.deadline_reserve_s = deadline_config.get("reserve_s", 15)
+        self.deadline_max_s = deadline_config.get("max_s", 300)
+
+        # === Study packs ===
+        study_pack_config = app_config.get("study_pack_config", {})
+        self.study_pack_directory = here(study_pack_config.get("directory", "data/packs")).resolve()
+        self.study_pack_max_mb = study_pack_config.get("max_pack_mb", 500)
+        self.study_pack_trust_imports = study_pack_config.get("trust_imports", False)
+
+        # === UI ===
+        ui_config = app_config.get("ui_config", {})
+        self.chat_window = ui_config.get("chat_window", 20)
 
         # === Memory ===
         self.number_of_q_a_pairs = app_config["memory"].get("number_of_q_a_pairs", 5)
+        self.memory_token_budget = app_config["memory"].get("token_budget", 1500)
+        self.memory_summary_max_tokens = app_config["memory"].get("summary_max_tokens", 300)
 
         # === Load OpenAI Credentials ===
         self.load_openai_cfg()
@@ -0,0 +1,115 @@
+import re
+import random
+import hashlib
+from collections import Counter
+from typing import List
+import numpy as np
+from utils.extractive import split_sections, split_sentences, content_terms, tfidf_matrix, textrank_scores
+
+BLANK = "_____"
+
+
+def _sample_evenly(items: list, limit: int) -> list:
+    if len(items) <= limit:
+        return items
+    step = len(items) / limit
+    return [items[int(i * step)] for i in range(limit)]
+
+
+def key_terms(sentences: List[str], top_n: int = 60) -> List[str]:
+    """Most salient content words (lowercase), by summed TF-IDF weight across sentences."""
+    vocabulary = sorted({t for s in sentences for t in content_terms(s)})
+    if not vocabulary:
+        return []
+    weights = tfidf_matrix(sentences).sum(axis=0)
+    ranked = [vocabulary[i] for i in np.argsort(-weights, kind="stable")]
+    # Short, numeric or hyphen-only tokens make poor answers and give-away distractors
+    return [t for t in ranked if len(t) >= 4 and t.isalpha()][:top_n]
+
+
+def _surface_forms(text: str, terms: List[str]) -> dict:
+    """How each term is usually written, so acronyms and names keep their case."""
+    wanted = set(terms)
+    variants = {}
+    for word, count in Counter(re.findall(r"[A-Za-z]+", text)).items():
+        if word.lower() in wanted:
+            variants.setdefault(word.lower(), []).append((count, word))
+
+    forms = {}
+    for term in terms:
+        best = max(variants[term])[1] if term in variants else term
+        # Capitalised sentence starts shouldn't win over the mid-sentence spelling
+        forms[term] = best if best.isupper() or not any(w == term for _, w in variants.get(term, [])) else term
+    return forms
+
+
+def _distractors(answer: str, candidates: List[str], sentence_terms: set, rng: random.Random, count: int = 3) -> List[str]:
+    # Variants of the answer ("cell"/"cells"/"cellular") would make two options correct
+    pool = [
+        t for t in candidates
+        if t not in sentence_terms and answer not in t and t not in answer and t[:5] != answer[:5]
+    ]
+    # Similar-length terms look more plausible; pick randomly among the closest few
+    pool.sort(key=lambda t: abs(len(t) - len(answer)))
+    closest = pool[:max(count * 3, count)]
+    return rng.sample(closest, count) if len(closest) >= count else []
+
+
+def generate_local_questions(text: str, max_questions: int = 5, max_sentences: int = 300) -> list:
+    """
+    Fill-in-the-blank multiple-choice questions built locally from the text.
+
+    Key sentences (TextRank) have their most salient term blanked out; the
+    distractors are other salient terms from the same document. Returns the
+    same dicts as `MCQGenerator.parse_mcqs`, tagged with "source": "local".
+    """
+    if not text or len(text.split()) < 50:
+        return []
+
+    # Repeated headers/footers and duplicated passages should only be asked once
+    sentences = list(dict.fromkeys(
+        s for _, body in split_sections(text) for s in split_sentences(body) if 8 <= len(s.split()) <= 45
+    ))
+    sentences = _sample_evenly(sentences, max_sentences)
+    if len(sentences) < 2:
+        return []
+
+    terms = key_terms(sentences)
+    if len(terms) < 4:
+        return []
+    term_rank = {term: i for i, term in enumerate(terms)}
+    forms = _surface_forms(text, terms)
+
+    # Same document, same quiz
+    rng = random.Random(hashlib.sha256(text.encode("utf-8", "ignore")).hexdigest())
+    scores = textrank_scores(sentences)
+
+    questions, used_answers = [], set()
+    for index in np.argsort(-scores, kind="stable"):
+        if len(questions) >= max_questions:
+            break
+        sentence = sentences[index]
+        sentence_terms = set(content_terms(sentence))
+        candidates = sorted((t for t in sentence_terms if t in term_rank and t not in used_answers), key=term_rank.get)
+        if not candidates:
+            continue
+
+        answer = candidates[0]
+        distractors = _distractors(answer, terms, sentence_terms, rng)
+        if not distractors:
+            continue
+
+        blanked = re.sub(rf"\b{re.escape(answer)}\b", BLANK, sentence, flags=re.IGNORECASE)
+        options = [forms[answer]] + [forms[d] for d in distractors]
+        rng.shuffle(options)
+
+        used_answers.add(answer)
+        questions.append({
+            "question": f"Fill in the blank: {blanked}",
+            "options": options,
+            "correct": forms[answer],
+            "explanation": f"From your document: \"{sentence}\"",
+            "source": "local",
+        })
+
+    return questions
@@ -0,0 +1,316 @@
+import time
+import sqlite3
+import threading
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import List, Optional
+import streamlit as st
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+from utils.load_config import LoadConfig
+from utils.tokens import count_num_tokens
+
+CONFIG = LoadConfig()
+
+# Who is spending and on what; set by app.py, api.py and the batch CLI. Worker
+# threads see these when started through contextvars.copy_context()
+_user_id: ContextVar[str] = ContextVar("metering_user_id", default="anonymous")
+_feature: ContextVar[str] = ContextVar("metering_feature", default="other")
+_cache_miss: ContextVar[Optional[list]] = ContextVar("metering_cache_miss", default=None)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    ts REAL NOT NULL,
+    user_id TEXT NOT NULL,
+    feature TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    embedding_tokens INTEGER NOT NULL DEFAULT 0,
+    latency_ms REAL NOT NULL DEFAULT 0,
+    cache_hit INTEGER NOT NULL DEFAULT 0,
+    cost_usd REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS usage_user_ts ON usage (user_id, ts);
+"""
+
+GROUP_COLUMNS = ("user_id", "feature", "stage", "model")
+
+
+class BudgetExceededError(RuntimeError):
+    """Raised before a model call when the current user has spent their token budget."""
+
+
+class UsageStore:
+    """Append-only usage log in SQLite, safe to share between threads and processes."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets the admin page read while sessions write
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def record(self, user_id: str, feature: str, stage: str, model: str, prompt_tokens: int = 0,
+               completion_tokens: int = 0, embedding_tokens: int = 0, latency_ms: float = 0,
+               cache_hit: bool = False, cost_usd: float = 0, ts: Optional[float] = None):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO usage VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (ts or time.time(), user_id, feature, stage, model, prompt_tokens, completion_tokens,
+                 embedding_tokens, latency_ms, int(cache_hit), cost_usd)
+            )
+
+    def tokens_since(self, user_id: str, since: float) -> int:
+        row = self._connect().execute(
+            "SELECT COALESCE(SUM(prompt_tokens + completion_tokens + embedding_tokens), 0) "
+            "FROM usage WHERE user_id = ? AND ts >= ?",
+            (user_id, since)
+        ).fetchone()
+        return int(row[0])
+
+    def summary(self, since: float = 0, group_by: str = "user_id") -> List[dict]:
+        """Totals per `group_by` value since `since`, most expensive first."""
+        if group_by not in GROUP_COLUMNS:
+            raise ValueError(f"Cannot group usage by {group_by!r}. Expected one of {GROUP_COLUMNS}")
+        rows = self._connect().execute(
+            f"""
+            SELECT {group_by} AS name,
+                   COUNT(*) AS calls,
+                   SUM(prompt_tokens) AS prompt_tokens,
+                   SUM(completion_tokens) AS completion_tokens,
+                   SUM(embedding_tokens) AS embedding_tokens,
+                   SUM(cache_hit) AS cache_hits,
+                   AVG(CASE WHEN cache_hit = 0 THEN latency_ms END) AS avg_latency_ms,
+                   SUM(cost_usd) AS cost_usd
+            FROM usage WHERE ts >= ?
+            GROUP BY {group_by}
+            ORDER BY cost_usd DESC, prompt_tokens + completion_tokens + embedding_tokens DESC
+            """,
+            (since,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def recent(self, limit: int = 100) -> List[dict]:
+        rows = self._connect().execute("SELECT * FROM usage ORDER BY ts DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+
+@st.cache_resource(show_spinner=False)
+def get_usage_store() -> UsageStore:
+    return UsageStore(CONFIG.usage_database)
+
+
+# === Context ===
+@contextmanager
+def metering_context(user_id: Optional[str] = None, feature: Optional[str] = None):
+    """Attribute model calls made inside the block to `user_id` / `feature`."""
+    tokens = []
+    if user_id is not None:
+        tokens.append((_user_id, _user_id.set(user_id)))
+    if feature is not None:
+        tokens.append((_feature, _feature.set(feature)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+def set_metering_user(user_id: str):
+    """Attribute every call in the current context (e.g. a Streamlit script run) to `user_id`."""
+    _user_id.set(user_id)
+
+
+def current_user() -> str:
+    return _user_id.get()
+
+
+def current_feature() -> str:
+    return _feature.get()
+
+
+# === Budgets ===
+def tokens_used_today(user_id: Optional[str] = None) -> int:
+    return get_usage_store().tokens_since(user_id or current_user(), time.time() - 24 * 3600)
+
+
+def check_budget(user_id: Optional[str] = None):
+    """Raise BudgetExceededError if the user spent their rolling 24h token budget."""
+    user_id = user_id or current_user()
+    budget = CONFIG.usage_daily_token_budget
+    if not budget or user_id in CONFIG.usage_exempt_users:
+        return
+    try:
+        used = tokens_used_today(user_id)
+    except sqlite3.Error as e:
+        print(f"[⚠️ Usage budget check failed]: {e}")
+        return
+    if used >= budget:
+        raise BudgetExceededError(
+            f"Daily usage limit reached ({used:,} of {budget:,} tokens). Please try again later."
+        )
+
+
+# === Recording ===
+def estimate_cost(model: str, prompt_tokens: int = 0, completion_tokens: int = 0, embedding_tokens: int = 0) -> float:
+    # Responses name dated snapshots ("gpt-4o-mini-2024-07-18"); the longest configured prefix wins
+    matches = [name for name in CONFIG.usage_prices_per_1k if model.startswith(name)]
+    prices = CONFIG.usage_prices_per_1k[max(matches, key=len)] if matches else {}
+    return (
+        (prompt_tokens + embedding_tokens) * prices.get("prompt", 0)
+        + completion_tokens * prices.get("completion", 0)
+    ) / 1000
+
+
+def _safe_record(model: str, prompt_tokens: int = 0, completion_tokens: int = 0, embedding_tokens: int = 0, **fields):
+    # Metering must never break the call it measures
+    try:
+        get_usage_store().record(
+            user_id=current_user(),
+            feature=current_feature(),
+            model=model,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            embedding_tokens=embedding_tokens,
+            cost_usd=estimate_cost(model, prompt_tokens, completion_tokens, embedding_tokens),
+            **fields
+        )
+    except Exception as e:
+        print(f"[⚠️ Usage metering failed]: {e}")
+
+
+def record_completion(stage: str, model: str, prompt_tokens: int, completion_tokens: int, latency_s: float):
+    _safe_record(
+        model,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        stage=stage,
+        latency_ms=latency_s * 1000
+    )
+
+
+def record_response(stage: str, response, latency_s: float):
+    """Record an OpenAI chat completion response's `usage`."""
+    usage = getattr(response, "usage", None)
+    record_completion(
+        stage,
+        getattr(response, "model", None) or "unknown",
+        getattr(usage, "prompt_tokens", 0) or 0,
+        getattr(usage, "completion_tokens", 0) or 0,
+        latency_s
+    )
+
+
+def record_embedding(model: str, embedding_tokens: int, latency_s: float):
+    _safe_record(model, embedding_tokens=embedding_tokens, stage="embedding", latency_ms=latency_s * 1000)
+
+
+def record_cache_hit(stage: str, latency_s: float = 0):
+    _safe_record("cache", stage=stage, cache_hit=True, latency_ms=latency_s * 1000)
+
+
+# === Cache hits ===
+def metered_cache(stage: str):
+    """
+    Wrap an st.cache_data function so cache hits are recorded.
+
+    The cached function calls `note_cache_miss()` in its body; if the body
+    didn't run, the result came from the cache.
+    """
+    def decorator(cached_fn):
+        @functools.wraps(cached_fn)
+        def wrapper(*args, **kwargs):
+            marker = []
+            token = _cache_miss.set(marker)
+            start = time.perf_counter()
+            try:
+                result = cached_fn(*args, **kwargs)
+            finally:
+                _cache_miss.reset(token)
+            if not marker:
+                record_cache_hit(stage, time.perf_counter() - start)
+            return result
+        return wrapper
+    return decorator
+
+
+def note_cache_miss():
+    marker = _cache_miss.get()
+    if marker is not None:
+        marker.append(True)
+
+
+# === LangChain / embeddings ===
+class MeteringCallbackHandler(BaseCallbackHandler):
+    """Records token usage and latency of LangChain chat model calls for one stage."""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._started = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._started.pop(run_id, None)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        latency = time.perf_counter() - self._started.pop(run_id, time.perf_counter())
+        llm_output = response.llm_output or {}
+        usage = llm_output.get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+        if not usage:
+            # Streaming responses carry usage on the message instead
+            for generations in response.generations:
+                for generation in generations:
+                    metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                    prompt_tokens += metadata.get("input_tokens", 0)
+                    completion_tokens += metadata.get("output_tokens", 0)
+        model = llm_output.get("model_name") or "unknown"
+        record_completion(self.stage, model, prompt_tokens, completion_tokens, latency)
+
+
+def _count_tokens(text: str, model: str) -> int:
+    try:
+        return count_num_tokens(text, model)
+    except Exception:
+        # No tokenizer available (e.g. offline): ~4 characters per token
+        return len(text) // 4
+
+
+class MeteredEmbeddings(Embeddings):
+    """Embeddings wrapper that records the tokens and latency of every embedding call."""
+
+    def __init__(self, embeddings: Embeddings, model: str):
+        self.embeddings = embeddings
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        start = time.perf_counter()
+        vectors = self.embeddings.embed_documents(texts)
+        record_embedding(self.model, sum(_count_tokens(t, self.model) for t in texts), time.perf_counter() - start)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        start = time.perf_counter()
+        vector = self.embeddings.embed_query(text)
+        record_embedding(self.model, _count_tokens(text, self.model), time.perf_counter() - start)
+        return vector
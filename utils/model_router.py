@@ -0,0 +1,100 @@
+import time
+from dataclasses import dataclass
+from typing import List
+from langchain_openai import ChatOpenAI
+from utils.load_config import LoadConfig
+from utils.metering import check_budget, record_response, MeteringCallbackHandler
+from utils.deadline import time_left, DeadlineExceeded
+
+CONFIG = LoadConfig()
+
+
+@dataclass
+class ModelRoute:
+    """Models for one task stage, tried in order; each attempt gets `timeout_s` seconds."""
+    stage: str
+    models: List[str]
+    timeout_s: float = 60
+
+
+def get_route(stage: str) -> ModelRoute:
+    if stage not in CONFIG.model_routes:
+        raise ValueError(f"Unknown model stage: {stage}. Expected one of {list(CONFIG.model_routes)}")
+    route = CONFIG.model_routes[stage]
+    return ModelRoute(stage=stage, models=list(route["models"]), timeout_s=route["timeout_s"])
+
+
+def without_retries(client):
+    """
+    `client` with SDK retries turned off.
+
+    The SDK retries a timed-out call twice by default, so a stage's timeout
+    would really allow three attempts plus backoff before any fallback.
+    """
+    retries = getattr(client, "max_retries", 0)
+    if isinstance(retries, int) and retries > 0:
+        return client.with_options(max_retries=0)
+    return client
+
+
+def route_completion(client, stage: str, messages: list, **kwargs):
+    """
+    `client.chat.completions.create` routed by stage.
+
+    Tries the stage's models in order, falling back to the next one when a call
+    errors or exceeds the stage's latency budget. Raises the last error if
+    every model fails. Each answered call is metered; a user over budget gets
+    BudgetExceededError before any model is called. Under a request deadline
+    (utils.deadline) every attempt is capped at the time left, and
+    DeadlineExceeded is raised once none is.
+    """
+    route = get_route(stage)
+    check_budget()
+    client = without_retries(client)
+    last_error = None
+
+    for model in route.models:
+        left = time_left()
+        if left is not None and left <= 0:
+            raise DeadlineExceeded(f"No time left for {stage}") from last_error
+        start = time.perf_counter()
+        try:
+            response = client.chat.completions.create(
+                model=model,
+                messages=messages,
+                timeout=route.timeout_s if left is None else min(route.timeout_s, left),
+                **kwargs
+            )
+            record_response(stage, response, time.perf_counter() - start)
+            if model != route.models[0]:
+                print(f"↪️ {stage}: answered by fallback model {model} in {time.perf_counter() - start:.1f}s")
+            return response
+        except Exception as e:
+            last_error = e
+            print(f"[⚠️ {stage}: {model} failed after {time.perf_counter() - start:.1f}s]: {type(e).__name__}: {e}")
+
+    raise last_error
+
+
+def get_chat_model(stage: str, temperature: float, openai_api_key: str = None):
+    """LangChain chat model for `stage`, with the route's other models as fallbacks."""
+    route = get_route(stage)
+    models = [
+        ChatOpenAI(
+            model_name=model,
+            temperature=temperature,
+            openai_api_key=openai_api_key,
+            request_timeout=route.timeout_s,
+            # One attempt per model within the stage's timeout; the fallbacks replace retries
+            max_retries=0,
+            # Tokens reach callbacks as they arrive, so a deadline can keep a partial answer;
+            # streamed answers report usage too, so they can be metered
+            streaming=True,
+            stream_usage=True,
+            callbacks=[MeteringCallbackHandler(stage)]
+        )
+        for model in route.models
+    ]
+    if len(models) == 1:
+        return models[0]
+    return models[0].with_fallbacks(models[1:])
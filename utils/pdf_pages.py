@@ -0,0 +1,61 @@
+import os
+import math
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+from PyPDF2 import PdfReader
+
+
+def resolve_workers(workers: Optional[int]) -> int:
+    """Turn a configured worker count into a usable one (0/None means all cores)."""
+    if not workers or workers < 0:
+        return os.cpu_count() or 1
+    return workers
+
+
+def shard_page_ranges(num_pages: int, workers: int, shards_per_worker: int = 2) -> List[Tuple[int, int]]:
+    """Split [0, num_pages) into contiguous (start, end) ranges for the pool."""
+    if num_pages <= 0:
+        return []
+    num_shards = max(1, min(num_pages, workers * shards_per_worker))
+    shard_size = math.ceil(num_pages / num_shards)
+    return [
+        (start, min(start + shard_size, num_pages))
+        for start in range(0, num_pages, shard_size)
+    ]
+
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    # Runs in a worker process: each worker opens its own reader
+    reader = PdfReader(file_path)
+    return [(i, reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+
+def extract_pdf_pages(
+    file_path: str,
+    workers: Optional[int] = None,
+    min_pages_for_parallel: int = 40,
+    num_pages: Optional[int] = None
+) -> List[Tuple[int, str]]:
+    """
+    Extract text from a PDF as an ordered list of (page_index, text) tuples.
+
+    Page ranges are sharded across a process pool when the file has at least
+    `min_pages_for_parallel` pages and more than one worker is available;
+    smaller files are read serially in the current process.
+    """
+    workers = resolve_workers(workers)
+    if num_pages is None:
+        num_pages = len(PdfReader(file_path).pages)
+
+    if workers <= 1 or num_pages < min_pages_for_parallel:
+        return _extract_page_range(file_path, 0, num_pages)
+
+    ranges = shard_page_ranges(num_pages, workers)
+    pages = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+        futures = [pool.submit(_extract_page_range, file_path, start, end) for start, end in ranges]
+        for future in futures:
+            pages.extend(future.result())
+
+    pages.sort(key=lambda item: item[0])
+    return pages
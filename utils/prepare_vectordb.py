@@ -1,7 +1,6 @@
 import os
-import shutil
 import traceback
-from typing import Union
+from typing import List, Optional, Union
 from langchain_community.document_loaders import (
     PyPDFLoader,
     UnstructuredWordDocumentLoader,
@@ -11,7 +10,12 @@ from langchain_community.document_loaders import (
 )
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+from PyPDF2 import PdfReader
+from utils.pdf_pages import extract_pdf_pages, resolve_workers
+from utils.vector_store import get_vector_store_backend
+from utils.hierarchical_retrieval import build_sections
+from utils.metering import MeteredEmbeddings
 
 
 class PrepareVectorDB:
@@ -21,15 +25,55 @@ class PrepareVectorDB:
         persist_directory: Union[str, os.PathLike],
         openai_api_key: str,
         chunk_size: int = 1000,
-        chunk_overlap: int = 200
+        chunk_overlap: int = 200,
+        pdf_workers: int = 1,
+        parallel_min_pages: int = 40,
+        vector_store_backend: str = "chroma",
+        vector_store_options: dict = None,
+        hierarchical_min_chunks: int = 0,
+        section_chunks: int = 20,
+        documents: Optional[List[Document]] = None
     ):
         self.file_path = data_directory[0] if isinstance(data_directory, list) else data_directory
         self.persist_directory = str(persist_directory)
         self.openai_api_key = openai_api_key
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.pdf_workers = pdf_workers
+        self.parallel_min_pages = parallel_min_pages
+        self.backend = get_vector_store_backend(vector_store_backend, vector_store_options)
+        # 0 keeps every index flat; otherwise documents this long also get section vectors
+        self.hierarchical_min_chunks = hierarchical_min_chunks
+        self.section_chunks = section_chunks
+        # Text already extracted elsewhere (e.g. a batch parse pool); the file is then not parsed again
+        self.documents = documents
+
+    def _load_pdf_parallel(self):
+        """Page-sharded PDF loading; returns None when the file is too small to benefit."""
+        if resolve_workers(self.pdf_workers) <= 1:
+            return None
+
+        num_pages = len(PdfReader(self.file_path).pages)
+        if num_pages < self.parallel_min_pages:
+            return None
+
+        print(f"⚡ Extracting {num_pages} pages with {resolve_workers(self.pdf_workers)} workers: {self.file_path}")
+        pages = extract_pdf_pages(
+            self.file_path,
+            workers=self.pdf_workers,
+            min_pages_for_parallel=self.parallel_min_pages,
+            num_pages=num_pages
+        )
+        # Same metadata shape as PyPDFLoader so downstream code is unaffected
+        return [
+            Document(page_content=text, metadata={"source": str(self.file_path), "page": page})
+            for page, text in pages
+        ]
 
     def _load_document(self):
+        if self.documents:
+            return self.documents
+
         ext = self.file_path.split(".")[-1].lower()
 
         loader_map = {
@@ -43,6 +87,11 @@ class PrepareVectorDB:
         if ext not in loader_map:
             raise ValueError(f"❌ Unsupported file format for RAG: .{ext}")
 
+        if ext == "pdf":
+            documents = self._load_pdf_parallel()
+            if documents:
+                return documents
+
         loader_cls = loader_map[ext]
         print(f"📄 Loading document using {loader_cls.__name__}: {self.file_path}")
 
@@ -57,7 +106,14 @@ class PrepareVectorDB:
             traceback.print_exc()
             raise
 
-    def prepare_and_save_vectordb(self, attempt: int = 1):
+    def prepare_and_save_vectordb(self) -> str:
+        """
+        Build the index and publish it as a new version of `persist_directory`.
+
+        The build happens in a private staging directory; the live version is
+        only swapped once the new one is complete, so sessions reading the
+        previous version are never disturbed. Returns the published directory.
+        """
         try:
             if not os.path.exists(self.file_path):
                 raise FileNotFoundError(f"File not found: {self.file_path}")
@@ -69,7 +125,8 @@ class PrepareVectorDB:
             print("✂️ Splitting document into chunks...")
             splitter = RecursiveCharacterTextSplitter(
                 chunk_size=self.chunk_size,
-                chunk_overlap=self.chunk_overlap
+                chunk_overlap=self.chunk_overlap,
+                add_start_index=True  # offsets let retrieval merge overlapping neighbours
             )
             chunks = splitter.split_documents(documents)
             print(f"📚 Total chunks: {len(chunks)}")
@@ -77,29 +134,31 @@ class PrepareVectorDB:
             if not chunks:
                 raise ValueError("❌ Document loaded but no text chunks were extracted.")
 
-            print("🔍 Creating embeddings and initializing Chroma DB...")
-            embedding_fn = OpenAIEmbeddings(openai_api_key=self.openai_api_key)
-
-            vectordb = Chroma.from_documents(
-                documents=chunks,
-                embedding=embedding_fn,
-                persist_directory=self.persist_directory
+            sections = None
+            if self.hierarchical_min_chunks and len(chunks) >= self.hierarchical_min_chunks:
+                sections = build_sections(chunks, self.section_chunks)
+                print(f"🗂️ Long document: {len(sections)} section summaries for two-stage retrieval")
+
+            print(f"🔍 Creating embeddings and building {self.backend.name} index...")
+            openai_embeddings = OpenAIEmbeddings(openai_api_key=self.openai_api_key)
+            embedding_fn = MeteredEmbeddings(openai_embeddings, openai_embeddings.model)
+
+            published = self.backend.publish(
+                chunks,
+                embedding_fn,
+                self.persist_directory,
+                info={
+                    "source": os.path.basename(self.file_path),
+                    "chunk_size": self.chunk_size,
+                    "chunk_overlap": self.chunk_overlap
+                },
+                sections=sections
             )
-
-            vectordb.persist()
-            print(f"✅ Vector DB saved at: {self.persist_directory}")
+            print(f"✅ Vector DB published at: {published}")
+            return published
 
         except Exception as e:
+            # A failed build only discards its own staging directory; the live version keeps serving
             print(f"❌ Failed to prepare vector store: {type(e).__name__}: {e}")
             traceback.print_exc()
-
-            if attempt == 1 and ("no such column" in str(e).lower() or "tenant" in str(e).lower()):
-                print("⚠️ Detected corrupt or incompatible vector DB. Deleting and retrying...")
-                try:
-                    shutil.rmtree(self.persist_directory, ignore_errors=True)
-                    return self.prepare_and_save_vectordb(attempt=2)
-                except Exception as cleanup_error:
-                    print(f"❌ Failed to delete old DB: {type(cleanup_error).__name__}: {cleanup_error}")
-                    traceback.print_exc()
-
             raise RuntimeError("💥 Vector store preparation failed. Try a different document or check your environment.") from e
@@ -4,17 +4,23 @@ import pandas as pd
 
 class QuizEngine:
     @staticmethod
-    def start_quiz_session(questions: list):
+    def start_quiz_session(questions: list, generating: bool = False):
+        # Questions are shared (not copied into session state); only the position is per session
         q_index = st.session_state.current_question
-        total = len(st.session_state.questions)
-
-        if q_index < total:
-            q = st.session_state.questions[q_index]
+        total = len(questions)
+        # While generation is still running the total is only a lower bound
+        total_label = f"{total} so far" if generating else f"{total}"
+
+        # Runs inside a fragment that polls while generating, so just wait here
+        if q_index >= total and generating:
+            st.info("⏳ Preparing the next question...")
+        elif q_index < total:
+            q = questions[q_index]
             selected_key = f"selected_{q_index}"
 
             # Display Question
             st.markdown(
-                f"<div class='quiz-box'><strong>Q{q_index + 1} of {total}:</strong> {q['question']}</div>",
+                f"<div class='quiz-box'><strong>Q{q_index + 1} of {total_label}:</strong> {q['question']}</div>",
                 unsafe_allow_html=True
             )
 
@@ -34,34 +40,47 @@ class QuizEngine:
             # Submit Button
             if not st.session_state.answered:
                 if st.button("✅ Submit Answer", key=f"submit_{q_index}"):
-                    if selected == q["correct"]:
-                        st.success("✅ Correct!")
+                    is_correct = selected == q["correct"]
+                    if is_correct:
                         st.session_state.score += 1
-                    else:
-                        st.error(f"❌ Incorrect. Correct answer: {q['correct']}")
+                    st.session_state.last_answer_correct = is_correct
+                    st.session_state.answered = True
 
-                    st.markdown(
-                        f"<div class='quiz-box'><strong>Explanation:</strong> {q.get('explanation', 'No explanation provided')}</div>",
-                        unsafe_allow_html=True
-                    )
+            # Feedback is kept in session state so fragment reruns don't clear it
+            if st.session_state.answered:
+                if st.session_state.get("last_answer_correct"):
+                    st.success("✅ Correct!")
+                else:
+                    st.error(f"❌ Incorrect. Correct answer: {q['correct']}")
 
-                    st.session_state.answered = True
+                st.markdown(
+                    f"<div class='quiz-box'><strong>Explanation:</strong> {q.get('explanation', 'No explanation provided')}</div>",
+                    unsafe_allow_html=True
+                )
 
             # Next Button (only after answer is submitted)
             if st.session_state.answered:
-                if st.button("➡️ Next Question", key=f"next_{q_index}"):
-                    st.session_state.current_question += 1
-                    st.session_state.answered = False
-                    del st.session_state[selected_key]
-                    st.rerun()
+                # State changes in the callback, so the fragment rerun shows the next question
+                st.button(
+                    "➡️ Next Question",
+                    key=f"next_{q_index}",
+                    on_click=QuizEngine.next_question,
+                    args=(selected_key,)
+                )
 
             st.markdown("</div>", unsafe_allow_html=True)
         else:
-            QuizEngine.show_score()
+            QuizEngine.show_score(questions)
+
+    @staticmethod
+    def next_question(selected_key: str):
+        st.session_state.current_question += 1
+        st.session_state.answered = False
+        st.session_state.pop(selected_key, None)
 
     @staticmethod
-    def show_score():
-        total = len(st.session_state.questions)
+    def show_score(questions: list):
+        total = len(questions)
         correct = st.session_state.score
         incorrect = total - correct
         percent = round((correct / total) * 100)
@@ -82,7 +101,6 @@ class QuizEngine:
         st.info(f"Your Score: **{percent}%** — {'👏 Great job!' if percent >= 70 else '📖 Keep practicing!'}")
 
         if st.button("🔄 Restart Quiz"):
-            st.session_state.questions = []
             st.session_state.current_question = 0
             st.session_state.score = 0
             st.session_state.answered = False
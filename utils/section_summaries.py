@@ -0,0 +1,133 @@
+"""
+Page- and slide-range summaries built from cached chunk summaries.
+
+Map-phase summaries are made per located chunk (consecutive pages or slides
+up to `map_chunk_size` characters) and stored per document with the range
+they cover. "Summarize pages 40-55" then only needs the stored summaries of
+the overlapping chunks and one merge call; chunks nobody has asked about
+are summarized the first time a range touches them.
+"""
+
+import os
+import re
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+import streamlit as st
+from utils.load_config import LoadConfig
+
+UNIT_LABELS = {"pdf": "page", "pptx": "slide"}
+
+# Only requests that open with the ask itself ("summarize pages ...", "can you summarise slides ...",
+# "summary of page ..."); questions that merely mention a summary and a page go to the QA chain
+_RANGE_REQUEST = re.compile(
+    r"^\s*(?:(?:please|kindly|can\s+you|could\s+you|would\s+you)\s+)*"
+    r"(?:summari[sz]e|summary\s+of)\s+(?:the\s+)?"
+    r"(pages?|slides?|pp?\.)\s*(\d+)(?:\s*(?:-|–|—|to|through|until)\s*(\d+))?",
+    re.IGNORECASE
+)
+
+
+def unit_label(file_path: str) -> Optional[str]:
+    """'page' or 'slide' for files with addressable positions, else None."""
+    return UNIT_LABELS.get(file_path.lower().rsplit(".", 1)[-1])
+
+
+def parse_range_request(text: str) -> Optional[Tuple[int, int]]:
+    """
+    (start, end) from requests like "summarize pages 40-55" or "summarise slide 12 to 20".
+
+    A single page or slide gives start == end; anything else returns None.
+    """
+    match = _RANGE_REQUEST.match(text or "")
+    if not match:
+        return None
+    start = int(match.group(2))
+    end = int(match.group(3)) if match.group(3) else start
+    return min(start, end), max(start, end)
+
+
+def format_range(unit: str, start: int, end: int) -> str:
+    return f"{unit} {start}" if start == end else f"{unit}s {start}–{end}"
+
+
+def chunk_units(units: List[Tuple[int, str]], max_chars: int) -> List[dict]:
+    """
+    Pack consecutive (number, text) units into chunks of at most `max_chars`.
+
+    Each chunk records the first and last unit it covers. Units longer than
+    `max_chars` are split into several chunks covering just that unit; blank
+    units are skipped.
+    """
+    chunks = []
+    current, start, end, size = [], None, None, 0
+
+    def flush():
+        if current:
+            chunks.append({"start": start, "end": end, "text": "\n".join(current)})
+
+    for number, text in units:
+        text = (text or "").strip()
+        if not text:
+            continue
+        if len(text) > max_chars:
+            flush()
+            current, start, size = [], None, 0
+            for offset in range(0, len(text), max_chars):
+                chunks.append({"start": number, "end": number, "text": text[offset:offset + max_chars]})
+            continue
+        if current and size + len(text) + 1 > max_chars:
+            flush()
+            current, start, size = [], None, 0
+        if start is None:
+            start = number
+        current.append(text)
+        end = number
+        size += len(text) + 1
+    flush()
+    return chunks
+
+
+def overlapping(chunks: List[dict], start: int, end: int) -> List[int]:
+    """Indexes of the chunks that cover any unit in [start, end]."""
+    return [i for i, chunk in enumerate(chunks) if chunk["end"] >= start and chunk["start"] <= end]
+
+
+class ChunkSummaryStore:
+    """
+    Map-phase summaries per document, stored as JSON next to other derived data.
+
+    Keyed by content hash and chunk size, since a different chunking covers
+    different ranges. Entries are {chunk index: {"start", "end", "summary"}}.
+    """
+
+    def __init__(self, root: Union[str, os.PathLike]):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.json"
+
+    def load(self, key: str) -> Dict[int, dict]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return {int(index): entry for index, entry in json.load(f).items()}
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save(self, key: str, entries: Dict[int, dict]):
+        # Merged with what's on disk, so concurrent ranges on one document both keep their work
+        path = self._path(key)
+        with self._lock:
+            merged = {**self.load(key), **entries}
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({str(index): entry for index, entry in sorted(merged.items())}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+
+
+@st.cache_resource(show_spinner=False)
+def get_chunk_summary_store() -> ChunkSummaryStore:
+    return ChunkSummaryStore(LoadConfig().chunk_summary_directory)
@@ -1,8 +1,24 @@
 import streamlit as st
+from utils.upload_store import get_upload_store
+from utils.session_store import get_session_store, get_memory_tracker
 
 def reset_app_session():
+    # Stop any background question generation still running for this session
+    job = st.session_state.get("mcq_job")
+    if job is not None:
+        job.cancel()
+
+    # Drop this session's reference to its upload; the file goes once nobody uses it
+    if st.session_state.get("file_path") and st.session_state.get("session_id"):
+        get_upload_store().release(st.session_state.file_path, st.session_state.session_id)
+
+    # Chat history lives on disk per session; question sets stay shared per document
+    if st.session_state.get("session_id"):
+        get_session_store().clear_session(st.session_state.session_id)
+        get_memory_tracker().forget(st.session_state.session_id)
+
     keys_to_clear = list(st.session_state.keys())
     for key in keys_to_clear:
         del st.session_state[key]
-    st.cache_data.clear()  # Optional: clears any cache you might use
+    # Caches are keyed by content-addressed paths, so they stay valid for other sessions
     st.rerun()
@@ -0,0 +1,176 @@
+import os
+import sys
+import json
+import time
+import shutil
+import threading
+from collections import deque
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+import streamlit as st
+from utils.load_config import LoadConfig
+
+
+class SessionStore:
+    """
+    Disk-backed home for bulky session data, so session state only holds handles.
+
+    Chat history is an append-only JSONL file per session; quiz questions are
+    stored once per document (by content hash) and shared by every session
+    quizzing on it.
+    """
+
+    def __init__(self, root: Union[str, os.PathLike]):
+        self.root = Path(root)
+        self.sessions_dir = self.root / "chats"
+        self.questions_dir = self.root / "questions"
+        for path in (self.sessions_dir, self.questions_dir):
+            path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    # === Chat history (per session) ===
+    def _chat_path(self, session_id: str) -> Path:
+        return self.sessions_dir / session_id / "chat.jsonl"
+
+    def append_chat(self, session_id: str, question: str, answer: str):
+        path = self._chat_path(session_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps([question, answer], ensure_ascii=False) + "\n")
+
+    def load_chat(self, session_id: str, last_n: Optional[int] = None) -> List[Tuple[str, str]]:
+        path = self._chat_path(session_id)
+        if not path.exists():
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            # deque keeps only the tail, so long histories are never fully in memory
+            lines = deque(f, maxlen=last_n) if last_n else f.readlines()
+        return [tuple(json.loads(line)) for line in lines if line.strip()]
+
+    def clear_session(self, session_id: str):
+        shutil.rmtree(self.sessions_dir / session_id, ignore_errors=True)
+
+    # === Questions (per document, shared) ===
+    def _questions_path(self, digest: str) -> Path:
+        return self.questions_dir / f"{digest}.json"
+
+    def save_questions(self, digest: str, questions: list, replace: bool = True) -> bool:
+        """
+        Store the document's question list; returns False if one was kept instead.
+
+        With replace=False an existing list is left alone, so sessions
+        mid-quiz on it keep pointing at the same questions.
+        """
+        path = self._questions_path(digest)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(questions, f, ensure_ascii=False)
+        if replace:
+            os.replace(tmp_path, path)
+            return True
+        try:
+            os.link(tmp_path, path)  # atomic create-if-absent
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def load_questions(self, digest: str) -> list:
+        """Shared, read-only list: one copy per document per process, not per session."""
+        path = self._questions_path(digest)
+        if not path.exists():
+            return []
+        return _read_questions(str(path), path.stat().st_mtime_ns)
+
+    def prune(self, max_age_seconds: float) -> int:
+        """Remove chat logs of sessions idle for longer than `max_age_seconds`."""
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        for session_dir in list(self.sessions_dir.iterdir()):
+            if session_dir.stat().st_mtime < cutoff:
+                shutil.rmtree(session_dir, ignore_errors=True)
+                removed += 1
+        return removed
+
+
+@lru_cache(maxsize=256)
+def _read_questions(path: str, mtime_ns: int) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def deep_sizeof(obj, _seen: Optional[set] = None) -> int:
+    """
+    Approximate memory held by `obj`.
+
+    Containers are followed; objects of this app's own classes are followed
+    through their attributes; anything else (LLM clients, threads) counts
+    shallowly since it is shared or owned elsewhere.
+    """
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif type(obj).__module__.startswith("utils.") and hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+class SessionMemoryTracker:
+    """Last measured session-state size per session, for per-session and total reporting."""
+
+    def __init__(self, ttl_seconds: float = 3600):
+        self.ttl_seconds = ttl_seconds
+        self._sizes: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, session_id: str, nbytes: int):
+        with self._lock:
+            self._sizes[session_id] = (nbytes, time.time())
+
+    def forget(self, session_id: str):
+        with self._lock:
+            self._sizes.pop(session_id, None)
+
+    def snapshot(self) -> Dict[str, int]:
+        # Sessions that stopped reporting (closed tabs) age out
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            for session_id in [s for s, (_, seen) in self._sizes.items() if seen < cutoff]:
+                del self._sizes[session_id]
+            return {session_id: nbytes for session_id, (nbytes, _) in self._sizes.items()}
+
+    def total(self) -> int:
+        return sum(self.snapshot().values())
+
+
+@st.cache_resource(show_spinner=False)
+def get_session_store() -> SessionStore:
+    config = LoadConfig()
+    store = SessionStore(config.session_store_directory)
+    store.prune(config.session_ttl_hours * 3600)
+    return store
+
+
+@st.cache_resource(show_spinner=False)
+def get_memory_tracker() -> SessionMemoryTracker:
+    return SessionMemoryTracker(ttl_seconds=LoadConfig().session_ttl_hours * 3600)
+
+
+def report_session_memory(session_state, session_id: str, limit_kb: float = 0) -> Tuple[int, int, int]:
+    """Measure this session's state; returns (session_bytes, total_bytes, session_count)."""
+    nbytes = deep_sizeof({key: session_state[key] for key in session_state.keys()})
+    tracker = get_memory_tracker()
+    tracker.record(session_id, nbytes)
+    sizes = tracker.snapshot()
+    if limit_kb and nbytes > limit_kb * 1024:
+        print(f"⚠️ Session {session_id[:8]} state is {nbytes / 1024:.0f} KB (limit {limit_kb} KB)")
+    return nbytes, sum(sizes.values()), len(sizes)
@@ -0,0 +1,204 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+import streamlit as st
+from utils.load_config import LoadConfig
+from utils.metering import BudgetExceededError
+from utils.deadline import DeadlineExceeded, PartialResult
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows: threads in one process are still deduplicated
+
+_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+# Failures of the leader's caller (its budget, its deadline) rather than of the job itself
+CALLER_ERRORS = (BudgetExceededError, DeadlineExceeded, PartialResult)
+
+
+def content_key(file_path: Union[str, os.PathLike]) -> Optional[str]:
+    """
+    Content hash identifying the work for a file, or None if the file doesn't exist.
+
+    Uploads are already named by their sha256; anything else is hashed once
+    per (path, mtime, size).
+    """
+    path = Path(file_path)
+    if _SHA256.match(path.stem):
+        return path.stem
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return _file_digest(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=1024)
+def _file_digest(path: str, mtime_ns: int, size: int) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class _Flight:
+    def __init__(self):
+        self.finished = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs each (job type, key) once at a time; concurrent callers share the result.
+
+    Threads in this process wait on the in-flight call. Other processes
+    (Streamlit replicas, the API, the batch CLI) are serialized by a file
+    lock per job, and then find the leader's result in the on-disk result
+    cache (`persist=True`) or its artifact already in place (`done`).
+    """
+
+    def __init__(self, root: Union[str, os.PathLike], wait_timeout: float = 900):
+        self.root = Path(root)
+        self.locks_dir = self.root / "locks"
+        self.results_dir = self.root / "results"
+        for path in (self.locks_dir, self.results_dir):
+            path.mkdir(parents=True, exist_ok=True)
+        self.wait_timeout = wait_timeout
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    # === Cross-process coordination ===
+    @contextmanager
+    def _process_lock(self, name: str):
+        if fcntl is None:
+            yield
+            return
+        with open(self.locks_dir / f"{name}.lock", "a+") as lock_file:
+            deadline = time.monotonic() + self.wait_timeout
+            acquired = False
+            while not acquired:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    acquired = True
+                except BlockingIOError:
+                    if time.monotonic() > deadline:
+                        # A stuck holder must not block everyone forever
+                        print(f"[⚠️ Gave up waiting for job lock {name}, running it here]")
+                        break
+                    time.sleep(0.1)
+            try:
+                yield
+            finally:
+                if acquired:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _result_path(self, job_type: str, key: str) -> Path:
+        return self.results_dir / job_type / f"{key}.json"
+
+    def load_result(self, job_type: str, key: str) -> Optional[Any]:
+        try:
+            with open(self._result_path(job_type, key), "r", encoding="utf-8") as f:
+                return json.load(f)["result"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+
+    def save_result(self, job_type: str, key: str, result: Any):
+        path = self._result_path(job_type, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"result": result, "created": time.time()}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def prune(self, max_age_seconds: float) -> int:
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        for path in self.results_dir.glob("*/*.json"):
+            if path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+    # === Deduplicated execution ===
+    def do(
+        self,
+        job_type: str,
+        key: str,
+        fn: Callable[[], Any],
+        persist: bool = False,
+        keep: Optional[Callable[[Any], bool]] = None,
+        done: Optional[Callable[[], bool]] = None
+    ) -> Any:
+        """
+        Run `fn` unless an identical job is in flight or already finished.
+
+        `persist` stores JSON-serializable results on disk for other processes
+        (only results passing `keep`, so failures are retried). `done` reports
+        whether the job's artifact already exists, for jobs whose output is a
+        file rather than a return value; fn is then skipped and None returned.
+        Joiners share the leader's errors, except CALLER_ERRORS: those are the
+        leader's own, so joiners then run the job themselves.
+        """
+        if persist:
+            cached = self.load_result(job_type, key)
+            if cached is not None:
+                return cached
+
+        name = f"{job_type}-{key}"
+        with self._lock:
+            flight = self._flights.get(name)
+            leader = flight is None
+            if leader:
+                flight = self._flights[name] = _Flight()
+
+        if not leader:
+            print(f"🔗 Joining in-flight {job_type} job for {key[:12]}")
+            if not flight.finished.wait(self.wait_timeout):
+                return fn()
+            if isinstance(flight.error, CALLER_ERRORS):
+                print(f"↪️ {job_type} leader for {key[:12]} stopped ({type(flight.error).__name__}), retrying as a new caller")
+                return self.do(job_type, key, fn, persist, keep, done)
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            with self._process_lock(name):
+                # Another process may have finished it while we waited for the lock
+                if persist:
+                    cached = self.load_result(job_type, key)
+                    if cached is not None:
+                        flight.result = cached
+                        return cached
+                if done is not None and done():
+                    return None
+
+                flight.result = fn()
+                if persist and (keep is None or keep(flight.result)):
+                    self.save_result(job_type, key, flight.result)
+                return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(name, None)
+            flight.finished.set()
+
+
+@st.cache_resource(show_spinner=False)
+def get_single_flight() -> SingleFlight:
+    config = LoadConfig()
+    flights = SingleFlight(config.single_flight_directory, config.single_flight_wait_timeout)
+    flights.prune(config.single_flight_result_ttl_hours * 3600)
+    return flights
@@ -0,0 +1,380 @@
+"""
+Study packs: everything Helpy computed for one document, in one archive.
+
+A pack is a zip file (deflate-compressed) holding a manifest, the original
+document, its extracted text and pages/slides, the chunks with their
+metadata and embeddings (plus section summaries for hierarchical indexes),
+the summary, the MCQ bank and the FAQ cache. Exporting collects them from
+where the app keeps them. On deployments that trust their imports,
+importing puts them back there (without replacing anything already
+computed), so opening a pack costs no parsing, embedding or LLM calls.
+Instructors can export once and hand the same pack to a whole class.
+"""
+
+import io
+import os
+import json
+import time
+import hashlib
+import threading
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, List, Optional, Union
+import numpy as np
+import streamlit as st
+from langchain_core.documents import Document
+from utils.load_config import LoadConfig
+from utils.single_flight import content_key
+
+CONFIG = LoadConfig()
+
+PACK_FORMAT = "helpy-study-pack"
+PACK_VERSION = 1
+PACK_EXTENSION = "helpy"
+MANIFEST = "manifest.json"
+
+
+class StudyPackError(ValueError):
+    """Raised for archives that aren't valid study packs or don't fit this deployment."""
+
+
+@dataclass
+class StudyPack:
+    manifest: dict
+    document: bytes
+    text: str
+    chunks: List[Document]
+    embeddings: np.ndarray
+    units: list = field(default_factory=list)
+    sections: List[Document] = field(default_factory=list)
+    section_embeddings: Optional[np.ndarray] = None
+    summary: Optional[str] = None
+    mcqs: list = field(default_factory=list)
+    faq: list = field(default_factory=list)
+
+
+# === Archive format ===
+def _npy_bytes(matrix: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    np.save(buffer, np.asarray(matrix, dtype=np.float32), allow_pickle=False)
+    return buffer.getvalue()
+
+
+def _jsonl_bytes(documents: List[Document]) -> bytes:
+    lines = (json.dumps({"page_content": doc.page_content, "metadata": doc.metadata}, ensure_ascii=False) for doc in documents)
+    return "".join(line + "\n" for line in lines).encode("utf-8")
+
+
+def _jsonl_documents(data: bytes) -> List[Document]:
+    return [Document(**json.loads(line)) for line in data.decode("utf-8").splitlines() if line.strip()]
+
+
+def write_pack(target: Union[str, os.PathLike, BinaryIO], pack: StudyPack) -> dict:
+    """Write `pack` as a zip archive; returns the manifest with each entry's sha256."""
+    entries = {
+        f"document/{pack.manifest['file_name']}": pack.document,
+        "text.txt": pack.text.encode("utf-8"),
+        "chunks.jsonl": _jsonl_bytes(pack.chunks),
+        "embeddings.npy": _npy_bytes(pack.embeddings),
+    }
+    if pack.units:
+        entries["units.json"] = json.dumps(pack.units, ensure_ascii=False).encode("utf-8")
+    if pack.sections:
+        entries["sections.jsonl"] = _jsonl_bytes(pack.sections)
+        entries["section_embeddings.npy"] = _npy_bytes(pack.section_embeddings)
+    if pack.summary:
+        entries["summary.md"] = pack.summary.encode("utf-8")
+    if pack.mcqs:
+        entries["mcqs.json"] = json.dumps(pack.mcqs, ensure_ascii=False).encode("utf-8")
+    if pack.faq:
+        entries["faq.json"] = json.dumps(pack.faq, ensure_ascii=False).encode("utf-8")
+
+    manifest = {
+        **pack.manifest,
+        "format": PACK_FORMAT,
+        "format_version": PACK_VERSION,
+        "counts": {
+            "chunks": len(pack.chunks),
+            "sections": len(pack.sections),
+            "units": len(pack.units),
+            "mcqs": len(pack.mcqs),
+            "faq": len(pack.faq),
+        },
+        "entries": {name: hashlib.sha256(data).hexdigest() for name, data in entries.items()},
+    }
+    with zipfile.ZipFile(target, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(MANIFEST, json.dumps(manifest, indent=2, ensure_ascii=False))
+        for name, data in entries.items():
+            archive.writestr(name, data)
+    pack.manifest = manifest
+    return manifest
+
+
+def read_manifest(source: Union[str, os.PathLike, BinaryIO]) -> dict:
+    try:
+        with zipfile.ZipFile(source) as archive:
+            manifest = json.loads(archive.read(MANIFEST))
+    except (zipfile.BadZipFile, KeyError, ValueError) as e:
+        raise StudyPackError(f"Not a study pack: {e}")
+    if manifest.get("format") != PACK_FORMAT:
+        raise StudyPackError("Not a study pack: unknown archive format.")
+    if manifest.get("format_version", 0) > PACK_VERSION:
+        raise StudyPackError(f"This study pack needs a newer Helpy (pack format {manifest['format_version']}).")
+    return manifest
+
+
+def read_pack(source: Union[str, os.PathLike, BinaryIO], max_bytes: Optional[int] = None) -> StudyPack:
+    """Read and verify a pack; every entry must match the checksum in its manifest."""
+    manifest = read_manifest(source)
+    with zipfile.ZipFile(source) as archive:
+        # Checked before decompressing anything, so a small archive can't expand without bound
+        unpacked = sum(info.file_size for info in archive.infolist())
+        if max_bytes is not None and unpacked > max_bytes:
+            raise StudyPackError(f"Study pack unpacks to {unpacked / 1_048_576:.0f} MB; the limit is {max_bytes / 1_048_576:.0f} MB.")
+
+        data = {}
+        for name, digest in manifest.get("entries", {}).items():
+            try:
+                data[name] = archive.read(name)
+            except KeyError:
+                raise StudyPackError(f"Study pack is missing {name}.")
+            if hashlib.sha256(data[name]).hexdigest() != digest:
+                raise StudyPackError(f"Study pack entry {name} is corrupted.")
+
+    document = data.get(f"document/{manifest.get('file_name')}")
+    required = ["text.txt", "chunks.jsonl", "embeddings.npy"]
+    if document is None or any(name not in data for name in required):
+        raise StudyPackError("Study pack is incomplete: it needs the document, its text, chunks and embeddings.")
+
+    def npy(name):
+        return np.load(io.BytesIO(data[name]), allow_pickle=False) if name in data else None
+
+    def as_json(name, default):
+        return json.loads(data[name]) if name in data else default
+
+    pack = StudyPack(
+        manifest=manifest,
+        document=document,
+        text=data["text.txt"].decode("utf-8"),
+        chunks=_jsonl_documents(data["chunks.jsonl"]),
+        embeddings=npy("embeddings.npy"),
+        units=[tuple(unit) for unit in as_json("units.json", [])],
+        sections=_jsonl_documents(data.get("sections.jsonl", b"")),
+        section_embeddings=npy("section_embeddings.npy"),
+        summary=data["summary.md"].decode("utf-8") if "summary.md" in data else None,
+        mcqs=as_json("mcqs.json", []),
+        faq=as_json("faq.json", []),
+    )
+    if len(pack.chunks) != len(pack.embeddings) or len(pack.sections) != len(pack.section_embeddings if pack.section_embeddings is not None else []):
+        raise StudyPackError("Study pack has a different number of embeddings than chunks.")
+    return pack
+
+
+# === Unpacked artifacts ===
+class PackStore:
+    """
+    Text, pages/slides, summary and MCQ bank of imported packs, per content hash.
+
+    Summarizer and MCQGenerator look here before parsing a file or calling
+    the LLM. Unlike shared job results these are never expired: they came
+    with the pack and can't be recomputed for free.
+    """
+
+    FILES = {"text": "text.txt", "units": "units.json", "summary": "summary.md", "mcqs": "mcqs.json"}
+
+    def __init__(self, root: Union[str, os.PathLike]):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, digest: str, artifact: str) -> Path:
+        return self.root / digest / self.FILES[artifact]
+
+    def load(self, digest: Optional[str], artifact: str):
+        """The stored artifact, or None; JSON artifacts are parsed."""
+        if digest is None:
+            return None
+        try:
+            with open(self._path(digest, artifact), "r", encoding="utf-8") as f:
+                return json.load(f) if artifact in ("units", "mcqs") else f.read()
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save(self, digest: str, replace: bool = True, **artifacts):
+        """Store the given artifacts; with replace=False ones already stored are kept."""
+        (self.root / digest).mkdir(parents=True, exist_ok=True)
+        for artifact, value in artifacts.items():
+            if value is None or value == [] or value == "":
+                continue
+            path = self._path(digest, artifact)
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with self._lock, open(tmp_path, "w", encoding="utf-8") as f:
+                if isinstance(value, str):
+                    f.write(value)
+                else:
+                    json.dump(value, f, ensure_ascii=False)
+            if replace:
+                os.replace(tmp_path, path)
+                continue
+            try:
+                os.link(tmp_path, path)  # atomic create-if-absent
+            except FileExistsError:
+                pass
+            finally:
+                tmp_path.unlink(missing_ok=True)
+
+
+@st.cache_resource(show_spinner=False)
+def get_pack_store() -> PackStore:
+    return PackStore(LoadConfig().study_pack_directory)
+
+
+def embedding_model() -> str:
+    """Model the app embeds chunks and queries with; vectors from other models aren't comparable."""
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(openai_api_key=CONFIG.openai_api_key).model
+
+
+# === Export and import ===
+def export_pack(file_path: str, target: Union[str, os.PathLike, BinaryIO], complete: bool = False) -> dict:
+    """
+    Pack what has been computed for `file_path`; returns the manifest.
+
+    The index is built if missing, since chunks and embeddings are required.
+    The summary and MCQ bank are included when they exist; with `complete`,
+    missing ones are generated first. The FAQ is included once chat has
+    built it.
+    """
+    from utils.summarizer import Summarizer
+    from utils.generate_mcqs import MCQGenerator
+    from utils.chat_with_file import build_index_once
+    from utils.faq import faq_path_for, load_faq
+    from utils.session_store import get_session_store
+    from utils.single_flight import get_single_flight
+    from utils.vector_store import get_vector_store_backend, index_directory_for
+
+    digest = content_key(file_path)
+    if digest is None:
+        raise FileNotFoundError(f"File not found: {file_path}")
+    text = Summarizer.extract_text_from_file(file_path)
+    if not text or text.startswith("❌"):
+        raise StudyPackError("Could not extract text from the document, so there is nothing to pack.")
+
+    backend = get_vector_store_backend(CONFIG.vector_store_backend, CONFIG.vector_store_options)
+    if not backend.can_read:
+        raise StudyPackError(f"Study packs can't be exported here: indexes of the {backend.name} vector store can't be read back.")
+    index_directory = index_directory_for(CONFIG.custom_persist_directory, file_path, backend.name)
+    if not backend.is_published(index_directory):
+        build_index_once(file_path, index_directory, backend)
+    chunks, embeddings, sections, section_embeddings = backend.read_published(index_directory)
+
+    packed = get_pack_store()
+    summary = packed.load(digest, "summary") or get_single_flight().load_result("summary", digest)
+    if not summary and complete:
+        summary = Summarizer._summarize_file_cached(file_path)
+    mcqs = (
+        packed.load(digest, "mcqs")
+        or get_session_store().load_questions(digest)
+        or get_single_flight().load_result("mcqs", f"{digest}-{CONFIG.quiz_max_questions}")
+    )
+    if not mcqs and complete:
+        mcqs = MCQGenerator.generate_mcqs_from_file(file_path, CONFIG.quiz_max_questions)
+
+    with open(file_path, "rb") as f:
+        document = f.read()
+    file_name = Path(file_path).name
+    manifest = write_pack(target, StudyPack(
+        manifest={
+            "document_id": digest,
+            "file_name": file_name,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "embedding_model": embedding_model(),
+            "dimensions": int(embeddings.shape[1]) if embeddings.ndim == 2 else 0,
+            "chunk_size": CONFIG.chunk_size,
+            "chunk_overlap": CONFIG.chunk_overlap,
+        },
+        document=document,
+        text=text,
+        chunks=chunks,
+        embeddings=embeddings,
+        units=[list(unit) for unit in Summarizer.extract_units(file_path)],
+        sections=sections,
+        section_embeddings=section_embeddings,
+        summary=summary if summary and not summary.startswith("❌") else None,
+        mcqs=mcqs or [],
+        faq=load_faq(faq_path_for(CONFIG.custom_persist_directory, file_path)),
+    ))
+    print(f"📦 Study pack for {file_name}: {manifest['counts']}")
+    return manifest
+
+
+def import_pack(source: Union[str, os.PathLike, BinaryIO], session_id: str):
+    """
+    Unpack a study pack into the app's stores; returns the StoredUpload of its document.
+
+    The document is stored like an upload (held by `session_id`). Only
+    the document bytes are checked against the manifest; the rest of the
+    pack is whatever its author put there, and the stores below are shared
+    by every user of the document. So unless the deployment trusts its
+    imports (`study_pack_config.trust_imports`, for instructor setups),
+    the pack opens like an upload and everything is computed from the
+    document. When trusted, the index is published from the packed
+    embeddings and the text, summary, MCQs and FAQ are put where
+    Summarizer, MCQGenerator, the quiz and chat look for them; anything
+    this document already has is kept, never replaced.
+    """
+    from utils.faq import faq_path_for, save_faq
+    from utils.session_store import get_session_store
+    from utils.upload_store import get_upload_store
+    from utils.vector_store import get_vector_store_backend, index_directory_for, PrecomputedEmbeddings
+
+    pack = read_pack(source, max_bytes=int(CONFIG.study_pack_max_mb * 1024 * 1024))
+    manifest = pack.manifest
+    if manifest.get("embedding_model") != embedding_model():
+        raise StudyPackError(
+            f"This study pack was embedded with {manifest.get('embedding_model')}, "
+            f"but this app searches with {embedding_model()}."
+        )
+
+    stored = get_upload_store().save(io.BytesIO(pack.document), manifest["file_name"], session_id, size=len(pack.document))
+    if stored.digest != manifest["document_id"]:
+        get_upload_store().release(stored.path, session_id)
+        raise StudyPackError("Study pack document doesn't match its manifest.")
+
+    if not CONFIG.study_pack_trust_imports:
+        print(f"📦 Opened study pack for {manifest['file_name']} as an upload (imports aren't trusted)")
+        return stored
+
+    get_pack_store().save(
+        stored.digest,
+        replace=False,
+        text=pack.text,
+        units=[list(unit) for unit in pack.units],
+        summary=pack.summary,
+        mcqs=pack.mcqs
+    )
+    if pack.mcqs:
+        get_session_store().save_questions(stored.digest, pack.mcqs, replace=False)
+    faq_path = faq_path_for(CONFIG.custom_persist_directory, stored.path)
+    if pack.faq and not faq_path.exists():
+        save_faq(faq_path, pack.faq)
+
+    backend = get_vector_store_backend(CONFIG.vector_store_backend, CONFIG.vector_store_options)
+    index_directory = index_directory_for(CONFIG.custom_persist_directory, stored.path, backend.name)
+    if not backend.is_published(index_directory):
+        vectors = pack.embeddings if pack.section_embeddings is None else np.vstack([pack.embeddings, pack.section_embeddings])
+        backend.publish(
+            pack.chunks,
+            PrecomputedEmbeddings(vectors),
+            index_directory,
+            info={
+                "source": manifest["file_name"],
+                "chunk_size": manifest.get("chunk_size"),
+                "chunk_overlap": manifest.get("chunk_overlap"),
+                "study_pack": manifest.get("created"),
+            },
+            sections=pack.sections or None
+        )
+    print(f"📦 Imported study pack for {manifest['file_name']}: {manifest.get('counts', {})}")
+    return stored
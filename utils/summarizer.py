@@ -3,24 +3,51 @@ import re
 import pandas as pd
 import docx2txt
 import pptx
-from typing import List
+from typing import Callable, Dict, List, Tuple
 from PyPDF2 import PdfReader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from openai import OpenAI
 from dotenv import load_dotenv
 import streamlit as st
+from utils.load_config import LoadConfig
+from utils.pdf_pages import extract_pdf_pages, resolve_workers
+from utils.model_router import route_completion
+from utils.extractive import extractive_summary
+from utils.tokens import count_num_tokens
+from utils.metering import metered_cache, note_cache_miss, BudgetExceededError
+from utils.deadline import near, mark_partial, DeadlineExceeded, PartialResult
+from utils.single_flight import get_single_flight, content_key
+from utils.section_summaries import unit_label, chunk_units, overlapping, format_range, get_chunk_summary_store
+from utils.study_pack import get_pack_store
 
 load_dotenv()
-client = OpenAI()
+# route_completion falls back across models instead of letting the SDK retry
+client = OpenAI(max_retries=0)
+CONFIG = LoadConfig()
 
 class Summarizer:
     @staticmethod
     @st.cache_data(show_spinner=False)
     def extract_text_from_file(file_path: str) -> str:
+        # Documents opened from a study pack come with their text
+        packed = get_pack_store().load(content_key(file_path), "text")
+        if packed is not None:
+            return packed
+
         ext = file_path.lower().split(".")[-1]
         try:
             if ext == "pdf":
                 reader = PdfReader(file_path)
+                num_pages = len(reader.pages)
+                # Large PDFs are sharded by page range across a process pool
+                if resolve_workers(CONFIG.pdf_workers) > 1 and num_pages >= CONFIG.parallel_min_pages:
+                    pages = extract_pdf_pages(
+                        file_path,
+                        workers=CONFIG.pdf_workers,
+                        min_pages_for_parallel=CONFIG.parallel_min_pages,
+                        num_pages=num_pages
+                    )
+                    return "\n".join([text for _, text in pages])
                 return "\n".join([page.extract_text() or "" for page in reader.pages])
 
             elif ext == "docx":
@@ -46,6 +73,29 @@ class Summarizer:
         except Exception as e:
             return f"❌ Error reading file: {e}"
 
+    @staticmethod
+    @st.cache_data(show_spinner=False)
+    def extract_units(file_path: str) -> List[Tuple[int, str]]:
+        """Numbered (1-based) pages of a PDF or slides of a PowerPoint; [] for other formats."""
+        unit = unit_label(file_path)
+        packed = get_pack_store().load(content_key(file_path), "units") if unit else None
+        if packed is not None:
+            return [tuple(item) for item in packed]
+        if unit == "page":
+            pages = extract_pdf_pages(
+                file_path,
+                workers=CONFIG.pdf_workers,
+                min_pages_for_parallel=CONFIG.parallel_min_pages
+            )
+            return [(index + 1, text) for index, text in pages]
+        if unit == "slide":
+            prs = pptx.Presentation(file_path)
+            return [
+                (number, "\n".join(shape.text for shape in slide.shapes if hasattr(shape, "text")))
+                for number, slide in enumerate(prs.slides, start=1)
+            ]
+        return []
+
     @staticmethod
     def detect_type(text: str) -> str:
         lowered = text.lower()
@@ -77,10 +127,11 @@ class Summarizer:
         return text
 
     @staticmethod
-    def gpt_summarize(prompt: str, max_tokens: int = 300) -> str:
+    def gpt_summarize(prompt: str, max_tokens: int = 300, stage: str = "summary_map") -> str:
         try:
-            response = client.chat.completions.create(
-                model="gpt-4-1106-preview",
+            response = route_completion(
+                client,
+                stage,
                 messages=[
                     {"role": "system", "content": "You are a helpful assistant that summarizes documents clearly and precisely."},
                     {"role": "user", "content": prompt}
@@ -89,37 +140,232 @@ class Summarizer:
                 max_tokens=max_tokens
             )
             return response.choices[0].message.content.strip()
+        except (BudgetExceededError, DeadlineExceeded):
+            raise  # per-user/per-request, so they must not end up in the shared summary cache
         except Exception as e:
+            if near():
+                raise DeadlineExceeded("Summarization ran out of time") from e
             return f"❌ GPT summarization failed: {e}"
 
     @staticmethod
     @st.cache_data(show_spinner=False)
+    def extractive_preview(file_path: str) -> str:
+        """Key sentences picked locally, shown instantly while the LLM summary runs."""
+        full_text = Summarizer.extract_text_from_file(file_path)
+        if not full_text or full_text.startswith("❌"):
+            return ""
+        try:
+            preview = extractive_summary(full_text, CONFIG.preview_token_budget, CONFIG.llm_engine)
+        except Exception as e:
+            print(f"[⚠️ Extractive preview failed]: {e}")
+            return ""
+        # Section headings get their own markdown paragraph
+        return Summarizer.emphasize_keywords(preview.replace("\n", "\n\n"))
+
+    @staticmethod
+    @metered_cache("summary")
+    @st.cache_data(show_spinner=False)
     def summarize_file(file_path: str) -> str:
+        note_cache_miss()
         return Summarizer._summarize_file_cached(file_path)
 
     @staticmethod
     def _summarize_file_cached(file_path: str) -> str:
+        # Sessions, API workers and replicas asking for the same document share one run
+        key = content_key(file_path)
+        if key is None:
+            return Summarizer._summarize_file_uncached(file_path)
+        packed = get_pack_store().load(key, "summary")
+        if packed:
+            return packed
+        return get_single_flight().do(
+            "summary", key, lambda: Summarizer._summarize_file_uncached(file_path),
+            persist=True, keep=lambda summary: bool(summary) and not summary.startswith("❌")
+        )
+
+    @staticmethod
+    def _summarize_file_uncached(file_path: str) -> str:
         full_text = Summarizer.extract_text_from_file(file_path)
         if not full_text or full_text.startswith("❌"):
             return "❌ Could not extract text from the uploaded file."
 
-        doc_type = Summarizer.detect_type(full_text)
-        splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-        chunks = splitter.split_text(full_text)
+        # Short paged documents are mapped per located chunk, so later range requests reuse the summaries
+        if unit_label(file_path) and count_num_tokens(full_text, CONFIG.llm_engine) <= CONFIG.token_threshold:
+            try:
+                chunks = chunk_units(Summarizer.extract_units(file_path), CONFIG.map_chunk_size)
+            except Exception as e:
+                print(f"[⚠️ Page extraction failed, summarizing plain text]: {e}")
+                chunks = []
+            if chunks:
+                doc_type = Summarizer.detect_type(full_text)
+                summaries = Summarizer.chunk_summaries(file_path, chunks, range(len(chunks)), doc_type)
+                return Summarizer.finish_summary(
+                    [summaries[i] for i in range(len(chunks)) if i in summaries],
+                    complete=len(summaries) == len(chunks),
+                    merge=lambda done: Summarizer.merge_summaries(done, doc_type),
+                    source_text=full_text
+                )
+        return Summarizer.summarize_text(full_text)
 
-        summaries = []
-        for chunk in chunks[:2]:
-            prompt = f"Summarize the following {doc_type} document chunk in a clear, useful way for a student:\n\n{chunk}"
-            summary = Summarizer.gpt_summarize(prompt)
-            summaries.append(summary)
+    @staticmethod
+    def chunk_summaries(file_path: str, chunks: List[dict], indexes, doc_type: str) -> Dict[int, str]:
+        """
+        Map-phase summaries of the given located chunks, from the store where possible.
 
-        combined = " ".join(summaries)
+        New summaries are stored with the page/slide range they cover; failed
+        ones are returned but not stored, so they are retried next time. When
+        the request deadline is near, chunks not summarized yet are left out.
+        """
+        digest = content_key(file_path)
+        key = f"{digest}-{CONFIG.map_chunk_size}" if digest else None
+        store = get_chunk_summary_store()
+        stored = store.load(key) if key else {}
+
+        summaries, fresh = {}, {}
+        try:
+            for index in indexes:
+                chunk = chunks[index]
+                entry = stored.get(index)
+                if entry is None or (entry["start"], entry["end"]) != (chunk["start"], chunk["end"]):
+                    if near(CONFIG.deadline_reserve_s):
+                        continue  # the rest of the time is kept for merging; stored chunks are still used
+                    prompt = f"Summarize the following {doc_type} document chunk in a clear, useful way for a student:\n\n{chunk['text']}"
+                    try:
+                        summary = Summarizer.gpt_summarize(prompt)
+                    except DeadlineExceeded:
+                        continue
+                    entry = {"start": chunk["start"], "end": chunk["end"], "summary": summary}
+                    if not summary.startswith("❌"):
+                        fresh[index] = entry
+                summaries[index] = entry["summary"]
+        finally:
+            # Keep what was paid for even if a later call hits the budget
+            if fresh and key:
+                store.save(key, fresh)
+        return summaries
 
+    @staticmethod
+    def merge_summaries(summaries: List[str], doc_type: str) -> str:
+        combined = " ".join(summaries)
         final_prompt = (
             f"Please merge and refine the following summaries from a {doc_type} document "
             f"into a final coherent summary for easy student understanding:\n\n{combined}"
         )
-        final_summary = Summarizer.gpt_summarize(final_prompt, max_tokens=600)
-        emphasized_summary = Summarizer.emphasize_keywords(final_summary)
+        final_summary = Summarizer.gpt_summarize(final_prompt, max_tokens=600, stage="summary_merge")
+        return Summarizer.emphasize_keywords(final_summary)
 
-        return emphasized_summary
+    @staticmethod
+    def finish_summary(summaries: List[str], complete: bool, merge: Callable[[List[str]], str], source_text: str) -> str:
+        """
+        Merge map-phase summaries, or raise PartialResult when the deadline cut the work short.
+
+        A partial result merges the summaries that did finish; without time
+        left for that they are joined as they are, and with none finished,
+        key sentences picked locally from `source_text` stand in.
+        """
+        usable = [summary for summary in summaries if not summary.startswith("❌")]
+        merged = None
+        if (complete or usable) and not near():
+            try:
+                merged = merge(summaries if complete else usable)
+            except DeadlineExceeded:
+                merged = None
+            if merged is not None and merged.startswith("❌") and near():
+                merged = None  # the merge call itself ran out of time
+        if complete and merged is not None:
+            return merged
+
+        if merged is None and usable:
+            merged = Summarizer.emphasize_keywords("\n\n".join(usable))
+        elif merged is None:
+            merged = extractive_summary(source_text, CONFIG.preview_token_budget, CONFIG.llm_engine).replace("\n", "\n\n")
+        print(f"⏱️ Deadline reached: summary built from {len(usable)} of the chunk summaries")
+        raise PartialResult(mark_partial(merged))
+
+    @staticmethod
+    @metered_cache("summary")
+    @st.cache_data(show_spinner=False)
+    def summarize_range(file_path: str, start: int, end: int) -> str:
+        """
+        Summary of pages (PDF) or slides (PowerPoint) start..end, 1-based and inclusive.
+
+        Reduces the stored chunk summaries overlapping the range in one merge
+        call; only chunks never summarized before cost a map call. Raises
+        ValueError for files without pages or slides and for ranges outside
+        the document. Raises PartialResult when the request deadline leaves
+        some of the range unsummarized.
+        """
+        note_cache_miss()
+        unit = unit_label(file_path)
+        if unit is None:
+            raise ValueError("Page ranges are only available for PDF and PowerPoint files.")
+        units = Summarizer.extract_units(file_path)
+        if not units:
+            return "❌ Could not extract text from the uploaded file."
+        last = units[-1][0]
+        if start > end or start > last or end < 1:
+            raise ValueError(f"This document has {last} {unit}s; choose a range between 1 and {last}.")
+        start, end = max(start, 1), min(end, last)
+
+        chunks = chunk_units(units, CONFIG.map_chunk_size)
+        indexes = overlapping(chunks, start, end)
+        if not indexes:
+            return f"❌ No text found on {format_range(unit, start, end)}."
+        doc_type = Summarizer.detect_type(" ".join(chunks[i]["text"] for i in indexes))
+        summaries = Summarizer.chunk_summaries(file_path, chunks, indexes, doc_type)
+        done = [i for i in indexes if i in summaries]
+
+        usable = [
+            f"({format_range(unit, chunks[i]['start'], chunks[i]['end'])}) {summaries[i]}"
+            for i in done if not summaries[i].startswith("❌")
+        ]
+        if not usable and len(done) == len(indexes):
+            return summaries[indexes[0]]
+
+        def merge(parts: List[str]) -> str:
+            final_prompt = (
+                f"Please merge and refine the following summaries of {format_range(unit, start, end)} "
+                f"of a {doc_type} document into one coherent summary of that part for easy student "
+                f"understanding. Only cover {format_range(unit, start, end)}:\n\n" + "\n\n".join(parts)
+            )
+            final_summary = Summarizer.gpt_summarize(final_prompt, max_tokens=600, stage="summary_merge")
+            return Summarizer.emphasize_keywords(final_summary)
+
+        return Summarizer.finish_summary(
+            usable,
+            complete=len(done) == len(indexes),
+            merge=merge,
+            source_text="\n".join(chunks[i]["text"] for i in indexes)
+        )
+
+    @staticmethod
+    def summarize_text(full_text: str) -> str:
+        """Summarize already-extracted text (used by batch jobs that parse files up front)."""
+        doc_type = Summarizer.detect_type(full_text)
+
+        # Long documents are condensed locally first, so the map phase only sees
+        # the most salient sentences of every section and needs just a few calls
+        source_text = full_text
+        if count_num_tokens(full_text, CONFIG.llm_engine) > CONFIG.token_threshold:
+            source_text = extractive_summary(full_text, CONFIG.extractive_token_budget, CONFIG.llm_engine) or full_text
+
+        splitter = RecursiveCharacterTextSplitter(chunk_size=CONFIG.map_chunk_size, chunk_overlap=100)
+        chunks = splitter.split_text(source_text)
+
+        summaries = []
+        for chunk in chunks:
+            if near(CONFIG.deadline_reserve_s):
+                break  # the rest of the time is kept for merging
+            prompt = f"Summarize the following {doc_type} document chunk in a clear, useful way for a student:\n\n{chunk}"
+            try:
+                summary = Summarizer.gpt_summarize(prompt)
+            except DeadlineExceeded:
+                break
+            summaries.append(summary)
+
+        return Summarizer.finish_summary(
+            summaries,
+            complete=len(summaries) == len(chunks),
+            merge=lambda done: Summarizer.merge_summaries(done, doc_type),
+            source_text=source_text
+        )
@@ -0,0 +1,26 @@
+from functools import lru_cache
+import tiktoken
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_num_tokens(text: str, model: str = "gpt-4") -> int:
+    """Number of tiktoken tokens `text` takes for `model`."""
+    if not text:
+        return 0
+    return len(_get_encoding(model).encode(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = "gpt-4") -> str:
+    """Cut `text` down to at most `max_tokens` tokens."""
+    encoding = _get_encoding(model)
+    tokens = encoding.encode(text or "")
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
@@ -4,6 +4,7 @@ from utils.prepare_vectordb import PrepareVectorDB
 from utils.summarizer import Summarizer
 from utils.generate_mcqs import MCQGenerator
 from utils.load_config import LoadConfig
+from utils.vector_store import index_directory_for
 
 # Load app configuration
 APPCFG = LoadConfig()
@@ -38,10 +39,16 @@ class UploadFile:
             if selected_action == "Upload doc: Process for RAG":
                 processor = PrepareVectorDB(
                     data_directory=[file_path],
-                    persist_directory=APPCFG.custom_persist_directory,
+                    persist_directory=index_directory_for(
+                        APPCFG.custom_persist_directory, file_path, APPCFG.vector_store_backend
+                    ),
                     openai_api_key=APPCFG.openai_api_key,
                     chunk_size=APPCFG.chunk_size,
-                    chunk_overlap=APPCFG.chunk_overlap
+                    chunk_overlap=APPCFG.chunk_overlap,
+                    pdf_workers=APPCFG.pdf_workers,
+                    parallel_min_pages=APPCFG.parallel_min_pages,
+                    vector_store_backend=APPCFG.vector_store_backend,
+                    vector_store_options=APPCFG.vector_store_options
                 )
                 processor.prepare_and_save_vectordb()
                 chatbot.append((" ", "✅ Vector database created. You can now chat with your file."))
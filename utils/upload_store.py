@@ -0,0 +1,196 @@
+import os
+import time
+import uuid
+import hashlib
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Optional, Union
+import streamlit as st
+from utils.load_config import LoadConfig
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows: thread-level locking only
+
+
+class UploadRejectedError(ValueError):
+    """Raised when an upload breaks the configured limits."""
+
+
+@dataclass
+class StoredUpload:
+    digest: str
+    file_name: str
+    path: str
+    size: int
+
+    @property
+    def key(self) -> str:
+        return Path(self.path).name
+
+
+class UploadStore:
+    """
+    Content-addressed storage for uploaded files.
+
+    Files are streamed to disk in chunks while being hashed and stored once
+    under objects/<sha256[:2]>/<sha256>.<ext>. Each session holds a reference
+    under refs/<key>/<session_id>; an object is deleted when its last
+    reference is released.
+    """
+
+    def __init__(
+        self,
+        root: Union[str, os.PathLike],
+        max_upload_bytes: int = 50 * 1024 * 1024,
+        chunk_size: int = 1024 * 1024,
+        allowed_extensions: Optional[list] = None
+    ):
+        self.root = Path(root)
+        self.max_upload_bytes = max_upload_bytes
+        self.chunk_size = chunk_size
+        self.allowed_extensions = allowed_extensions
+        self.objects_dir = self.root / "objects"
+        self.refs_dir = self.root / "refs"
+        self.tmp_dir = self.root / "tmp"
+        for path in (self.objects_dir, self.refs_dir, self.tmp_dir):
+            path.mkdir(parents=True, exist_ok=True)
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self):
+        # Serializes ref/object bookkeeping across threads and processes
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.root / ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _check_limits(self, file_name: str, size: Optional[int]) -> str:
+        ext = file_name.split(".")[-1].lower() if "." in file_name else ""
+        if self.allowed_extensions is not None and ext not in self.allowed_extensions:
+            raise UploadRejectedError(f"Unsupported file type: .{ext}")
+        if size is not None and size > self.max_upload_bytes:
+            raise UploadRejectedError(
+                f"File is {size / 1_048_576:.1f} MB; the limit is {self.max_upload_bytes / 1_048_576:.0f} MB."
+            )
+        return ext
+
+    def object_path(self, digest: str, ext: str) -> Path:
+        return self.objects_dir / digest[:2] / f"{digest}.{ext}"
+
+    def save(self, fileobj: BinaryIO, file_name: str, session_id: str, size: Optional[int] = None) -> StoredUpload:
+        """Stream `fileobj` into the store and add a reference for `session_id`."""
+        ext = self._check_limits(file_name, size)
+
+        if hasattr(fileobj, "seek"):
+            fileobj.seek(0)
+
+        hasher = hashlib.sha256()
+        written = 0
+        tmp_path = self.tmp_dir / f"{uuid.uuid4().hex}.part"
+        try:
+            with open(tmp_path, "wb") as out:
+                while True:
+                    chunk = fileobj.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    written += len(chunk)
+                    # Declared sizes can lie; enforce the limit on what we actually read
+                    if written > self.max_upload_bytes:
+                        raise UploadRejectedError(
+                            f"File exceeds the {self.max_upload_bytes / 1_048_576:.0f} MB upload limit."
+                        )
+                    hasher.update(chunk)
+                    out.write(chunk)
+
+            digest = hasher.hexdigest()
+            target = self.object_path(digest, ext)
+
+            with self._locked():
+                if target.exists():
+                    tmp_path.unlink()
+                else:
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    os.replace(tmp_path, target)
+                self._add_ref(target.name, session_id)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+        return StoredUpload(digest=digest, file_name=file_name, path=str(target), size=written)
+
+    def _ref_dir(self, key: str) -> Path:
+        return self.refs_dir / key
+
+    def _add_ref(self, key: str, session_id: str):
+        ref_dir = self._ref_dir(key)
+        ref_dir.mkdir(parents=True, exist_ok=True)
+        (ref_dir / session_id).touch()
+
+    def refcount(self, key: str) -> int:
+        ref_dir = self._ref_dir(key)
+        return len(list(ref_dir.iterdir())) if ref_dir.exists() else 0
+
+    def holds(self, key: str, session_id: str) -> bool:
+        """True if `session_id` has a reference to the object `key`."""
+        return (self._ref_dir(key) / session_id).exists()
+
+    def release(self, path: Union[str, os.PathLike], session_id: str) -> bool:
+        """Drop `session_id`'s reference; returns True if the object was deleted."""
+        key = Path(path).name
+        with self._locked():
+            ref = self._ref_dir(key) / session_id
+            if ref.exists():
+                ref.unlink()
+            return self._delete_if_unreferenced(key)
+
+    def _delete_if_unreferenced(self, key: str) -> bool:
+        if self.refcount(key) > 0:
+            return False
+
+        ref_dir = self._ref_dir(key)
+        if ref_dir.exists():
+            ref_dir.rmdir()
+
+        digest, _, ext = key.partition(".")
+        target = self.object_path(digest, ext)
+        if target.exists():
+            target.unlink()
+            print(f"🗑️ Removed unreferenced upload: {key}")
+            return True
+        return False
+
+    def prune(self, max_age_seconds: float) -> int:
+        """Expire references older than `max_age_seconds` (sessions that never reset)."""
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        with self._locked():
+            for ref_dir in list(self.refs_dir.iterdir()):
+                for ref in list(ref_dir.iterdir()):
+                    if ref.stat().st_mtime < cutoff:
+                        ref.unlink()
+                if self._delete_if_unreferenced(ref_dir.name):
+                    removed += 1
+        return removed
+
+
+@st.cache_resource(show_spinner=False)
+def get_upload_store() -> UploadStore:
+    config = LoadConfig()
+    store = UploadStore(
+        config.data_directory,
+        max_upload_bytes=int(config.max_upload_mb * 1024 * 1024),
+        chunk_size=config.upload_chunk_kb * 1024,
+        allowed_extensions=config.allowed_extensions
+    )
+    store.prune(config.upload_ref_ttl_hours * 3600)
+    return store
@@ -0,0 +1,684 @@
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, Tuple, Union
+import numpy as np
+import httpx
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain_community.vectorstores import Chroma
+from utils import index_versions
+
+
+EMBEDDINGS_FILE = "embeddings.npy"
+SCALES_FILE = "scales.npy"
+FULL_PRECISION_FILE = "embeddings_full.npy"
+DOCUMENTS_FILE = "documents.jsonl"
+META_FILE = "index_meta.json"
+# Section summary index of a hierarchical build, inside the chunk index's version directory
+SECTIONS_DIR = "sections"
+
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, via argpartition."""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.shape[0]:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.shape[0])
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def quantize(matrix: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Return (stored matrix, per-vector scales); scales are only used for int8."""
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"❌ Unsupported embedding dtype: {dtype}. Choose one of {list(SUPPORTED_DTYPES)}")
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if dtype == "float32":
+        return matrix, None
+    if dtype == "float16":
+        return matrix.astype(np.float16), None
+
+    # Symmetric scalar quantization, one scale per vector
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+def dequantize(matrix: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    full = np.asarray(matrix, dtype=np.float32)
+    return full * scales[:, None] if scales is not None else full
+
+
+def recall_at_k(exact: List[np.ndarray], approximate: List[np.ndarray], k: int) -> float:
+    """Mean fraction of the exact top-k that the approximate search also returned."""
+    if not exact:
+        return 1.0
+    hits = [len(set(e[:k].tolist()) & set(a[:k].tolist())) / max(1, min(k, len(e))) for e, a in zip(exact, approximate)]
+    return float(np.mean(hits))
+
+
+class PrecomputedEmbeddings(Embeddings):
+    """
+    Vectors computed elsewhere (by an index server client, or stored in a study pack).
+
+    `embed_documents` hands them out in order, so one instance can feed
+    several builds (chunks, then sections) that together use every vector.
+    Queries can't be embedded.
+    """
+
+    def __init__(self, vectors: Union[List[List[float]], np.ndarray]):
+        self.vectors = vectors
+        self._next = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        end = self._next + len(texts)
+        if end > len(self.vectors):
+            raise ValueError(f"Got {len(self.vectors)} embeddings for {end} texts")
+        batch = self.vectors[self._next:end]
+        self._next = end
+        return batch.tolist() if isinstance(batch, np.ndarray) else list(batch)
+
+    def embed_query(self, text: str) -> List[float]:
+        raise NotImplementedError("Search by vector: queries are embedded by the client")
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-process exact-search vector store.
+
+    Embeddings are kept L2-normalized in a matrix (memory-mapped when loaded
+    from disk), so a query is one matrix-vector product plus an argpartition
+    for the top k. Meant for single-document indexes of up to a few thousand
+    chunks, where it avoids starting a Chroma/SQLite client.
+
+    The matrix can be stored as float32, float16 or int8 with per-vector
+    scales. Quantized indexes can keep a full-precision copy on disk that is
+    only read for the top `k * rescore_factor` candidates.
+    """
+
+    # Rows are upcast to float32 in blocks so quantized matrices never get copied whole
+    BLOCK_ROWS = 4096
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        matrix: Optional[np.ndarray] = None,
+        documents: Optional[List[Document]] = None,
+        scales: Optional[np.ndarray] = None,
+        full_matrix: Optional[np.ndarray] = None,
+        dtype: str = "float32",
+        rescore_factor: int = 4
+    ):
+        self._embedding = embedding
+        self.matrix = matrix if matrix is not None else np.zeros((0, 0), dtype=np.float32)
+        self.documents = documents or []
+        self.scales = scales
+        self.full_matrix = full_matrix
+        self.dtype = dtype
+        self.rescore_factor = rescore_factor
+        self.meta = {}
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def _select_relevance_score_fn(self):
+        # Cosine similarity in [-1, 1] -> relevance in [0, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+    def full_precision(self) -> np.ndarray:
+        if self.full_matrix is not None:
+            return np.asarray(self.full_matrix, dtype=np.float32)
+        return dequantize(self.matrix, self.scales)
+
+    def _set_vectors(self, full: np.ndarray):
+        self.matrix, self.scales = quantize(full, self.dtype)
+        self.full_matrix = full if self.dtype != "float32" else None
+
+    # === Building ===
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = _normalize(np.asarray(self._embedding.embed_documents(texts), dtype=np.float32))
+
+        start = len(self.documents)
+        self._set_vectors(vectors if self.matrix.size == 0 else np.vstack([self.full_precision(), vectors]))
+        self.documents.extend(Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas))
+        return [str(i) for i in range(start, len(self.documents))]
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        persist_directory: Optional[Union[str, os.PathLike]] = None,
+        dtype: str = "float32",
+        keep_full_precision: bool = True,
+        rescore_factor: int = 4,
+        recall_k: int = 5,
+        **kwargs: Any
+    ) -> "NumpyVectorStore":
+        store = cls(embedding, dtype=dtype, rescore_factor=rescore_factor)
+        store.add_texts(texts, metadatas)
+        if dtype != "float32":
+            store.meta["recall"] = store.measure_recall(k=recall_k, rescore=keep_full_precision)
+            print(f"📏 {dtype} index recall@{recall_k} vs float32: {store.meta['recall']:.3f}")
+        if persist_directory:
+            store.save(persist_directory, keep_full_precision=keep_full_precision)
+        return store
+
+    # === Persistence ===
+    def save(self, directory: Union[str, os.PathLike], keep_full_precision: bool = True):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / EMBEDDINGS_FILE, np.asarray(self.matrix))
+        if self.scales is not None:
+            np.save(directory / SCALES_FILE, self.scales)
+        if keep_full_precision and self.full_matrix is not None:
+            np.save(directory / FULL_PRECISION_FILE, np.asarray(self.full_matrix, dtype=np.float32))
+        with open(directory / DOCUMENTS_FILE, "w", encoding="utf-8") as f:
+            for doc in self.documents:
+                f.write(json.dumps({"page_content": doc.page_content, "metadata": doc.metadata}) + "\n")
+        with open(directory / META_FILE, "w", encoding="utf-8") as f:
+            json.dump({**self.meta, "dtype": self.dtype, "count": len(self.documents)}, f)
+
+    @classmethod
+    def load(cls, directory: Union[str, os.PathLike], embedding: Embeddings, rescore_factor: int = 4) -> "NumpyVectorStore":
+        directory = Path(directory)
+        meta = {}
+        if (directory / META_FILE).exists():
+            with open(directory / META_FILE, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+
+        matrix = np.load(directory / EMBEDDINGS_FILE, mmap_mode="r")
+        scales = np.load(directory / SCALES_FILE) if (directory / SCALES_FILE).exists() else None
+        full_matrix = None
+        if (directory / FULL_PRECISION_FILE).exists():
+            full_matrix = np.load(directory / FULL_PRECISION_FILE, mmap_mode="r")
+        with open(directory / DOCUMENTS_FILE, "r", encoding="utf-8") as f:
+            documents = [Document(**json.loads(line)) for line in f if line.strip()]
+
+        store = cls(
+            embedding,
+            matrix=matrix,
+            documents=documents,
+            scales=scales,
+            full_matrix=full_matrix,
+            dtype=meta.get("dtype", "float32"),
+            rescore_factor=rescore_factor
+        )
+        store.meta = meta
+        return store
+
+    @staticmethod
+    def exists(directory: Union[str, os.PathLike]) -> bool:
+        directory = Path(directory)
+        return (directory / EMBEDDINGS_FILE).exists() and (directory / DOCUMENTS_FILE).exists()
+
+    # === Search ===
+    def _scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        # With `rows`, only those rows are read (and scored), in that order
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        if matrix.dtype == np.float32:
+            return np.asarray(matrix @ query)
+        scores = np.empty(matrix.shape[0], dtype=np.float32)
+        for start in range(0, matrix.shape[0], self.BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + self.BLOCK_ROWS], dtype=np.float32)
+            scores[start:start + self.BLOCK_ROWS] = block @ query
+        if self.scales is not None:
+            scores *= self.scales if rows is None else self.scales[rows]
+        return scores
+
+    def search_indices(self, query: np.ndarray, k: int, rescore: bool = True, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k row indices and scores for a normalized query vector, optionally among sorted `rows` only."""
+        scores = self._scores(query, rows)
+        to_rows = (lambda indices: indices) if rows is None else (lambda indices: rows[indices])
+        if not (rescore and self.full_matrix is not None and self.rescore_factor > 1):
+            top = top_k_indices(scores, k)
+            return to_rows(top), scores[top]
+
+        # Rescore a wider quantized shortlist against the full-precision rows
+        candidates = np.sort(to_rows(top_k_indices(scores, k * self.rescore_factor)))
+        exact = np.asarray(self.full_matrix[candidates], dtype=np.float32) @ query
+        order = top_k_indices(exact, k)
+        return candidates[order], exact[order]
+
+    def filter_rows(self, filter: dict) -> np.ndarray:
+        """
+        Sorted rows whose metadata matches a Chroma-style filter.
+
+        Supports {"key": value} and {"key": {"$in": [values]}}, all keys ANDed.
+        """
+        mask = np.ones(len(self.documents), dtype=bool)
+        for key, condition in filter.items():
+            values = self._metadata_column(key)
+            allowed = condition["$in"] if isinstance(condition, dict) else [condition]
+            mask &= np.isin(values, np.asarray(allowed, dtype=object))
+        return np.flatnonzero(mask)
+
+    def _metadata_column(self, key: str) -> np.ndarray:
+        columns = self.__dict__.setdefault("_metadata_columns", {})
+        if key not in columns:
+            columns[key] = np.asarray([doc.metadata.get(key) for doc in self.documents], dtype=object)
+        return columns[key]
+
+    def measure_recall(self, k: int = 5, sample_size: int = 200, rescore: bool = True, noise: float = 0.5) -> float:
+        """
+        Recall@k of this index against exact float32 search.
+
+        Queries are stored vectors moved by random noise of norm `noise`, so
+        no query is an exact copy of a row; a row queried with itself would
+        always find itself and inflate the number.
+        """
+        full = self.full_precision()
+        if full.shape[0] == 0:
+            return 1.0
+        rng = np.random.default_rng(0)
+        sample = rng.choice(full.shape[0], size=min(sample_size, full.shape[0]), replace=False)
+        exact, approximate = [], []
+        for row in sample:
+            offset = rng.standard_normal(full.shape[1]).astype(np.float32)
+            query = full[row] + noise * offset / np.linalg.norm(offset)
+            query /= np.linalg.norm(query)
+            exact.append(top_k_indices(full @ query, k))
+            approximate.append(self.search_indices(query, k, rescore=rescore)[0])
+        return recall_at_k(exact, approximate, k)
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[dict] = None) -> List[Tuple[Document, float]]:
+        if not self.documents:
+            return []
+        rows = self.filter_rows(filter) if filter else None
+        if rows is not None and not len(rows):
+            return []
+        query = _normalize(np.asarray(embedding, dtype=np.float32))
+        indices, scores = self.search_indices(query, k, rows=rows)
+        return [(self.documents[i], float(score)) for i, score in zip(indices, scores)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k, filter)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, filter)]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _similarity_search_with_relevance_scores(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        relevance = self._select_relevance_score_fn()
+        return [(doc, relevance(score)) for doc, score in self.similarity_search_with_score(query, k)]
+
+
+class VectorStoreBackend:
+    """
+    Builds and opens per-document indexes for PrepareVectorDB and get_qa_chain.
+
+    Subclasses implement `exists`/`build`/`open` for one physical directory.
+    Callers use `publish`/`is_published`/`open_published`, which keep each
+    build in a private staging directory and swap it in atomically (see
+    utils.index_versions), so readers never see a partial or deleted index.
+    """
+
+    name = ""
+
+    def exists(self, index_directory: str) -> bool:
+        raise NotImplementedError
+
+    def build(self, documents: List[Document], embedding: Embeddings, index_directory: str) -> VectorStore:
+        raise NotImplementedError
+
+    def open(self, index_directory: str, embedding: Embeddings) -> VectorStore:
+        raise NotImplementedError
+
+    def read(self, index_directory: str) -> Tuple[List[Document], np.ndarray]:
+        """Documents and their embeddings, in index order, for exporting an index elsewhere."""
+        raise NotImplementedError(f"❌ Indexes of the {self.name} backend can't be read back")
+
+    @property
+    def can_read(self) -> bool:
+        return type(self).read is not VectorStoreBackend.read
+
+    # === Versioned publishing ===
+    def published_directory(self, index_directory: str) -> Optional[str]:
+        """Directory readers should open: the live version, or an index from before versioning."""
+        path = index_versions.current_version_path(index_directory)
+        if path is not None and self.exists(str(path)):
+            return str(path)
+        if self.exists(index_directory):
+            return str(index_directory)
+        return None
+
+    def is_published(self, index_directory: str) -> bool:
+        return self.published_directory(index_directory) is not None
+
+    def publish(
+        self,
+        documents: List[Document],
+        embedding: Embeddings,
+        index_directory: str,
+        info: Optional[dict] = None,
+        sections: Optional[List[Document]] = None
+    ) -> str:
+        """
+        Build a new version off to the side and make it live; returns its directory.
+
+        With `sections`, their summary index is built into the same version,
+        so chunks and sections are always swapped in together.
+        """
+        version = index_versions.new_version()
+        staged = index_versions.staging_path(index_directory, version)
+        try:
+            self.build(documents, embedding, str(staged))
+            if sections:
+                self.build(sections, embedding, str(staged / SECTIONS_DIR))
+            target = index_versions.publish(
+                index_directory,
+                staged,
+                version,
+                {"backend": self.name, "chunks": len(documents), "sections": len(sections or []), **(info or {})}
+            )
+        except Exception:
+            index_versions.discard(staged)
+            raise
+        index_versions.prune(index_directory)
+        return str(target)
+
+    def open_published(self, index_directory: str, embedding: Embeddings) -> VectorStore:
+        path = self.published_directory(index_directory)
+        if path is None:
+            raise FileNotFoundError(f"❌ No published index in {index_directory}")
+        return self.open(path, embedding)
+
+    def open_hierarchy(self, index_directory: str, embedding: Embeddings) -> Tuple[VectorStore, Optional[VectorStore]]:
+        """Chunk store and, for hierarchical builds, the section store of the same version."""
+        path = self.published_directory(index_directory)
+        if path is None:
+            raise FileNotFoundError(f"❌ No published index in {index_directory}")
+        sections_path = os.path.join(path, SECTIONS_DIR)
+        sections = self.open(sections_path, embedding) if self.exists(sections_path) else None
+        return self.open(path, embedding), sections
+
+    def read_published(self, index_directory: str) -> Tuple[List[Document], np.ndarray, List[Document], Optional[np.ndarray]]:
+        """(chunks, chunk vectors, sections, section vectors) of the live version."""
+        path = self.published_directory(index_directory)
+        if path is None:
+            raise FileNotFoundError(f"❌ No published index in {index_directory}")
+        documents, vectors = self.read(path)
+        sections_path = os.path.join(path, SECTIONS_DIR)
+        if not self.exists(sections_path):
+            return documents, vectors, [], None
+        return (documents, vectors, *self.read(sections_path))
+
+
+class ChromaBackend(VectorStoreBackend):
+    name = "chroma"
+
+    def exists(self, index_directory: str) -> bool:
+        return (Path(index_directory) / "chroma.sqlite3").exists()
+
+    def build(self, documents, embedding, index_directory):
+        vectordb = Chroma.from_documents(
+            documents=documents,
+            embedding=embedding,
+            persist_directory=str(index_directory)
+        )
+        vectordb.persist()
+        return vectordb
+
+    def open(self, index_directory, embedding):
+        return Chroma(persist_directory=str(index_directory), embedding_function=embedding)
+
+    def read(self, index_directory):
+        stored = Chroma(persist_directory=str(index_directory)).get(include=["documents", "metadatas", "embeddings"])
+        documents = [
+            Document(page_content=text, metadata=metadata or {})
+            for text, metadata in zip(stored["documents"], stored["metadatas"])
+        ]
+        return documents, np.asarray(stored["embeddings"], dtype=np.float32)
+
+
+class NumpyBackend(VectorStoreBackend):
+    name = "numpy"
+
+    def __init__(self, dtype: str = "float32", rescore: bool = False, rescore_factor: int = 4, recall_k: int = 5):
+        self.dtype = dtype
+        self.rescore = rescore
+        self.rescore_factor = rescore_factor
+        self.recall_k = recall_k
+
+    def exists(self, index_directory: str) -> bool:
+        return NumpyVectorStore.exists(index_directory)
+
+    def build(self, documents, embedding, index_directory):
+        return NumpyVectorStore.from_documents(
+            documents,
+            embedding,
+            persist_directory=index_directory,
+            dtype=self.dtype,
+            keep_full_precision=self.rescore,
+            rescore_factor=self.rescore_factor,
+            recall_k=self.recall_k
+        )
+
+    def open(self, index_directory, embedding):
+        return NumpyVectorStore.load(
+            index_directory,
+            embedding,
+            rescore_factor=self.rescore_factor if self.rescore else 0
+        )
+
+    def read(self, index_directory):
+        # Quantized indexes without a full-precision copy are dequantized
+        store = NumpyVectorStore.load(index_directory, None)
+        return store.documents, store.full_precision()
+
+
+# === Client/server mode ===
+_http_clients = {}
+_http_clients_lock = threading.Lock()
+
+
+def _http_client(url: str, pool_size: int, timeout_s: float) -> httpx.Client:
+    """One pooled keep-alive client per index server, shared by every backend instance in the process."""
+    with _http_clients_lock:
+        client = _http_clients.get(url)
+        if client is None:
+            client = _http_clients[url] = httpx.Client(
+                base_url=url,
+                timeout=timeout_s,
+                transport=httpx.HTTPTransport(
+                    retries=2,  # reconnects only; requests that reached the server aren't repeated
+                    limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+                )
+            )
+        return client
+
+
+class IndexServerUnavailable(ConnectionError):
+    pass
+
+
+class RemoteVectorStore(VectorStore):
+    """
+    Read-only view of an index held by the index server.
+
+    Queries are embedded here (so embedding usage is metered per caller) and
+    only the vector goes over the wire.
+    """
+
+    def __init__(self, backend: "RemoteBackend", name: str, embedding: Embeddings):
+        self.backend = backend
+        self.name = name
+        self._embedding = embedding
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def _search(self, embedding: List[float], k: int) -> List[dict]:
+        response = self.backend.request("POST", f"/v1/indexes/{self.name}/search", json={"embedding": list(embedding), "k": k})
+        return response.json()["results"]
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        return [
+            (Document(page_content=hit["page_content"], metadata=hit["metadata"]), hit["score"])
+            for hit in self._search(embedding, k)
+        ]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _similarity_search_with_relevance_scores(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        # The server knows its backend's score scale and sends relevance in [0, 1] alongside
+        return [
+            (Document(page_content=hit["page_content"], metadata=hit["metadata"]), hit["relevance"])
+            for hit in self._search(self._embedding.embed_query(query), k)
+        ]
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        raise NotImplementedError("Remote indexes are replaced as a whole through RemoteBackend.publish")
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, **kwargs: Any):
+        raise NotImplementedError("Use RemoteBackend.publish to build a remote index")
+
+
+class RemoteBackend(VectorStoreBackend):
+    """
+    Indexes built once and served to every app replica by index_server.py.
+
+    Replicas embed chunks and queries themselves and send vectors; the server
+    stores them with its own local backend, publishes versions atomically and
+    answers searches. Indexes are named by the last part of the local index
+    directory (the document's content hash), so every replica resolves the
+    same name. Requests share a pooled client per server, and the server's
+    /health is checked before use at most every `health_check_interval_s`.
+    """
+
+    name = "remote"
+    # url -> monotonic time of the last successful health check
+    _health_checked = {}
+
+    def __init__(self, url: str = "http://127.0.0.1:8100", pool_size: int = 10, timeout_s: float = 30, health_check_interval_s: float = 15):
+        self.url = url.rstrip("/")
+        self.client = _http_client(self.url, pool_size, timeout_s)
+        self.health_check_interval_s = health_check_interval_s
+
+    def health(self) -> dict:
+        try:
+            response = self.client.get("/health", timeout=5)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            raise IndexServerUnavailable(f"❌ Index server at {self.url} is unavailable: {e}") from e
+
+    def _ensure_healthy(self):
+        last_ok = RemoteBackend._health_checked.get(self.url, 0)
+        if time.monotonic() - last_ok < self.health_check_interval_s:
+            return
+        self.health()
+        RemoteBackend._health_checked[self.url] = time.monotonic()
+
+    def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        self._ensure_healthy()
+        try:
+            response = self.client.request(method, path, **kwargs)
+        except httpx.TransportError as e:
+            # Force a fresh health check next time instead of trusting the cached one
+            RemoteBackend._health_checked.pop(self.url, None)
+            raise IndexServerUnavailable(f"❌ Index server at {self.url} is unavailable: {e}") from e
+        if response.status_code >= 400 and response.status_code != 404:
+            try:
+                detail = response.json().get("error", response.text)
+            except ValueError:
+                detail = response.text
+            raise RuntimeError(f"❌ Index server error {response.status_code}: {detail}")
+        return response
+
+    @staticmethod
+    def index_name(index_directory: str) -> str:
+        return Path(index_directory).name
+
+    def exists(self, index_directory: str) -> bool:
+        return self.request("GET", f"/v1/indexes/{self.index_name(index_directory)}").status_code == 200
+
+    def build(self, documents, embedding, index_directory):
+        self.publish(documents, embedding, index_directory)
+        return self.open(index_directory, embedding)
+
+    def open(self, index_directory, embedding):
+        return RemoteVectorStore(self, self.index_name(index_directory), embedding)
+
+    # Versioning happens on the server, so the local manifest layout doesn't apply
+    def published_directory(self, index_directory: str) -> Optional[str]:
+        return index_directory if self.exists(index_directory) else None
+
+    def publish(
+        self,
+        documents: List[Document],
+        embedding: Embeddings,
+        index_directory: str,
+        info: Optional[dict] = None,
+        sections: Optional[List[Document]] = None
+    ) -> str:
+        # Remote indexes are searched flat; section ids stay in the chunk metadata only
+        name = self.index_name(index_directory)
+        texts = [doc.page_content for doc in documents]
+        vectors = embedding.embed_documents(texts)
+        response = self.request("PUT", f"/v1/indexes/{name}", json={
+            "texts": texts,
+            "metadatas": [doc.metadata for doc in documents],
+            "embeddings": [list(map(float, vector)) for vector in vectors],
+            "info": info or {},
+        })
+        return f"{self.url}/v1/indexes/{name}@{response.json()['version']}"
+
+    def open_published(self, index_directory: str, embedding: Embeddings) -> VectorStore:
+        if not self.exists(index_directory):
+            raise FileNotFoundError(f"❌ No published index {self.index_name(index_directory)} on {self.url}")
+        return self.open(index_directory, embedding)
+
+    def open_hierarchy(self, index_directory: str, embedding: Embeddings) -> Tuple[VectorStore, Optional[VectorStore]]:
+        return self.open_published(index_directory, embedding), None
+
+
+VECTOR_STORE_BACKENDS = {
+    ChromaBackend.name: ChromaBackend,
+    NumpyBackend.name: NumpyBackend,
+    RemoteBackend.name: RemoteBackend,
+}
+
+
+def get_vector_store_backend(name: str, options: Optional[dict] = None) -> VectorStoreBackend:
+    """Instantiate a backend; `options` are the backend-specific vector_store_config keys."""
+    if name not in VECTOR_STORE_BACKENDS:
+        raise ValueError(f"❌ Unknown vector store backend: {name}. Choose one of {list(VECTOR_STORE_BACKENDS)}")
+    return VECTOR_STORE_BACKENDS[name](**(options or {}))
+
+
+def index_directory_for(persist_directory: Union[str, os.PathLike], file_path: str, backend: str) -> str:
+    """One index per document: <persist_directory>/<backend>/<file stem>."""
+    return str(Path(persist_directory) / backend / Path(file_path).stem)